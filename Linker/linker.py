@@ -765,6 +765,8 @@ class DragLinkOps(bpy.types.Operator):
         fsocket = P.foundSocket.socket
         if not fsocket:
             return {"FINISHED"}
+        from ..SDNode.tree import LazyNodeReg
+        LazyNodeReg.ensure(self.create_type)
         new_node: bpy.types.Node = tree.nodes.new(self.create_type)
         bpy.ops.node.select_all(action='DESELECT')
         new_node.select = True
@@ -4,21 +4,28 @@ import bpy
 import random
 import os
 import textwrap
+import time
+import http.client
 import urllib.request
 import urllib.parse
+import urllib.error
+import shutil
 import tempfile
-from functools import partial, lru_cache
+from functools import partial
 from pathlib import Path
 from platform import system
 from copy import deepcopy
+from threading import Lock, local
+from weakref import WeakKeyDictionary
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 from bpy.types import Context, UILayout
 
 from .nodegroup import LABEL_TAG, SOCK_TAG, SDNGroup
-from .utils import gen_mask, THelper
+from .utils import gen_mask, THelper, LinkIndex
 from .plugins.animatedimageplayer import AnimatedImagePlayer as AIP
 from .nodes import NodeBase, Ops_Add_SaveImage, Ops_Link_Mask, Ops_Active_Tex, Set_Render_Res, Ops_Switch_Socket_Widget
 from .nodes import name2path, get_icon_path, Images
-from ..SDNode.manager import Task
+from ..SDNode.manager import Task, TaskManager, ResultCache
 from ..timer import Timer
 from ..preference import get_pref
 from ..kclogger import logger
@@ -143,8 +150,188 @@ def link_get(d: dict, path: str):
     return d
 
 
+OPENPOSE_NODES = {"OpenPoseFull", "OpenPoseHand", "OpenPoseMediaPipeFace", "OpenPoseDepth", "OpenPose", "OpenPoseFace", "OpenPoseLineart", "OpenPoseFullExtraLimb", "OpenPoseKeyPose", "OpenPoseCanny", }
+
+
+def _track(value, root: "Fragment"):
+    if isinstance(value, dict) and not isinstance(value, FragmentDict):
+        return FragmentDict(value, root)
+    if isinstance(value, list) and not isinstance(value, FragmentList):
+        return FragmentList(value, root)
+    return value
+
+
+def _changing(name, wrap=None):
+    base = getattr(list if name.startswith("list.") else dict, name.split(".")[-1])
+
+    def f(self, *args, **kwargs):
+        self.root.encoded = None
+        if wrap:
+            args, kwargs = wrap(self, args, kwargs)
+        return base(self, *args, **kwargs)
+    return f
+
+
+def _wrap_value(self, args, kwargs):
+    # (key, value) / (value,) / (index, value)
+    return (*args[:-1], _track(args[-1], self.root)) if args else args, kwargs
+
+
+def _wrap_update(self, args, kwargs):
+    data = dict(*args, **kwargs)
+    return ({k: _track(v, self.root) for k, v in data.items()},), {}
+
+
+def _wrap_setdefault(self, args, kwargs):
+    if len(args) > 1:
+        return (args[0], _track(args[1], self.root)), {}
+    return args, kwargs
+
+
+def _wrap_items(self, args, kwargs):
+    # list 切片赋值 / extend / +=
+    if len(args) == 2 and isinstance(args[0], slice):
+        return (args[0], [_track(v, self.root) for v in args[1]]), {}
+    if len(args) == 1:
+        return ([_track(v, self.root) for v in args[0]],), {}
+    return _wrap_value(self, args, kwargs)
+
+
+class FragmentDict(dict):
+    """
+    Fragment 内部的 dict, 修改时丢弃根节点已编码的 JSON 文本
+    """
+    __slots__ = ("root",)
+
+    def __init__(self, data=(), root: "Fragment" = None):
+        super().__init__()
+        self.root = self if root is None else root
+        dict.update(self, {k: _track(v, self.root) for k, v in dict(data).items()})
+
+    __setitem__ = _changing("__setitem__", _wrap_value)
+    __delitem__ = _changing("__delitem__")
+    __ior__ = _changing("__ior__", _wrap_update)
+    update = _changing("update", _wrap_update)
+    setdefault = _changing("setdefault", _wrap_setdefault)
+    pop = _changing("pop")
+    popitem = _changing("popitem")
+    clear = _changing("clear")
+
+
+class FragmentList(list):
+    """
+    Fragment 内部的 list, 修改时丢弃根节点已编码的 JSON 文本
+    """
+    __slots__ = ("root",)
+
+    def __init__(self, data=(), root: "Fragment" = None):
+        super().__init__(_track(v, root) for v in data)
+        self.root = root
+
+    __setitem__ = _changing("list.__setitem__", _wrap_items)
+    __delitem__ = _changing("list.__delitem__")
+    __iadd__ = _changing("list.__iadd__", _wrap_items)
+    __imul__ = _changing("list.__imul__")
+    append = _changing("list.append", _wrap_value)
+    extend = _changing("list.extend", _wrap_items)
+    insert = _changing("list.insert", _wrap_value)
+    pop = _changing("list.pop")
+    remove = _changing("list.remove")
+    clear = _changing("list.clear")
+    sort = _changing("list.sort")
+    reverse = _changing("list.reverse")
+
+
+class Fragment(FragmentDict):
+    """
+    可缓存的节点序列化结果, 首次编码后保留 JSON 文本供重复提交时复用
+    任意层级的 dict/list 被修改后都会丢弃已编码的文本, 下次 dumps 重新编码
+    """
+    __slots__ = ("encoded",)
+
+    def __init__(self, data=()):
+        self.encoded = None
+        super().__init__(data)
+
+    def dumps(self) -> str:
+        if self.encoded is None:
+            self.encoded = json.dumps(self)
+        return self.encoded
+
+
+class SerializeCache:
+    """
+    节点级序列化缓存
+        key: (树, 节点名, 父组节点id)
+        失效: 所在树的拓扑版本号变化(连接/节点增删) 或 指纹(widget 值/输入连接)变化
+              组内节点及含组节点的树还依赖 TreeTracker.GROUP_GENERATION
+    仅缓存未重写序列化流程的蓝图, 其余节点每次都重新序列化
+    """
+    CACHE: dict[tuple, tuple[tuple, tuple, Fragment]] = {}
+    PURE: dict[type, bool] = {}
+    REG_NAMES: dict[str, list[str]] = {}
+    HITS = 0
+    MISSES = 0
+
+    @staticmethod
+    def is_pure(bp: "BluePrintBase") -> bool:
+        t = type(bp)
+        if t not in SerializeCache.PURE:
+            methods = ("getattr", "serialize", "serialize_specific", "_serialize_input", "make_serialize")
+            SerializeCache.PURE[t] = all(getattr(t, m) is getattr(BluePrintBase, m) for m in methods)
+        return SerializeCache.PURE[t]
+
+    @staticmethod
+    def fingerprint(self: NodeBase) -> tuple:
+        regs = SerializeCache.REG_NAMES.get(self.class_type)
+        if regs is None:
+            regs = [get_reg_name(inp_name) for inp_name in self.inp_types]
+            SerializeCache.REG_NAMES[self.class_type] = regs
+        values = [getattr(self, reg, None) for reg in regs]
+        links = []
+        for inp in self.inputs:
+            if not (link := self.get_from_link(inp)):
+                links.append(None)
+                continue
+            links.append((link.from_node.name, getattr(link.from_node, "id", ""), link.from_socket.identifier))
+        return self.id, tuple(links), tuple(values)
+
+    @staticmethod
+    def get(self: NodeBase, parent: NodeBase = None, factory=None) -> Fragment:
+        from .tree import TreeTracker
+        tree_uid = self.id_data.session_uid
+        key = (tree_uid, self.name, parent.id if parent else "")
+        gen = TreeTracker.generation(tree_uid, grouped=parent is not None)
+        fp = SerializeCache.fingerprint(self)
+        if (cached := SerializeCache.CACHE.get(key)) and cached[0] == gen and cached[1] == fp:
+            SerializeCache.HITS += 1
+            return cached[2]
+        SerializeCache.MISSES += 1
+        fragment = Fragment(factory())
+        SerializeCache.CACHE[key] = (gen, fp, fragment)
+        return fragment
+
+    @staticmethod
+    def stats() -> tuple[int, int]:
+        return SerializeCache.HITS, SerializeCache.MISSES
+
+    @staticmethod
+    def clear():
+        SerializeCache.CACHE.clear()
+        SerializeCache.REG_NAMES.clear()
+
+
 class BluePrintBase:
+    """
+    定义子类时按 comfyClass 注册单例到 REGISTRY(含插件中的子类), 后定义的覆盖先定义的
+    """
     comfyClass = ""
+    REGISTRY: dict[str, "BluePrintBase"] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.comfyClass:
+            BluePrintBase.REGISTRY[cls.comfyClass] = cls()
 
     def getattr(s, self, prop_name):
         meta = self.get_meta(prop_name)
@@ -396,9 +583,9 @@ class BluePrintBase:
         """
         ...
 
-    def dump(s, self: NodeBase, selected_only=False):
-        tree = self.get_tree()
-        all_links: list[bpy.types.NodeLink] = tree.links[:]
+    def dump(s, self: NodeBase, selected_only=False, all_links: LinkIndex = None):
+        if all_links is None:
+            all_links = LinkIndex(self.get_tree())
 
         inputs = []
         outputs = []
@@ -482,7 +669,7 @@ class BluePrintBase:
         s.serialize_pre_specific(self)
 
     def serialize_specific(s, self: NodeBase, cfg, execute):
-        if self.class_type in {"OpenPoseFull", "OpenPoseHand", "OpenPoseMediaPipeFace", "OpenPoseDepth", "OpenPose", "OpenPoseFace", "OpenPoseLineart", "OpenPoseFullExtraLimb", "OpenPoseKeyPose", "OpenPoseCanny", }:
+        if self.class_type in OPENPOSE_NODES:
             rpath = Path(bpy.path.abspath(bpy.context.scene.render.filepath)) / "MultiControlnet"
             cfg["inputs"]["image"] = rpath.as_posix()
             cfg["inputs"]["frame"] = bpy.context.scene.frame_current
@@ -652,7 +839,11 @@ class BluePrintBase:
         logger.debug("BluePrintBase: %s %s->%s", self.class_type, _T('Post Function'), result)
 
     def make_serialize(s, self: NodeBase, parent: NodeBase = None) -> dict:
-        return {self.id: (self.serialize(parent=parent), self.pre_fn, self.post_fn)}
+        if SerializeCache.is_pure(s) and self.class_type not in OPENPOSE_NODES:
+            cfg = SerializeCache.get(self, parent, partial(self.serialize, parent=parent))
+        else:
+            cfg = self.serialize(parent=parent)
+        return {self.id: (cfg, self.pre_fn, self.post_fn)}
 
     def free(s, self: NodeBase):
         ...
@@ -1092,10 +1283,14 @@ class PrimitiveNode(BluePrintBase):
             setattr(link.to_node, get_reg_name(link.to_socket.name), prop)
 
 
-def upload_image(img_path):
-    from .manager import TaskManager
+# 每个线程复用一个 requests.Session, 并发上传时保持连接
+UPLOAD_TLS = local()
+
 
-    url = f"{TaskManager.server.get_url()}/upload/image"
+def upload_image(img_path, task: Task = None, server_url: str = None):
+    from .manager import get_task_url
+
+    url = f"{server_url or get_task_url(task)}/upload/image"
     img_path = Path(img_path)
     if img_path.is_dir() or not img_path.exists():
         return
@@ -1109,7 +1304,10 @@ def upload_image(img_path):
         files = {'image': (img_path.name, img_path.read_bytes(), img_type)}
         timeout = Timeout(connect=5, read=5)
         url = url.replace("0.0.0.0", "127.0.0.1")
-        response = requests.post(url, data=data, files=files, timeout=timeout)
+        session = getattr(UPLOAD_TLS, "session", None)
+        if session is None:
+            session = UPLOAD_TLS.session = requests.Session()
+        response = session.post(url, data=data, files=files, timeout=timeout)
         # 检查响应
         if response.status_code == 200:
             logger.info("Upload Image Success")
@@ -1121,20 +1319,156 @@ def upload_image(img_path):
         logger.error(f"{_T('Upload Image Fail')}: {e}")
 
 
-def cache_to_local(data, suffix="png", save_path="") -> Path:
-    '''data = {"filename": filename, "subfolder": subfolder, "type": folder_type}'''
-    url_values = urllib.parse.urlencode(data)
-    from .manager import TaskManager
-    url = f"{TaskManager.server.get_url()}/view?{url_values}"
-    # logger.debug(f'requesting {url} for image data')
-    with urllib.request.urlopen(url) as response:
-        img_data = response.read()
-        if not save_path:
-            save_path = Path(tempfile.gettempdir()) / data.get('filename', f'preview.{suffix}')
+class Downloader:
+    """
+    /view 结果的后台下载池
+        1. 每个下载线程为每个服务端复用一个 keep-alive 连接
+        2. prefetch 并发下载完成后再执行回调(通常是 Timer.put 主线程步骤)
+        3. 主线程中的 cache_to_local 直接取用已下载文件, 不再请求网络
+        4. 结果缓存命中的任务从本地缓存复制, 未命中的任务下载后写入缓存
+    """
+    MAX_WORKERS = 4
+    # 按任务隔离的已下载文件, 任务释放后随之回收; 未被 take 的条目不会影响其他任务
+    READY: WeakKeyDictionary[Task, dict[tuple[str, str], Path]] = WeakKeyDictionary()
+    lock = Lock()
+    tls = local()
+    executor: ThreadPoolExecutor = None
+    count = 0
+    nbytes = 0
+    latency = 0.0
+
+    @staticmethod
+    def get_executor() -> ThreadPoolExecutor:
+        with Downloader.lock:
+            if not Downloader.executor:
+                Downloader.executor = ThreadPoolExecutor(max_workers=Downloader.MAX_WORKERS, thread_name_prefix="SDNDownload")
+            return Downloader.executor
+
+    @staticmethod
+    def get_conn(netloc: str, renew=False) -> http.client.HTTPConnection:
+        conns: dict[str, http.client.HTTPConnection] = Downloader.tls.__dict__.setdefault("conns", {})
+        if renew and (conn := conns.pop(netloc, None)):
+            conn.close()
+        if netloc not in conns:
+            conns[netloc] = http.client.HTTPConnection(netloc, timeout=30)
+        return conns[netloc]
+
+    @staticmethod
+    def fetch(url: str) -> bytes:
+        parsed = urllib.parse.urlsplit(url)
+        path = f"{parsed.path}?{parsed.query}" if parsed.query else parsed.path
+        for renew in (False, True):
+            conn = Downloader.get_conn(parsed.netloc, renew)
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError):
+                # 复用的连接可能已被服务端关闭, 重建后重试一次
+                if renew:
+                    raise
+                continue
+            if resp.status != 200:
+                raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            return data
+
+    @staticmethod
+    def download(url: str, save_path: Path, task: Task = None) -> Path:
+        if cached := ResultCache.lookup(task, url):
+            if Path(save_path) != cached:
+                shutil.copyfile(cached, save_path)
+            return save_path
+        ts = time.perf_counter()
+        data = Downloader.fetch(url)
         with open(save_path, "wb") as f:
-            f.write(img_data)
+            f.write(data)
+        with Downloader.lock:
+            Downloader.count += 1
+            Downloader.nbytes += len(data)
+            Downloader.latency += time.perf_counter() - ts
+        ResultCache.store_file(task, url, data)
         return save_path
 
+    @staticmethod
+    def take(url: str, save_path: Path, task: Task = None) -> Path:
+        if task is None:
+            return None
+        with Downloader.lock:
+            return Downloader.READY.get(task, {}).pop((url, str(save_path)), None)
+
+    @staticmethod
+    def prefetch(items: list[dict], task: Task = None, callback=None, save_paths: list = None) -> list[Future]:
+        """
+        并发下载 items, 全部完成(包括失败)后在下载线程中调用 callback
+        """
+        if not items:
+            if callback:
+                callback()
+            return []
+        executor = Downloader.get_executor()
+        ts = time.perf_counter()
+        stat = (Downloader.count, Downloader.nbytes, Downloader.latency)
+        remain = [len(items)]
+
+        def job(url, save_path):
+            Downloader.download(url, save_path, task)
+            with Downloader.lock:
+                if task is not None:
+                    Downloader.READY.setdefault(task, {})[(url, str(save_path))] = save_path
+
+        def done(fut: Future):
+            if e := fut.exception():
+                logger.error("%s: %s", _T("Download Failed"), e)
+            with Downloader.lock:
+                remain[0] -= 1
+                if remain[0]:
+                    return
+            Downloader.log_stats(ts, stat)
+            if callback:
+                callback()
+
+        futures = []
+        for i, data in enumerate(items):
+            save_path = save_paths[i] if save_paths else ""
+            url, save_path = get_view_target(data, save_path=save_path, task=task)
+            futures.append(executor.submit(job, url, save_path))
+        for fut in futures:
+            fut.add_done_callback(done)
+        return futures
+
+    @staticmethod
+    def log_stats(ts, stat):
+        cost = time.perf_counter() - ts
+        count = Downloader.count - stat[0]
+        nbytes = (Downloader.nbytes - stat[1]) / 1024 / 1024
+        latency = (Downloader.latency - stat[2]) / max(count, 1) * 1000
+        logger.info("%s: %s files %.2fMB %.2fs (%.2fMB/s) latency %.0fms", _T("Download"), count, nbytes, cost, nbytes / max(cost, 1e-6), latency)
+
+    @staticmethod
+    def stats() -> dict:
+        with Downloader.lock:
+            return {"count": Downloader.count,
+                    "bytes": Downloader.nbytes,
+                    "avg_latency": Downloader.latency / max(Downloader.count, 1)}
+
+
+def get_view_target(data, suffix="png", save_path="", task: Task = None) -> tuple[str, Path]:
+    url_values = urllib.parse.urlencode(data)
+    from .manager import get_task_url
+    url = f"{get_task_url(task)}/view?{url_values}"
+    if not save_path:
+        save_path = Path(tempfile.gettempdir()) / data.get('filename', f'preview.{suffix}')
+    return url, save_path
+
+
+def cache_to_local(data, suffix="png", save_path="", task: Task = None) -> Path:
+    '''data = {"filename": filename, "subfolder": subfolder, "type": folder_type}'''
+    url, save_path = get_view_target(data, suffix, save_path, task)
+    # logger.debug(f'requesting {url} for image data')
+    if ready := Downloader.take(url, save_path, task):
+        return ready
+    return Downloader.download(url, save_path, task)
+
 
 class 预览(BluePrintBase):
     comfyClass = "预览"
@@ -1191,7 +1525,7 @@ class 预览(BluePrintBase):
         def f(self, img_paths: list[dict]):
             self.prev.clear()
             for data in img_paths:
-                img_path = cache_to_local(data)
+                img_path = cache_to_local(data, task=t)
                 if not img_path:
                     continue
                 img_path = Path(img_path).as_posix()
@@ -1208,7 +1542,7 @@ class 预览(BluePrintBase):
                     p.image = img
                 except TypeError:
                     ...
-        Timer.put((f, self, img_paths))
+        Downloader.prefetch(img_paths, task=t, callback=partial(Timer.put, (f, self, img_paths)))
 
 
 class PreviewImage(BluePrintBase):
@@ -1266,7 +1600,7 @@ class PreviewImage(BluePrintBase):
         def f(self, img_paths: list[dict]):
             self.prev.clear()
             for data in img_paths:
-                img_path = cache_to_local(data)
+                img_path = cache_to_local(data, task=t)
                 if not img_path:
                     continue
                 img_path = Path(img_path).as_posix()
@@ -1283,7 +1617,7 @@ class PreviewImage(BluePrintBase):
                     p.image = img
                 except TypeError:
                     ...
-        Timer.put((f, self, img_paths))
+        Downloader.prefetch(img_paths, task=t, callback=partial(Timer.put, (f, self, img_paths)))
 
 
 class 存储(BluePrintBase):
@@ -1372,9 +1706,10 @@ class 存储(BluePrintBase):
             logger.debug("%s%s->%s", self.class_type, _T('Post Function'), result)
             img_paths = result.get("output", {}).get("images", [])
             if self.mode == "ToSeq":
+                wait(Downloader.prefetch(img_paths, task=t))
                 imgs = []
                 for img in img_paths:
-                    imgs.append(cache_to_local(img).as_posix())
+                    imgs.append(cache_to_local(img, task=t).as_posix())
 
                 def push_images_seq(imgs: list[str], channel, frame_start, frame_final_duration):
                     seqe = bpy.context.scene.sequence_editor
@@ -1425,14 +1760,19 @@ class 存储(BluePrintBase):
                     push_images_seq(imgs, channel, frame_start, frame_final_duration)
                 Timer.put((f, self, imgs))
                 return
+
+            def get_save_path(img):
+                filename_prefix = img.get("filename", self.filename_prefix)
+                output_dir = self.output_dir
+                if not output_dir or not Path(output_dir).is_dir():
+                    output_dir = tempfile.gettempdir()
+                return Path(output_dir).joinpath(filename_prefix)
+            save_paths = [get_save_path(img) for img in img_paths] if mode == "Save" else None
+            wait(Downloader.prefetch(img_paths, task=t, save_paths=save_paths))
             for img in img_paths:
                 if mode == "Save":
-                    filename_prefix = img.get("filename", self.filename_prefix)
-                    output_dir = self.output_dir
-                    if not output_dir or not Path(output_dir).is_dir():
-                        output_dir = tempfile.gettempdir()
-                    save_path = Path(output_dir).joinpath(filename_prefix)
-                    img = cache_to_local(img, save_path=save_path).as_posix()
+                    save_path = get_save_path(img)
+                    img = cache_to_local(img, save_path=save_path, task=t).as_posix()
                     if save_path.exists():
                         output_dir = save_path.parent.as_posix()
 
@@ -1443,7 +1783,7 @@ class 存储(BluePrintBase):
                     def f(_, img):
                         return bpy.data.images.load(img)
                 elif mode in {"Import", "ToImage"}:
-                    img = cache_to_local(img).as_posix()
+                    img = cache_to_local(img, task=t).as_posix()
 
                     def f(img_src, img):
                         if not img_src:
@@ -1489,13 +1829,17 @@ class SaveImage(BluePrintBase):
         def __post_fn__(self: NodeBase, t: Task, result: dict, image):
             logger.debug("%s%s->%s", self.class_type, _T('Post Function'), result)
             img_paths = result.get("output", {}).get("images", [])
-            for img in img_paths:
+
+            def get_save_path(img):
                 filename_prefix = img.get("filename", self.filename_prefix)
                 output_dir = self.output_dir
                 if not output_dir or not Path(output_dir).is_dir():
                     output_dir = tempfile.gettempdir()
-                save_path = Path(output_dir).joinpath(filename_prefix)
-                img = cache_to_local(img, save_path=save_path).as_posix()
+                return Path(output_dir).joinpath(filename_prefix)
+            wait(Downloader.prefetch(img_paths, task=t, save_paths=[get_save_path(img) for img in img_paths]))
+            for img in img_paths:
+                save_path = get_save_path(img)
+                img = cache_to_local(img, save_path=save_path, task=t).as_posix()
                 if save_path.exists():
                     output_dir = save_path.parent.as_posix()
 
@@ -1595,55 +1939,60 @@ class 输入图像(BluePrintBase):
         elif prop in {"render_layer", "out_layers", "frames_dir", "disable_render"}:
             return True
 
-    def pre_fn(s, self: NodeBase):
-        def render():
-            if self.mode not in {"渲染", "视口"}:
-                return
-            if self.disable_render or bpy.context.scene.sdn.disable_render_all:
-                return
-            if self.mode == "视口":
-                # 使用临时文件
-                self.image = Path(tempfile.gettempdir()).joinpath("viewport.png").as_posix()
-            logger.warning("%s->%s", _T('Render'), self.image)
-            old = bpy.context.scene.render.filepath
-            bpy.context.scene.render.filepath = self.image
-            if self.mode == "视口":
-                # 场景相机可能为空
-                if not bpy.context.scene.camera:
-                    err_info = _T("No Camera in Scene") + " -> " + bpy.context.scene.name
-                    raise Exception(err_info)
-                bpy.ops.render.opengl(write_still=True, view_context=get_pref().view_context)
-                bpy.context.scene.render.filepath = old
-                return
-            if (cam := bpy.context.scene.camera) and (gpos := cam.get("SD_Mask", [])):
-                try:
-                    for gpo in gpos:
-                        gpo.hide_render = True
-                except BaseException:
-                    ...
-            if bpy.context.scene.use_nodes:
-                from .utils import set_composite
-                nt = bpy.context.scene.node_tree
-
-                with set_composite(nt) as cmp:
-                    render_layer: bpy.types.CompositorNodeRLayers = nt.nodes.new("CompositorNodeRLayers")
-                    if sel_render_layer := nt.nodes.get(self.render_layer, None):
-                        render_layer.scene = sel_render_layer.scene
-                        render_layer.layer = sel_render_layer.layer
-                    if out := render_layer.outputs.get(self.out_layers):
-                        nt.links.new(cmp.inputs["Image"], out)
-                    bpy.ops.render.render(write_still=True)
-                    nt.nodes.remove(render_layer)
-            else:
-                bpy.ops.render.render(write_still=True)
+    def is_render(s, self: NodeBase) -> bool:
+        if self.mode not in {"渲染", "视口"}:
+            return False
+        return not (self.disable_render or bpy.context.scene.sdn.disable_render_all)
+
+    def render(s, self: NodeBase, path: str = None) -> str:
+        """
+        渲染到 path(默认 self.image), 返回需要上传的图片路径
+        """
+        if not s.is_render(self):
+            return self.image
+        if path:
+            self.image = path
+        elif self.mode == "视口":
+            # 使用临时文件
+            self.image = Path(tempfile.gettempdir()).joinpath("viewport.png").as_posix()
+        logger.warning("%s->%s", _T('Render'), self.image)
+        old = bpy.context.scene.render.filepath
+        bpy.context.scene.render.filepath = self.image
+        if self.mode == "视口":
+            # 场景相机可能为空
+            if not bpy.context.scene.camera:
+                err_info = _T("No Camera in Scene") + " -> " + bpy.context.scene.name
+                raise Exception(err_info)
+            bpy.ops.render.opengl(write_still=True, view_context=get_pref().view_context)
             bpy.context.scene.render.filepath = old
+            return self.image
+        if (cam := bpy.context.scene.camera) and (gpos := cam.get("SD_Mask", [])):
+            try:
+                for gpo in gpos:
+                    gpo.hide_render = True
+            except BaseException:
+                ...
+        if bpy.context.scene.use_nodes:
+            from .utils import set_composite
+            nt = bpy.context.scene.node_tree
+
+            with set_composite(nt) as cmp:
+                render_layer: bpy.types.CompositorNodeRLayers = nt.nodes.new("CompositorNodeRLayers")
+                if sel_render_layer := nt.nodes.get(self.render_layer, None):
+                    render_layer.scene = sel_render_layer.scene
+                    render_layer.layer = sel_render_layer.layer
+                if out := render_layer.outputs.get(self.out_layers):
+                    nt.links.new(cmp.inputs["Image"], out)
+                bpy.ops.render.render(write_still=True)
+                nt.nodes.remove(render_layer)
+        else:
+            bpy.ops.render.render(write_still=True)
+        bpy.context.scene.render.filepath = old
+        return self.image
 
-        @Timer.wait_run
-        def r():
-            render()
-            # 上传图片
-            upload_image(self.image)
-        r()
+    def pre_fn(s, self: NodeBase):
+        # 主线程渲染, 完成后在后台上传, 不占用主线程
+        return Timer.submit(s.render, self).then(partial(upload_image, task=TaskManager.submitting_task))
 
     def serialize_pre(s, self: NodeBase):
         if self.mode == "视口":
@@ -1790,11 +2139,10 @@ class 截图(BluePrintBase):
         properties["y2"] = prop
 
     def pre_fn(s, self: NodeBase):
-        @Timer.wait_run
         def f():
             s._capture(self)
-            upload_image(self.image)
-        f()
+            return self.image
+        return Timer.submit(f).then(partial(upload_image, task=TaskManager.submitting_task))
 
 
 class AnimateDiffCombine(BluePrintBase):
@@ -1830,7 +2178,7 @@ class AnimateDiffCombine(BluePrintBase):
             """
             # self.prev.clear()
             for data in img_paths:
-                img_path = cache_to_local(data, suffix="gif").as_posix()
+                img_path = cache_to_local(data, suffix="gif", task=t).as_posix()
                 # 和上次的相同则不管
                 if img_path == self.prev_name:
                     return
@@ -1847,7 +2195,7 @@ class AnimateDiffCombine(BluePrintBase):
                 s.PLAYERS[img_path] = player
                 player.auto_play()
                 break
-        Timer.put((f, self, img_paths))
+        Downloader.prefetch(img_paths[:1], task=t, callback=partial(Timer.put, (f, self, img_paths)))
 
     def spec_extra_properties(s, properties, nname, ndesc):
         prop = bpy.props.StringProperty()
@@ -1902,7 +2250,7 @@ class VHS_VideoCombine(BluePrintBase):
                 file_type = data.get("format", None)
                 if file_type not in {"image/gif", "image/webp"}:
                     continue
-                img_path = cache_to_local(data, suffix=file_type.split("/")[1]).as_posix()
+                img_path = cache_to_local(data, suffix=file_type.split("/")[1], task=t).as_posix()
                 # 和上次的相同则不管
                 if img_path == self.prev_name:
                     return
@@ -1919,7 +2267,8 @@ class VHS_VideoCombine(BluePrintBase):
                 s.PLAYERS[img_path] = player
                 player.auto_play()
                 break
-        Timer.put((f, self, img_paths))
+        items = [d for d in img_paths if d.get("format", None) in {"image/gif", "image/webp"}][:1]
+        Downloader.prefetch(items, task=t, callback=partial(Timer.put, (f, self, img_paths)))
 
     def spec_extra_properties(s, properties, nname, ndesc):
         prop = bpy.props.StringProperty()
@@ -1999,7 +2348,7 @@ class SaveAnimatedPNG(BluePrintBase):
                 file_type = Path(data.get("filename", "None")).suffix
                 if file_type != ".png":
                     continue
-                img_path = cache_to_local(data, suffix=file_type[1:]).as_posix()
+                img_path = cache_to_local(data, suffix=file_type[1:], task=t).as_posix()
                 # 和上次的相同则不管
                 if img_path == self.prev_name:
                     return
@@ -2016,7 +2365,8 @@ class SaveAnimatedPNG(BluePrintBase):
                 s.PLAYERS[img_path] = player
                 player.auto_play()
                 break
-        Timer.put((f, self, img_paths))
+        items = [d for d in img_paths if Path(d.get("filename", "None")).suffix == ".png"][:1]
+        Downloader.prefetch(items, task=t, callback=partial(Timer.put, (f, self, img_paths)))
 
     def spec_extra_properties(s, properties, nname, ndesc):
         prop = bpy.props.StringProperty()
@@ -2067,7 +2417,7 @@ class SaveAnimatedWEBP(BluePrintBase):
                 file_type = Path(data.get("filename", "None")).suffix
                 if file_type != ".webp":
                     continue
-                img_path = cache_to_local(data, suffix=file_type[1:]).as_posix()
+                img_path = cache_to_local(data, suffix=file_type[1:], task=t).as_posix()
                 # 和上次的相同则不管
                 if img_path == self.prev_name:
                     return
@@ -2084,7 +2434,8 @@ class SaveAnimatedWEBP(BluePrintBase):
                 s.PLAYERS[img_path] = player
                 player.auto_play()
                 break
-        Timer.put((f, self, img_paths))
+        items = [d for d in img_paths if Path(d.get("filename", "None")).suffix == ".webp"][:1]
+        Downloader.prefetch(items, task=t, callback=partial(Timer.put, (f, self, img_paths)))
 
     def spec_extra_properties(s, properties, nname, ndesc):
         prop = bpy.props.StringProperty()
@@ -2201,7 +2552,7 @@ class TripoSRViewer(BluePrintBase):
                 if self.mode in {"Import", "Replace"}:
                     active_object = bpy.context.object
                     save_path = Path(self.output_dir).joinpath(filename)
-                    obj = cache_to_local(data, suffix=".obj", save_path=save_path).as_posix()
+                    obj = cache_to_local(data, suffix=".obj", save_path=save_path, task=t).as_posix()
                     imp_objs = s.import_obj(obj)
                     if self.mode == "Replace" and active_object and imp_objs:
                         active_object.data, imp_objs[0].data = imp_objs[0].data, active_object.data
@@ -2211,7 +2562,7 @@ class TripoSRViewer(BluePrintBase):
                 elif self.mode == "Export":
                     save_path = Path(self.output_dir).joinpath(self.filename).with_suffix(".obj")
                     save_path = get_next_filename(save_path)
-                    obj = cache_to_local(data, suffix=".obj", save_path=save_path).as_posix()
+                    obj = cache_to_local(data, suffix=".obj", save_path=save_path, task=t).as_posix()
         Timer.put((f, self, meshes))
 
 
@@ -2316,7 +2667,7 @@ class TripoGLBViewer(BluePrintBase):
                 if self.mode in {"Import", "Replace"}:
                     active_object = bpy.context.object
                     save_path = Path(self.output_dir).joinpath(filename)
-                    obj = cache_to_local(data, suffix=".glb", save_path=save_path).as_posix()
+                    obj = cache_to_local(data, suffix=".glb", save_path=save_path, task=t).as_posix()
                     imp_objs = s.import_glb(obj)
                     if self.mode == "Replace" and active_object and imp_objs:
                         active_object.data, imp_objs[0].data = imp_objs[0].data, active_object.data
@@ -2326,7 +2677,7 @@ class TripoGLBViewer(BluePrintBase):
                 elif self.mode == "Export":
                     save_path = Path(self.output_dir).joinpath(self.filename).with_suffix(".glb")
                     save_path = get_next_filename(save_path)
-                    obj = cache_to_local(data, suffix=".glb", save_path=save_path).as_posix()
+                    obj = cache_to_local(data, suffix=".glb", save_path=save_path, task=t).as_posix()
         Timer.put((f, self, meshes))
 
 
@@ -2391,19 +2742,18 @@ class SDNGroupBP(BluePrintBase):
 
     def load(s, self: NodeBase, data, with_id=True):
         super().load(self, data, with_id)
-        from threading import Thread
-
-        def f(self, data, with_id):
-            import time
-            time.sleep(0.1)
+        # 组内节点已同步加载时直接恢复参数, 否则等待下一次主线程回调
+        if self.node_tree and len(self.node_tree.nodes):
+            s.load_delay(self, data, with_id)
+        else:
             Timer.put((s.load_delay, self, data, with_id))
-        Thread(target=f, args=(self, data, with_id)).start()
 
-    def dump(s, self: SDNGroup, selected_only=False):
+    def dump(s, self: SDNGroup, selected_only=False, all_links: LinkIndex = None):
         helper = THelper()
-        tree = self.get_tree()
-        outer_all_links: list[bpy.types.NodeLink] = tree.links[:]
-        # all_links: list[bpy.types.NodeLink] = self.node_tree.links[:]
+        outer_all_links = all_links
+        if outer_all_links is None:
+            outer_all_links = LinkIndex(self.get_tree())
+        inner_all_links = LinkIndex(self.node_tree)
         ordered_nodes = self.node_tree.compute_execution_order()
         total_widgets = set()
         for sn in ordered_nodes:
@@ -2426,7 +2776,7 @@ class SDNGroupBP(BluePrintBase):
 
             if sn.bl_idname in {"NodeGroupInput", "NodeGroupOutput", "NodeUndefined"}:
                 continue
-            nwidgets = sn.dump(selected_only=selected_only).get("widgets_values")
+            nwidgets = sn.dump(selected_only=selected_only, all_links=inner_all_links).get("widgets_values")
 
             # # 单独处理 widgets_values
             # for inp_name in self.inp_types:
@@ -2612,10 +2962,12 @@ class SDParameterGenerator(BluePrintBase):
             widgets_values.pop(rm)
 
 
-@lru_cache(maxsize=1024)
+DEFAULT_BLUEPRINT = BluePrintBase()
+
+
 def get_blueprints(comfyClass, default=BluePrintBase) -> BluePrintBase:
-    for cls in BluePrintBase.__subclasses__():
-        if cls.comfyClass != comfyClass:
-            continue
-        return cls()
+    if bp := BluePrintBase.REGISTRY.get(comfyClass):
+        return bp
+    if default is BluePrintBase:
+        return DEFAULT_BLUEPRINT
     return default()
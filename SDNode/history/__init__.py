@@ -1,61 +1,189 @@
 import json
 import bpy
-from copy import deepcopy
+import sqlite3
+import atexit
+from hashlib import sha1
 from datetime import datetime
 from pathlib import Path
-from ...utils import read_json
+from queue import Queue, Empty
+from threading import Thread
+from ...utils import read_json, logger
+from ...preference import get_pref
+
 
 class History:
-    path = Path(__file__).parent.joinpath("history.json")
-    num = 20
+    """
+    sqlite 追加写入的历史记录, 工作流按内容哈希去重
+      entries:   id, name, hash   每次提交一条
+      workflows: hash, data       相同工作流只存一份
+    写入在后台线程完成, 不阻塞提交
+    """
+    path = Path(__file__).parent.joinpath("history.db")
+    legacy_path = Path(__file__).parent.joinpath("history.json")
+    num = 500
     is_dirty = True
+    version = 0
+    ui_synced = None
     cache_histories = []
+    queue: Queue = Queue()
+    writer: Thread = None
+    STATS = {"put": 0, "dedup": 0, "pruned": 0}
+
+    @staticmethod
+    def connect() -> sqlite3.Connection:
+        conn = sqlite3.connect(History.path.as_posix(), timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS workflows (hash TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                name TEXT NOT NULL,
+                                                hash TEXT NOT NULL);
+        """)
+        return conn
+
+    @staticmethod
+    def get_limit():
+        try:
+            return get_pref().history_limit
+        except Exception:
+            return History.num
+
+    @staticmethod
+    def start():
+        if History.writer and History.writer.is_alive():
+            return
+        History.writer = Thread(target=History.write_loop, daemon=True)
+        History.writer.start()
+
+    @staticmethod
+    def stop():
+        if not History.writer or not History.writer.is_alive():
+            return
+        History.queue.put(None)
+        History.writer.join(timeout=5)
 
     @staticmethod
     def put_history(history):
+        if not history:
+            return
+        name = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        History.start()
+        History.queue.put((name, history, History.get_limit()))
+
+    @staticmethod
+    def write_loop():
         try:
-            if not history:
-                return
-            history = {"history": history, "name": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-            if History.path.exists():
-                histories = read_json(History.path)
-            else:
-                histories = []
-            histories.append(history)
-            # 限制历史记录数量
-            histories = histories[-History.num:]
-            History.path.write_text(json.dumps(histories, indent=4, ensure_ascii=False), encoding="utf8")
+            conn = History.connect()
+            with conn:
+                History.migrate(conn)
+        except Exception as e:
+            logger.error("History Store Error: %s", e)
+            return
+        History.is_dirty = True
+        History.version += 1
+        running = True
+        while running:
+            jobs = [History.queue.get()]
+            # 批量提交时合并到一个事务
+            while True:
+                try:
+                    jobs.append(History.queue.get_nowait())
+                except Empty:
+                    break
+            if None in jobs:
+                running = False
+                jobs = [job for job in jobs if job is not None]
+            if not jobs:
+                continue
+            try:
+                with conn:
+                    for name, history, limit in jobs:
+                        History.write(conn, name, history, limit)
+            except Exception as e:
+                logger.error("History Write Error: %s", e)
             History.is_dirty = True
-        finally:
-            ...
+            History.version += 1
+        conn.close()
+
+    @staticmethod
+    def write(conn: sqlite3.Connection, name, history, limit):
+        data = json.dumps(history, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        key = sha1(data.encode("utf8")).hexdigest()
+        if conn.execute("INSERT OR IGNORE INTO workflows VALUES (?, ?)", (key, data)).rowcount == 0:
+            History.STATS["dedup"] += 1
+        conn.execute("INSERT INTO entries (name, hash) VALUES (?, ?)", (name, key))
+        History.STATS["put"] += 1
+        # 超出保留数量的旧记录及其不再被引用的工作流
+        sql = "DELETE FROM entries WHERE id <= (SELECT id FROM entries ORDER BY id DESC LIMIT 1 OFFSET ?)"
+        if (pruned := conn.execute(sql, (limit,)).rowcount) > 0:
+            History.STATS["pruned"] += pruned
+            conn.execute("DELETE FROM workflows WHERE hash NOT IN (SELECT hash FROM entries)")
+
+    @staticmethod
+    def migrate(conn: sqlite3.Connection):
+        """
+        导入旧版 history.json (仅在新库为空时)
+        """
+        if not History.legacy_path.exists():
+            return
+        if conn.execute("SELECT 1 FROM entries LIMIT 1").fetchone():
+            return
+        for item in read_json(History.legacy_path):
+            History.write(conn, item["name"], item["history"], History.get_limit())
+        History.legacy_path.replace(History.legacy_path.with_suffix(".json.bak"))
+        logger.info("History migrated: %s", History.STATS["put"])
 
     @staticmethod
     def get_history():
+        """
+        [{"id": ..., "name": ..., "hash": ...}], 新记录在前
+        """
         if History.is_dirty and History.path.exists():
-            History.cache_histories = read_json(History.path)
-            History.cache_histories.reverse()
             History.is_dirty = False
+            conn = History.connect()
+            try:
+                rows = conn.execute("SELECT id, name, hash FROM entries ORDER BY id DESC").fetchall()
+            finally:
+                conn.close()
+            History.cache_histories = [{"id": eid, "name": name, "hash": key} for eid, name, key in rows]
         return History.cache_histories
 
     @staticmethod
-    def get_history_by_name(name):
-        for i in History.get_history():
-            if i["name"] != name:
-                continue
-            return deepcopy(i["history"])
-        return None
+    def get_history_by_id(entry_id):
+        """
+        按 entries.id 查找, 名称按秒生成可能重复
+        """
+        if not History.path.exists():
+            return None
+        conn = History.connect()
+        try:
+            sql = "SELECT w.data FROM entries e JOIN workflows w ON w.hash = e.hash WHERE e.id = ?"
+            row = conn.execute(sql, (entry_id,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
 
     @staticmethod
     def update_timer():
+        # 仅在存储变化或切换场景时重建列表
         try:
-            bpy.context.scene.sdn_history_item.clear()
-            for i in History.get_history():
-                item = bpy.context.scene.sdn_history_item.add()
-                item.name = i["name"]
+            scene = bpy.context.scene
+            key = (scene.as_pointer(), History.version)
+            if History.ui_synced != key:
+                scene.sdn_history_item.clear()
+                for i in History.get_history():
+                    item = scene.sdn_history_item.add()
+                    item.name = i["name"]
+                    item.entry_id = i["id"]
+                History.ui_synced = key
         except Exception as e:
             print("Update History Error: ", e)
         return 1
 
     @staticmethod
     def register_timer():
+        History.start()
         bpy.app.timers.register(History.update_timer, persistent=True)
+
+
+atexit.register(History.stop)
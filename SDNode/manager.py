@@ -8,19 +8,21 @@ import time
 import atexit
 import aud
 from platform import system
-import struct
-from concurrent.futures import ThreadPoolExecutor
+import uuid
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from copy import deepcopy
 from shutil import rmtree
 from urllib import request
-from urllib.parse import urlparse
+from urllib.parse import urlparse, parse_qs
 from urllib.error import URLError
-from threading import Thread
+from threading import Thread, Condition, Lock
 from subprocess import Popen, PIPE, STDOUT
 from pathlib import Path
-from queue import Queue
+from queue import Queue, Empty, Full
 from ..utils import rmtree as rt, logger, _T, PkgInstaller, update_screen
-from ..timer import Timer
+from ..timer import Timer, MainThreadFuture
 from ..preference import get_pref
 from .history import History
 from ..External.websocket import WebSocketApp
@@ -38,6 +40,49 @@ def get_url():
     return TaskManager.server.get_url().replace("0.0.0.0", "localhost")
 
 
+@Timer.coalesce()
+def refresh_enum_items():
+    from ..datas import ENUM_ITEMS_CACHE
+    ENUM_ITEMS_CACHE.clear()
+    update_screen()
+
+
+def get_task_url(task: Task = None):
+    """
+    任务所在服务端的url, 未指定任务时使用正在提交的任务
+    """
+    task = task or TaskManager.submitting_task
+    if task:
+        return task.get_url()
+    return get_url()
+
+
+def iter_prompt_json(content: dict):
+    """
+    分段编码提交内容, prompt 中已缓存的节点片段直接复用其 JSON 文本
+    """
+    yield "{"
+    for i, (key, value) in enumerate(content.items()):
+        yield ", " * bool(i) + json.dumps(key) + ": "
+        if key != "prompt":
+            yield json.dumps(value)
+            continue
+        yield "{"
+        for j, (nid, cfg) in enumerate(value.items()):
+            encoded = cfg.dumps() if hasattr(cfg, "dumps") else json.dumps(cfg)
+            yield ", " * bool(j) + json.dumps(str(nid)) + ": " + encoded
+        yield "}"
+    yield "}"
+
+
+def encode_prompt(content: dict, stream=False):
+    chunks = (chunk.encode() for chunk in iter_prompt_json(content))
+    if stream:
+        # 未指定 Content-Length 时 urllib 使用 chunked 传输
+        return chunks
+    return b"".join(chunks)
+
+
 WITH_PROXY = False
 if not WITH_PROXY:
     request.install_opener(request.build_opener(request.ProxyHandler({})))
@@ -46,6 +91,13 @@ if not WITH_PROXY:
 class Task:
     def __init__(self, task=None, pre=None, post=None, tree=None) -> None:
         self.task = task
+        # 客户端生成的prompt_id, 服务端返回不同id时(旧版ComfyUI)会被替换
+        self.prompt_id = str(uuid.uuid4())
+        # 执行该任务的服务端, 上传/下载都需要使用同一个服务端
+        self.server: Server = None
+        self.retries = 0
+        # 提交失败过的服务端, 重新分配时跳过
+        self.failed_servers: list[Server] = []
         self.res = Queue()
         self._pre = pre
         self._post = post
@@ -56,13 +108,31 @@ class Task:
         self.executing_node: NodeBase = None
         self.is_finished = False
         self.process = {}
-        self.binary_message = b""
+        # 同时提交多个prompt时进度/执行记录需按任务区分
+        self.progress = {}
+        self.executed_nodes: list[str] = []
+        self._pending_process = None
+        # 结果缓存: 未命中时记录 executed 结果和下载文件, 命中时回放
+        self.cache_key: str = None
+        self.cache_hit = False
+        self.cache_results = []
+        self.cache_files = {}
+        # 各阶段时间戳(perf_counter), 用于统计任务端到端延迟
+        self.timestamps = {"queued": time.perf_counter()}
         # 记录node的类型 防止节点树变更
         self.node_ref_map = {}
         if not tree:
             return
         self.node_ref_map = {n.id: n.bl_idname for n in tree.nodes if hasattr(n, "id")}
 
+    def mark_time(self, stage):
+        self.timestamps[stage] = time.perf_counter()
+
+    def get_latency(self, stage, start="queued") -> float:
+        if stage not in self.timestamps or start not in self.timestamps:
+            return -1
+        return self.timestamps[stage] - self.timestamps[start]
+
     def submit_pre(self):
         if not self._pre:
             return
@@ -87,8 +157,18 @@ class Task:
             return False
         return True
 
+    def get_url(self):
+        server = self.server or TaskManager.server
+        return server.get_url().replace("0.0.0.0", "localhost")
+
     def set_finished(self):
         self.is_finished = True
+        self.mark_time("finished")
+        logger.debug("%s: wait %.3fs, submit %.3fs, total %.3fs",
+                     _T("Task Latency"),
+                     self.get_latency("submitted"),
+                     self.get_latency("finished", "submitted"),
+                     self.get_latency("finished"))
 
         def f(self: Task):
             if not self.is_tree_valid():
@@ -101,7 +181,6 @@ class Task:
 
     def set_executing_node_id(self, node_id):
         self.executing_node_id = node_id
-        self.binary_message = b""
 
         def f(self: Task):
             from .nodes import NodeBase
@@ -128,11 +207,17 @@ class Task:
     def set_process(self, process, node_id=""):
         """
         process: {'value': 20, 'max': 20}
+        主线程处理前的多次进度只保留最新一次
         """
         # if not node_id:
         #     node_id = self.executing_node_id
+        queued = self._pending_process is not None
+        self._pending_process = process
+        if queued:
+            return
 
         def f(self: Task):
+            process, self._pending_process = self._pending_process, None
             if not self.is_tree_valid():
                 return
             if not self.executing_node:
@@ -502,6 +587,59 @@ class FakeServer(Server):
     server_type = "Fake"
 
 
+class CoverCache:
+    """
+    远程模型封面的磁盘缓存(按内容哈希存储)
+        INDEX: {封面地址(含?t=时间戳): 文件名}, 地址不变时不再下载
+    """
+    DIR = Path(__file__).parent / "covers"
+    INDEX_PATH = DIR / "index.json"
+    INDEX: dict[str, str] = {}
+    lock = Lock()
+    loaded = False
+
+    @staticmethod
+    def load():
+        CoverCache.loaded = True
+        try:
+            CoverCache.INDEX.update(json.loads(CoverCache.INDEX_PATH.read_text()))
+        except FileNotFoundError:
+            ...
+        except Exception as e:
+            logger.warning(e)
+
+    @staticmethod
+    def save():
+        with CoverCache.lock:
+            try:
+                CoverCache.DIR.mkdir(parents=True, exist_ok=True)
+                CoverCache.INDEX_PATH.write_text(json.dumps(CoverCache.INDEX))
+            except Exception as e:
+                logger.warning(e)
+
+    @staticmethod
+    def get(cover: str) -> Path:
+        with CoverCache.lock:
+            if not CoverCache.loaded:
+                CoverCache.load()
+            name = CoverCache.INDEX.get(cover)
+        if name and (path := CoverCache.DIR / name).exists():
+            return path
+        import requests
+        img_quote = cover.split("?t=")[0]
+        img_data = requests.get(f"{get_url()}{img_quote}", proxies={"http": None, "https": None}, timeout=5).content
+        if not img_data:
+            return
+        name = hashlib.sha1(img_data).hexdigest() + Path(img_quote).suffix
+        path = CoverCache.DIR / name
+        if not path.exists():
+            CoverCache.DIR.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(img_data)
+        with CoverCache.lock:
+            CoverCache.INDEX[cover] = name
+        return path
+
+
 class RemoteServer(Server):
     server_type = "Remote"
 
@@ -509,6 +647,9 @@ class RemoteServer(Server):
         self.server_connected = False
         self.cs_support = "UNKNOWN"
         self.covers = {}
+        self.cover_pending: dict[str, set[str]] = {}
+        self.cover_cond = Condition()
+        self.cover_thread: Thread = None
         super().__init__()
 
     def run(self) -> bool:
@@ -516,6 +657,7 @@ class RemoteServer(Server):
         self.server_connected = False
         self.cs_support = "UNKNOWN"
         self.covers.clear()
+        self.cover_pending.clear()
         TaskManager.clear_error_msg()
         self.uid = time.time_ns()
         self.launch_ip = get_ip()
@@ -540,21 +682,45 @@ class RemoteServer(Server):
             logger.error(e)
         return self.cs_support == "YES"
 
-    def cache_model_icon(self, mtype, model) -> str | None:
+    def cache_model_icon(self, mtype, model) -> Path:
+        """
+        不阻塞绘制: 未缓存的封面交给后台线程批量获取, 完成后刷新枚举
+        """
         if model in self.covers:
             return self.covers[model]
-        if not mtype:
-            return
-        if not self.is_cs_support():
+        if not mtype or self.cs_support == "NO":
             return
         self.covers[model] = None
+        with self.cover_cond:
+            self.cover_pending.setdefault(mtype, set()).add(model)
+            self.cover_cond.notify()
+            if not self.cover_thread:
+                self.cover_thread = Thread(target=self.fetch_covers_loop, daemon=True)
+                self.cover_thread.start()
+
+    def fetch_covers_loop(self):
+        while True:
+            with self.cover_cond:
+                if not self.cover_cond.wait_for(lambda: self.cover_pending, timeout=5):
+                    self.cover_thread = None
+                    return
+            # 合并同一次绘制中产生的请求
+            time.sleep(0.1)
+            with self.cover_cond:
+                pending, self.cover_pending = self.cover_pending, {}
+            if not self.is_cs_support():
+                continue
+            for mtype, models in pending.items():
+                self.fetch_covers(mtype, sorted(models))
+
+    def fetch_covers(self, mtype, models: list[str]):
+        ts = time.perf_counter()
         try:
             import requests
-            from tempfile import gettempdir
             from urllib3.util import Timeout
-            timeout = Timeout(connect=0.1, read=2)
+            timeout = Timeout(connect=1, read=10)
             url = f"{get_url()}/cs/fetch_config"
-            req_json = {"mtype": mtype, "models": [model]}
+            req_json = {"mtype": mtype, "models": models}
             if WITH_PROXY:
                 req = requests.post(url=url, json=req_json, timeout=timeout)
             else:
@@ -564,24 +730,29 @@ class RemoteServer(Server):
                                     timeout=timeout)
             if req.status_code != 200:
                 return
-            data = req.json().get(model, {})
-            cover = data.get("cover", "")
-            img_quote = cover.split("?t=")[0]
-            cover_url = f"{get_url()}{img_quote}"
-            img_data = requests.get(cover_url, timeout=5).content
-            if not img_data:
-                return
-            img_path = Path(gettempdir()).joinpath(model).with_suffix(Path(img_quote).suffix)
-            with open(img_path, "wb") as f:
-                f.write(img_data)
-            self.covers[model] = img_path
-        except requests.exceptions.ConnectionError:
-            logger.warning("Server Launch Failed")
+            configs = req.json()
         except ModuleNotFoundError:
             logger.error("Module: requests import error!")
+            return
         except Exception as e:
             logger.error(e)
-        return self.covers[model]
+            return
+        jobs = [(model, cover) for model in models if (cover := configs.get(model, {}).get("cover", ""))]
+
+        def job(item):
+            model, cover = item
+            try:
+                return model, CoverCache.get(cover)
+            except Exception as e:
+                logger.error(e)
+                return model, None
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for model, path in executor.map(job, jobs):
+                self.covers[model] = path
+        CoverCache.save()
+        logger.info("%s %s: %s/%s %.2fs", _T("Fetch Covers"), mtype, len(jobs), len(models), time.perf_counter() - ts)
+        if jobs:
+            Timer.put(refresh_enum_items)
 
     def wait_connect(self) -> bool:
         import requests
@@ -829,21 +1000,450 @@ class LocalServer(Server):
         logger.debug(_T("STDOUT Listen Thread Exit"))
 
 
+class PoolServer(Server):
+    """
+    服务池中的附加服务端, 只负责执行任务(节点解析仍使用主服务端)
+    与其他Server不同, 每个地址对应一个独立实例
+    """
+    server_type = "Pool"
+
+    def __new__(cls, *args, **kw):
+        return object.__new__(cls)
+
+    def __init__(self, addr: str) -> None:
+        super().__init__()
+        site = urlparse(addr if "://" in addr else f"http://{addr}")
+        self.launch_ip = site.hostname or "127.0.0.1"
+        self.launch_port = site.port or 8188
+        self.launch_url = f"http://{self.launch_ip}:{self.launch_port}"
+        self.server_connected = False
+        self.ws: WebSocketApp = None
+
+    def run(self) -> bool:
+        self.tstart = time.time()
+        self.uid = time.time_ns()
+        return self.wait_connect()
+
+    def wait_connect(self) -> bool:
+        try:
+            request.urlopen(f"{self.get_url()}/queue", timeout=5)
+            self.server_connected = True
+        except URLError as e:
+            logger.error("%s: %s -> %s", _T("Pool Server Connect Failed"), self.get_url(), e)
+            self.server_connected = False
+        return self.server_connected
+
+    def is_launched(self) -> bool:
+        return self.server_connected
+
+    # 未连接时也使用自身地址, 不回退到首选项中的主服务端地址
+    def get_ip(self):
+        return self.launch_ip
+
+    def get_port(self):
+        return self.launch_port
+
+    def get_url(self):
+        return self.launch_url
+
+    def close(self):
+        self.server_connected = False
+        if self.ws:
+            self.ws.close()
+            self.ws = None
+
+    def __repr__(self) -> str:
+        return f"PoolServer({self.get_url()})"
+
+
+class ServerPool:
+    """
+    多服务端调度:
+        主服务端(TaskManager.server) + 偏好设置中的附加服务端
+        每个服务端独立监听websocket, 任务分配给 /queue 负载最小的服务端
+    """
+    servers: list[PoolServer] = []
+
+    @staticmethod
+    def parse_addrs(addrs: str) -> list[str]:
+        return [a.strip() for a in addrs.replace(";", ",").split(",") if a.strip()]
+
+    @staticmethod
+    def init():
+        ServerPool.close()
+        try:
+            addrs = ServerPool.parse_addrs(get_pref().server_pool)
+        except Exception:
+            addrs = []
+        for addr in addrs:
+            server = PoolServer(addr)
+            if server.get_url() == TaskManager.server.get_url():
+                continue
+            ServerPool.servers.append(server)
+            Thread(target=ServerPool.launch, args=(server,), daemon=True).start()
+
+    @staticmethod
+    def launch(server: PoolServer):
+        if not server.run():
+            return
+        logger.warning("%s: %s", _T("Pool Server Connected"), server.get_url())
+        TaskManager.poll_res(server)
+
+    @staticmethod
+    def close():
+        for server in ServerPool.servers:
+            server.close()
+        ServerPool.servers.clear()
+
+    @staticmethod
+    def get_servers() -> list[Server]:
+        servers = [TaskManager.server] if TaskManager.server.is_launched() else []
+        servers.extend(s for s in ServerPool.servers if s.is_launched())
+        return servers
+
+    @staticmethod
+    def query_load(server: Server) -> int:
+        """
+        服务端队列中的任务数 + 已分配到该服务端但尚未进入队列的任务数
+        """
+        res = request.urlopen(f"{server.get_url()}/queue", timeout=2)
+        res = json.loads(res.read().decode())
+        load = len(res.get("queue_pending", [])) + len(res.get("queue_running", []))
+        pids = {item[1] for item in res.get("queue_pending", []) + res.get("queue_running", []) if len(item) > 1}
+        with TaskManager.dispatch_cond:
+            load += sum(1 for t in TaskManager.inflight.values() if t.server is server and t.prompt_id not in pids)
+        return load
+
+    @staticmethod
+    def pick(exclude=()) -> Server:
+        servers = [s for s in ServerPool.get_servers() if s not in exclude]
+        if len(servers) <= 1:
+            return servers[0] if servers else TaskManager.server
+        best, best_load = None, sys.maxsize
+        for server in servers:
+            try:
+                load = ServerPool.query_load(server)
+            except URLError as e:
+                ServerPool.mark_down(server, e)
+                continue
+            except Exception as e:
+                logger.error(e)
+                continue
+            if load < best_load:
+                best, best_load = server, load
+        logger.debug("%s: %s (%s)", _T("Pick Server"), best, best_load)
+        return best or TaskManager.server
+
+    @staticmethod
+    def mark_down(server: Server, reason=""):
+        if server is TaskManager.server or not isinstance(server, PoolServer):
+            return
+        logger.error("%s: %s -> %s", _T("Pool Server Down"), server.get_url(), reason)
+        server.close()
+
+
+class MessagePipeline:
+    """
+    websocket 消息处理管线
+        文本消息在 ws 线程解码并分发, 重绘请求合并为每个 Timer 帧最多一次, 进度条输出按帧限频
+        二进制消息交给独立线程依次调用 BINARY_HANDLERS, 积压时丢弃最旧的帧
+        STATS 记录各消息类型的数量/速率/处理耗时
+    """
+    FRAME = 1 / 60
+    BINARY_BACKLOG = 4
+    BINARY_HANDLERS = []
+    STATS: dict[str, list] = {}
+    binary_queue = Queue(maxsize=BINARY_BACKLOG)
+    binary_thread: Thread = None
+    progress_time = 0
+    dropped = 0
+
+    @staticmethod
+    def request_redraw():
+        # 已排队时由 Timer 合并, Timer.clear 会同时清除排队标记
+        Timer.put(MessagePipeline.flush_redraw)
+
+    @staticmethod
+    @Timer.coalesce()
+    def flush_redraw():
+        update_screen()
+
+    @staticmethod
+    def throttle_progress(data: dict) -> bool:
+        now = time.perf_counter()
+        if data.get("value") != data.get("max") and now - MessagePipeline.progress_time < MessagePipeline.FRAME:
+            return False
+        MessagePipeline.progress_time = now
+        return True
+
+    @staticmethod
+    def put_binary(message: bytes):
+        q = MessagePipeline.binary_queue
+        while True:
+            try:
+                q.put_nowait(message)
+                break
+            except Full:
+                try:
+                    q.get_nowait()
+                    MessagePipeline.dropped += 1
+                except Empty:
+                    ...
+        if not MessagePipeline.binary_thread:
+            MessagePipeline.binary_thread = Thread(target=MessagePipeline.binary_loop, daemon=True)
+            MessagePipeline.binary_thread.start()
+
+    @staticmethod
+    def binary_loop():
+        while True:
+            message = MessagePipeline.binary_queue.get()
+            t0 = time.perf_counter()
+            for handler in MessagePipeline.BINARY_HANDLERS:
+                try:
+                    handler(message)
+                except Exception as e:
+                    logger.error("%s: %s", type(e).__name__, e)
+            MessagePipeline.record("binary", t0)
+
+    @staticmethod
+    def record(mtype: str, t0: float):
+        now = time.perf_counter()
+        cost = now - t0
+        stat = MessagePipeline.STATS.setdefault(mtype, [0, 0.0, 0.0, now])
+        stat[0] += 1
+        stat[1] += cost
+        stat[2] = max(stat[2], cost)
+
+    @staticmethod
+    def stats() -> dict:
+        now = time.perf_counter()
+        res = {}
+        for mtype, (count, total, peak, first) in list(MessagePipeline.STATS.items()):
+            res[mtype] = {"count": count,
+                          "rate": count / max(now - first, 1e-3),
+                          "avg_ms": total / count * 1000,
+                          "max_ms": peak * 1000}
+        return res
+
+    @staticmethod
+    def log_stats():
+        for mtype, stat in MessagePipeline.stats().items():
+            logger.debug("%s %s: %d, %.1f/s, avg %.2fms, max %.2fms", _T("Message Type"), mtype,
+                         stat["count"], stat["rate"], stat["avg_ms"], stat["max_ms"])
+        if MessagePipeline.dropped:
+            logger.debug("binary dropped: %d", MessagePipeline.dropped)
+
+
+class ResultCache:
+    """
+    prompt 级结果缓存(按最近使用淘汰, 总大小受 result_cache_size 限制, 默认关闭)
+        键: 服务端地址 + 规范化 prompt(排序键的json) + 所用节点的 object_info 摘要(含模型/输入文件列表)
+            + 输入图像/截图 节点引用的本地文件内容摘要
+        值: executed 结果 + 已下载的输出文件(按 /view 查询参数索引, 文件按内容哈希存储)
+        命中时不发送 prompt, 直接回放结果, 下载由本地文件提供
+        服务端同名文件被替换(模型/输入图像)时无法感知, 因此需用户主动开启
+    """
+    DIR: Path = None
+    # 读取本地文件的节点
+    FILE_NODES = {"输入图像", "截图"}
+    INDEX: OrderedDict[str, dict] = OrderedDict()
+    # (路径, 大小, 修改时间) -> 内容摘要
+    DIGESTS: dict[tuple, str] = {}
+    STATS = {"hit": 0, "miss": 0, "evict": 0}
+    lock = Lock()
+    loaded = False
+
+    @staticmethod
+    def get_limit() -> int:
+        try:
+            return get_pref().result_cache_size * 1024 * 1024
+        except Exception:
+            return 0
+
+    @staticmethod
+    def get_dir() -> Path:
+        # 放在用户数据目录, 不写入插件源码目录
+        if ResultCache.DIR is None:
+            import bpy
+            ResultCache.DIR = Path(bpy.utils.user_resource("DATAFILES", path="SDN/result_cache"))
+        return ResultCache.DIR
+
+    @staticmethod
+    def load():
+        ResultCache.loaded = True
+        try:
+            ResultCache.INDEX.update(json.loads(ResultCache.get_dir().joinpath("index.json").read_text()))
+        except FileNotFoundError:
+            ...
+        except Exception as e:
+            logger.warning(e)
+
+    @staticmethod
+    def save():
+        with ResultCache.lock:
+            try:
+                ResultCache.get_dir().mkdir(parents=True, exist_ok=True)
+                ResultCache.get_dir().joinpath("index.json").write_text(json.dumps(ResultCache.INDEX))
+            except Exception as e:
+                logger.warning(e)
+
+    @staticmethod
+    def file_digest(path: str) -> str:
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime_ns)
+        if (digest := ResultCache.DIGESTS.get(key)) is None:
+            h = hashlib.sha1()
+            with open(path, "rb") as f:
+                while chunk := f.read(1 << 20):
+                    h.update(chunk)
+            digest = ResultCache.DIGESTS[key] = h.hexdigest()
+        return digest
+
+    @staticmethod
+    def make_key(prompt: dict, url: str) -> str:
+        from .nodes import ParseCache
+        h = hashlib.sha1(url.encode("utf8"))
+        h.update(json.dumps(prompt, sort_keys=True, ensure_ascii=False, default=str).encode("utf8"))
+        files = set()
+        for node in prompt.values():
+            class_type = node.get("class_type", "")
+            # 节点描述变化(模型列表/输入目录文件列表/自定义节点更新)时键随之变化
+            h.update(f"{class_type}:{ParseCache.DIGESTS.get(class_type, '')}".encode("utf8"))
+            if class_type not in ResultCache.FILE_NODES:
+                continue
+            for v in node.get("inputs", {}).values():
+                if isinstance(v, str) and len(v) < 1024 and "\n" not in v and os.path.isfile(v):
+                    files.add(v)
+        for path in sorted(files):
+            h.update(path.encode("utf8"))
+            h.update(ResultCache.file_digest(path).encode("utf8"))
+        return h.hexdigest()
+
+    @staticmethod
+    def get(key: str) -> dict:
+        with ResultCache.lock:
+            if not ResultCache.loaded:
+                ResultCache.load()
+            if entry := ResultCache.INDEX.get(key):
+                ResultCache.INDEX.move_to_end(key)
+                ResultCache.STATS["hit"] += 1
+            else:
+                ResultCache.STATS["miss"] += 1
+        return entry
+
+    @staticmethod
+    def begin(task: Task, key: str):
+        task.cache_key = key
+        task.cache_results = []
+        task.cache_files = {}
+
+    @staticmethod
+    def abort(task: Task):
+        if task:
+            task.cache_key = None
+
+    @staticmethod
+    def record(task: Task, res: dict):
+        if task.cache_key:
+            task.cache_results.append(deepcopy(res))
+
+    @staticmethod
+    def commit(task: Task):
+        """
+        任务执行完成时登记结果, 之后下载的文件仍会写入同一条目
+        """
+        if not task or not task.cache_key or not task.cache_results:
+            return
+        with ResultCache.lock:
+            ResultCache.INDEX[task.cache_key] = {"results": task.cache_results, "files": task.cache_files}
+            ResultCache.INDEX.move_to_end(task.cache_key)
+        ResultCache.evict()
+
+    @staticmethod
+    def replay(task: Task, entry: dict):
+        task.cache_hit = True
+        task.cache_files = entry["files"]
+        logger.info("%s: %s", _T("Result Cache Hit"), task.prompt_id)
+        for res in entry["results"]:
+            res = deepcopy(res)
+            res["prompt_id"] = task.prompt_id
+            TaskManager.push_res(res)
+        task.set_finished()
+        TaskManager.mark_finished(with_noexe=False, task=task)
+
+    @staticmethod
+    def lookup(task: Task, url: str) -> Path:
+        if not task or not task.cache_hit:
+            return None
+        with ResultCache.lock:
+            item = task.cache_files.get(urlparse(url).query)
+        if item and (path := ResultCache.get_dir() / item[0]).exists():
+            return path
+        return None
+
+    @staticmethod
+    def store_file(task: Task, url: str, data: bytes):
+        if not task or not task.cache_key:
+            return
+        query = urlparse(url).query
+        filename = parse_qs(query).get("filename", [""])[0]
+        name = hashlib.sha1(data).hexdigest() + Path(filename).suffix
+        path = ResultCache.get_dir() / name
+        try:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(data)
+        except Exception as e:
+            logger.warning(e)
+            return
+        with ResultCache.lock:
+            task.cache_files[query] = [name, len(data)]
+        if task.cache_key in ResultCache.INDEX:
+            ResultCache.evict()
+
+    @staticmethod
+    def evict():
+        limit = ResultCache.get_limit()
+        removed = set()
+        with ResultCache.lock:
+            total = sum(size for e in ResultCache.INDEX.values() for _, size in e["files"].values())
+            while ResultCache.INDEX and total > limit:
+                _, entry = ResultCache.INDEX.popitem(last=False)
+                total -= sum(size for _, size in entry["files"].values())
+                removed.update(name for name, _ in entry["files"].values())
+                ResultCache.STATS["evict"] += 1
+            # 相同内容的文件可能被多个条目引用
+            removed -= {name for e in ResultCache.INDEX.values() for name, _ in e["files"].values()}
+        for name in removed:
+            ResultCache.get_dir().joinpath(name).unlink(missing_ok=True)
+        ResultCache.save()
+
+
 class TaskManager:
     _instance = None
     server: Server = FakeServer()
     task_queue = Queue()
     res_queue = Queue()
+    # 任务调度条件: push_task / mark_finished 时唤醒 poll_task, 替代sleep轮询
+    dispatch_cond = Condition()
+    # 已提交到服务端但尚未执行完成的任务 prompt_id -> Task
+    inflight: OrderedDict[str, Task] = OrderedDict()
+    # poll_task线程中正在执行pre_fn的任务
+    submitting_task: Task = None
     SessionId = {"SessionId": "ComfyUICUP" + str(time.time_ns())}
     status = {}
-    progress = {}
     executing = {}
+    # 正在服务端执行的任务(进度条/二进制预览), 其余状态均记录在各自的 Task 上
     cur_task: Task = None
-    execute_status_record = []
+    # interrupt/clear_all 时递增, 流水线据此停止继续提交
+    cancel_generation = 0
     error_msg = []
     progress_bar = 0
     timers = []
     executer = ThreadPoolExecutor(max_workers=1)
+    # interrupt/删除队列等控制请求: 在后台并发发送, 不阻塞主线程
+    control_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="SDNControl")
+    CONTROL_TIMEOUT = 3
     ws: WebSocketApp = None
     is_server_launching = False
 
@@ -887,7 +1487,9 @@ class TaskManager:
 
     @staticmethod
     def get_progress():
-        return TaskManager.progress
+        if task := TaskManager.cur_task:
+            return task.progress
+        return {}
 
     @staticmethod
     def get_task_num():
@@ -907,14 +1509,10 @@ class TaskManager:
     def run_server(fake=False):
         def refresh_node():
             Timer.clear()  # timer may cause crash
-            from .tree import rtnode_reg, rtnode_unreg
+            from .tree import rtnode_refresh
             t1 = time.time()
-            rtnode_unreg()
-            t2 = time.time()
-            logger.info(_T("UnregNode Time:") + f" {t2 - t1:.2f}s")
-            rtnode_reg()
-            t3 = time.time()
-            logger.info(_T("RegNode Time:") + f" {t3 - t2:.2f}s")
+            rtnode_refresh()
+            logger.info(_T("RegNode Time:") + f" {time.time() - t1:.2f}s")
         if TaskManager.is_launching():
             return
 
@@ -958,6 +1556,7 @@ class TaskManager:
         running = TaskManager.server.run()
         if not TaskManager.server.exited() and running:
             logger.warning(_T("Server Launched"))
+            ServerPool.init()
             TaskManager.start_polling()
             callback()
         else:
@@ -975,7 +1574,11 @@ class TaskManager:
     @staticmethod
     def restart_server(fake=False):
         TaskManager.clear_all()
+        ServerPool.close()
         TaskManager.server.close()
+        with TaskManager.dispatch_cond:
+            TaskManager.inflight.clear()
+            TaskManager.cur_task = None
         TaskManager.run_server(fake=fake)
 
     @staticmethod
@@ -987,20 +1590,68 @@ class TaskManager:
         TaskManager.restart_server(fake=True)
 
     @staticmethod
-    def push_task(task, pre=None, post=None, tree=None):
+    def push_task(task, pre=None, post=None, tree=None, server: Server = None):
+        """
+        server: 预先选定的服务端(如流水线已将图像上传到该服务端), 为空时提交时再选择
+        """
         logger.debug(_T('Add Task'))
         if not TaskManager.is_launched():
             TaskManager.put_error_msg(_T("Server Not Launched, Add Task Failed"))
             TaskManager.put_error_msg(_T("Please Check ComfyUI Directory"))
             logger.error(_T("Server Not Launched"))
             return
-        TaskManager.task_queue.put(Task(task, pre=pre, post=post, tree=tree))
+        t = Task(task, pre=pre, post=post, tree=tree)
+        t.server = server
+        TaskManager.task_queue.put(t)
+        TaskManager.notify_dispatch()
+
+    @staticmethod
+    def notify_dispatch():
+        with TaskManager.dispatch_cond:
+            TaskManager.dispatch_cond.notify_all()
+
+    @staticmethod
+    def get_inflight_window() -> int:
+        try:
+            return get_pref().max_inflight_prompts
+        except Exception:
+            return 1
+
+    @staticmethod
+    def find_task(prompt_id) -> Task:
+        """
+        按prompt_id查找任务, 消息无prompt_id时(旧版ComfyUI)回退到cur_task
+        未知的prompt_id(其他客户端/已取消的任务)返回None
+        """
+        if not prompt_id:
+            return TaskManager.cur_task
+        with TaskManager.dispatch_cond:
+            return TaskManager.inflight.get(prompt_id)
+
+    @staticmethod
+    def rekey_inflight(task: Task, prompt_id):
+        with TaskManager.dispatch_cond:
+            if TaskManager.inflight.pop(task.prompt_id, None) is None:
+                return
+            task.prompt_id = prompt_id
+            TaskManager.inflight[prompt_id] = task
+
+    @staticmethod
+    def set_running_task(task: Task):
+        if not task or task is TaskManager.cur_task:
+            return
+        TaskManager.cur_task = task
 
     @staticmethod
     def push_res(res):
         logger.debug(_T("Add Result"))
-        TaskManager.cur_task.res.put(res)
-        TaskManager.res_queue.put(TaskManager.cur_task)
+        task = TaskManager.find_task(res.get("prompt_id"))
+        if not task:
+            return
+        task.mark_time("result")
+        ResultCache.record(task, res)
+        task.res.put(res)
+        TaskManager.res_queue.put(task)
 
     @staticmethod
     def clear_cache():
@@ -1019,46 +1670,88 @@ class TaskManager:
     #         ...
     #     return ""
 
+    @staticmethod
+    def send_control(req: request.Request) -> Future:
+        def f(req: request.Request):
+            from http.client import RemoteDisconnected
+            try:
+                request.urlopen(req, timeout=TaskManager.CONTROL_TIMEOUT).close()
+            except (URLError, RemoteDisconnected, TimeoutError):
+                ...
+            except Exception as e:
+                logger.error(e)
+        return TaskManager.control_executor.submit(f, req)
+
     @staticmethod
     def interrupt():
-        from http.client import RemoteDisconnected
-        import traceback
-        req = request.Request(f"{TaskManager.server.get_url()}/interrupt", method="POST")
-        try:
-            request.urlopen(req)
-        except URLError:
-            ...
-        except RemoteDisconnected:
-            ...
-        except Exception:
-            traceback.print_exc()
+        TaskManager.cancel_generation += 1
+        for server in ServerPool.get_servers() or [TaskManager.server]:
+            req = request.Request(f"{server.get_url()}/interrupt", method="POST")
+            TaskManager.send_control(req)
 
     @staticmethod
     def clear_all():
         TaskManager.interrupt()
         while not TaskManager.task_queue.empty():
             TaskManager.task_queue.get()
-        TaskManager.progress = {}
+        TaskManager.delete_pending()
+        TaskManager.notify_dispatch()
+
+    @staticmethod
+    def delete_pending():
+        """
+        删除已提交但未开始执行的prompt
+        """
+        pending: dict[str, list[str]] = {}
+        with TaskManager.dispatch_cond:
+            for pid, t in list(TaskManager.inflight.items()):
+                if t is TaskManager.cur_task:
+                    continue
+                pending.setdefault(t.get_url(), []).append(pid)
+                TaskManager.inflight.pop(pid, None)
+        for url, pids in pending.items():
+            data = json.dumps({"delete": pids}).encode()
+            req = request.Request(f"{url}/queue", data=data, method="POST")
+            TaskManager.send_control(req)
+
+    @staticmethod
+    def is_dispatchable() -> bool:
+        if TaskManager.task_queue.empty():
+            return False
+        window = TaskManager.get_inflight_window() * max(len(ServerPool.get_servers()), 1)
+        return len(TaskManager.inflight) < window
 
     @staticmethod
     def poll_task():
         uid = TaskManager.server.uid
+        cond = TaskManager.dispatch_cond
         while uid == TaskManager.server.uid:
-            time.sleep(0.1)
-            if TaskManager.progress:
-                continue
-            if TaskManager.task_queue.empty():
+            with cond:
+                # timeout 仅用于检测服务重启(uid变化)后退出线程
+                cond.wait_for(TaskManager.is_dispatchable, timeout=1)
+            if uid != TaskManager.server.uid:
+                break
+            if not TaskManager.is_dispatchable():
                 continue
             task = TaskManager.task_queue.get()
-            TaskManager.progress = {'value': 0, 'max': 1}
             logger.debug(_T("Submit Task"))
-            TaskManager.cur_task = task
+            with cond:
+                TaskManager.inflight[task.prompt_id] = task
+                if not TaskManager.cur_task:
+                    task.progress = {'value': 0, 'max': 1}
+                    TaskManager.cur_task = task
+            task.mark_time("submitted")
+            if not task.server or not task.server.is_launched():
+                task.server = ServerPool.pick(exclude=task.failed_servers)
+            TaskManager.submitting_task = task
             try:
                 TaskManager.submit(task)
             except Exception as e:
                 logger.error(e)
                 TaskManager.put_error_msg(str(e), with_clear=True)
-                TaskManager.mark_finished(with_noexe=False)
+                TaskManager.mark_finished(with_noexe=False, task=task)
+            finally:
+                TaskManager.submitting_task = None
         logger.debug(_T("Poll Task Thread Exit"))
 
     @staticmethod
@@ -1074,15 +1767,36 @@ class TaskManager:
         return res
 
     @staticmethod
-    def submit(task: Task):
-        task.submit_pre()
-        task: dict[str, tuple] = task.task
+    def submit(t: Task):
+        t.submit_pre()
+        task: dict[str, tuple] = t.task
         prompt = task["prompt"]
+        # pre_fn 可返回 Future(主线程渲染+后台上传), 在发送 prompt 前等待完成
+        pending = []
         for node in prompt:
-            prompt[node][1]()
+            if isinstance(res := prompt[node][1](), Future):
+                pending.append(res)
         TaskManager.clear_error_msg()
 
         def queue_task(task: dict):
+            try:
+                for future in pending:
+                    # 主线程部分最多等待 START_TIMEOUT 秒开始(可能被 Timer.clear 丢弃), 后续上传自带超时
+                    if isinstance(source := getattr(future, "source", future), MainThreadFuture):
+                        source.wait(Timer.START_TIMEOUT)
+                    future.result()
+            except Exception as e:
+                logger.error(e)
+                TaskManager.put_error_msg(str(e), with_clear=True)
+                TaskManager.mark_finished(with_noexe=False, task=t)
+                return
+            if task.get("api") == "prompt" and not task.get("no_cache") and ResultCache.get_limit():
+                key = ResultCache.make_key({node: task.get("prompt")[node][0] for node in task.get("prompt")}, t.get_url())
+                if entry := ResultCache.get(key):
+                    History.put_history(task.get("workflow"))
+                    ResultCache.replay(t, entry)
+                    return
+                ResultCache.begin(t, key)
             res = TaskManager.query_server_task()
             logger.debug("P/R: %s/%s", len(res["queue_pending"]), len(res["queue_running"]))
 
@@ -1092,70 +1806,110 @@ class TaskManager:
 
                 cid = TaskManager.SessionId["SessionId"]
                 content = {"client_id": cid,
+                           "prompt_id": t.prompt_id,
                            "prompt": prompt,
                            "extra_data": {
                                "extra_pnginfo": {"workflow": task.get("workflow")}
                            }}
-                data = json.dumps(content).encode()
-                req = request.Request(f"{TaskManager.server.get_url()}/{api}", data=data)
+                data = encode_prompt(content, get_pref().stream_prompt_json)
+                req = request.Request(f"{t.get_url()}/{api}", data=data, headers={"Content-Type": "application/json"})
                 History.put_history(task.get("workflow"))
                 # logger.debug(f'post to {TaskManager.server.get_url()}/{api}:')
                 # logger.debug(data.decode())
                 try:
-                    request.urlopen(req)
+                    resp = json.loads(request.urlopen(req).read().decode())
+                    if (prompt_id := resp.get("prompt_id")) and prompt_id != t.prompt_id:
+                        TaskManager.rekey_inflight(t, prompt_id)
                 except request.HTTPError as e:
                     print(_T("Invalid Node Connection"))
                     TaskManager.put_error_msg(_T("Invalid Node Connection"))
                     err_parser = TaskErrPaser()
                     err_parser.parse(e)
                     if err_parser.error_info:
-                        TaskManager.mark_finished_with_info([])
+                        TaskManager.mark_finished_with_info([], task=t)
                     else:
-                        TaskManager.mark_finished()
-                except URLError:
+                        TaskManager.mark_finished(task=t)
+                except URLError as e:
+                    if TaskManager.failover(t, e):
+                        return
                     TaskManager.put_error_msg(_T("Server Not Launched"))
-                    TaskManager.mark_finished(with_noexe=False)
+                    TaskManager.mark_finished(with_noexe=False, task=t)
                 except Exception as e:
                     logger.error(e)
                     TaskManager.put_error_msg(str(e))
-                    TaskManager.mark_finished(with_noexe=False)
+                    TaskManager.mark_finished(with_noexe=False, task=t)
             else:
                 ...
         TaskManager.executer.submit(queue_task, task)
         # Thread(target=queue_task, args=(task, )).start()
 
     @staticmethod
-    def mark_finished(with_noexe=True):
-        TaskManager.progress = {}
-        TaskManager.cur_task = None
-        if not TaskManager.execute_status_record and with_noexe:
+    def failover(task: Task, reason) -> bool:
+        """
+        服务端(含主服务端)不可用时将任务重新放回队列, 由其他服务端执行(pre_fn会重新执行以上传到新服务端)
+        主服务端不会被关闭, 只在该任务重新分配时跳过
+        """
+        failed = task.server or TaskManager.server
+        if task.retries >= len(ServerPool.servers):
+            return False
+        if not any(s is not failed and s not in task.failed_servers for s in ServerPool.get_servers()):
+            return False
+        ServerPool.mark_down(failed, reason)
+        task.failed_servers.append(failed)
+        task.retries += 1
+        task.server = None
+        with TaskManager.dispatch_cond:
+            TaskManager.inflight.pop(task.prompt_id, None)
+            if task is TaskManager.cur_task:
+                TaskManager.cur_task = next(iter(TaskManager.inflight.values()), None)
+            task.prompt_id = str(uuid.uuid4())
+        TaskManager.task_queue.put(task)
+        TaskManager.notify_dispatch()
+        return True
+
+    @staticmethod
+    def remove_task(task: Task = None):
+        """
+        从inflight中移除任务, 若为当前执行任务则切换到下一个已提交任务
+        """
+        with TaskManager.dispatch_cond:
+            task = task or TaskManager.cur_task
+            if task:
+                TaskManager.inflight.pop(task.prompt_id, None)
+            if task is TaskManager.cur_task:
+                TaskManager.cur_task = next(iter(TaskManager.inflight.values()), None)
+            TaskManager.dispatch_cond.notify_all()
+
+    @staticmethod
+    def mark_finished(with_noexe=True, task: Task = None):
+        task = task or TaskManager.cur_task
+        TaskManager.remove_task(task)
+        if task and not task.executed_nodes and with_noexe:
             TaskManager.put_error_msg(_T("Node Tree Not Executed, May Caused by:"))
             TaskManager.put_error_msg(f"    1.{_T('Params Not Changed')}")
             TaskManager.put_error_msg(f"    2.{_T('Input Image Error')}")
             TaskManager.put_error_msg(f"    3.{_T('Node Connection Error')}")
             TaskManager.put_error_msg(f"    4.{_T('Server Not Launched')}")
-        TaskManager.execute_status_record.clear()
 
     @staticmethod
-    def mark_finished_with_info(info):
-        TaskManager.progress = {}
-        TaskManager.cur_task = None
+    def mark_finished_with_info(info, task: Task = None):
+        TaskManager.remove_task(task)
         for i in info:
             TaskManager.put_error_msg(i)
-        TaskManager.execute_status_record.clear()
 
     @staticmethod
     def proc_res():
         uid = TaskManager.server.uid
         while uid == TaskManager.server.uid:
-            time.sleep(0.1)
-            if TaskManager.res_queue.empty():
+            try:
+                # timeout 仅用于检测服务重启(uid变化)后退出线程
+                task = TaskManager.res_queue.get(timeout=1)
+            except Empty:
                 continue
-            task = TaskManager.res_queue.get()
             if task.res.empty():
                 continue
-            logger.debug(_T("Proc Result"))
             res = task.res.get()
+            logger.debug("%s: %.3fs", _T("Proc Result"), time.perf_counter() - task.timestamps.get("result", 0))
             node = res["node"]
             prompt = task.task["prompt"]
             if node in prompt:
@@ -1192,23 +1946,26 @@ class TaskManager:
             logger.error("Error when playing sound:", e)
 
     @staticmethod
-    def poll_res():
+    def poll_res(server: Server = None):
         tm = TaskManager
         SessionId = TaskManager.SessionId
 
         def on_message(ws, message):
+            t0 = time.perf_counter()
             if isinstance(message, bytes):
-                if tm.cur_task:
-                    tm.cur_task.binary_message = message
-                TaskManager.handle_binary_message(message)
+                MessagePipeline.put_binary(message)
                 return
             msg = json.loads(message)
+            mtype = dispatch(msg, message)
+            MessagePipeline.record(mtype, t0)
+
+        def dispatch(msg, message):
             try:
                 from .custom_support import crystools_monitor, cup_monitor
                 if crystools_monitor.process_msg(msg):
-                    return
+                    return "crystools"
                 if cup_monitor.process_msg(msg):
-                    return
+                    return "cup"
             except Exception:
                 ...
             mtype = msg["type"]
@@ -1228,7 +1985,7 @@ class TaskManager:
             elif mtype != "progress":
                 logger.debug("%s: %s", _T("Message Type"), mtype)
 
-            Timer.put(update_screen)
+            MessagePipeline.request_redraw()
 
             if hasattr(tm, mtype):
                 setattr(tm, mtype, data)
@@ -1238,15 +1995,19 @@ class TaskManager:
                 SessionId["SessionId"] = data.get("sid", SessionId["SessionId"])
                 TaskManager.try_play_finished_sound(data)
             elif mtype == "executing":
-                {"type": "executing", "data": {"node": "7"}}
-                if not data["node"]:
-                    if tm.cur_task:
-                        tm.cur_task.set_finished()
-                    tm.mark_finished()
+                {"type": "executing", "data": {"node": "7", "prompt_id": "xxx"}}
+                task = tm.find_task(data.get("prompt_id"))
+                if not task:
+                    ...
+                elif not data["node"]:
+                    task.set_finished()
+                    ResultCache.commit(task)
+                    tm.mark_finished(task=task)
+                    MessagePipeline.log_stats()
                 else:
-                    TaskManager.execute_status_record.append(data["node"])
-                    if tm.cur_task:
-                        tm.cur_task.set_executing_node_id(n)
+                    task.executed_nodes.append(data["node"])
+                    tm.set_running_task(task)
+                    task.set_executing_node_id(n)
                 # logger.debug(data)
             elif mtype == "progress":
                 m = 40
@@ -1256,11 +2017,13 @@ class TaskManager:
                 cf = "\033[92m" + "█" * v + "\033[0m"
                 cp = "\033[32m" + "░" * (m - v) + "\033[0m"
                 content = f"{v * 100 / m:3.0f}% " + cf + cp + f" {v}/{m}"
-                logger.info(content + "\r", extra={"same_line": True})
+                if MessagePipeline.throttle_progress(data):
+                    logger.info(content + "\r", extra={"same_line": True})
                 # sys.stdout.write(content)
                 # sys.stdout.flush()
-                if tm.cur_task:
-                    tm.cur_task.set_process(data)
+                if task := tm.find_task(data.get("prompt_id")):
+                    task.progress = data
+                    task.set_process(data)
 
             elif mtype == "executed":
                 {"node": "9", "output": {"images": ["ComfyUI_00028_.png"]}}
@@ -1290,9 +2053,10 @@ class TaskManager:
                     err_parser.error_info = {"node_errors": {node_id: node_error}}
                     Timer.put(err_parser.node_error_parse)
                 logger.error(_msg)
+                ResultCache.abort(tm.find_task(data.get("prompt_id")))
 
             elif mtype == "execution_start":
-                ...
+                tm.set_running_task(tm.find_task(data.get("prompt_id")))
             elif mtype == "execution_interrupted":
                 {"type": "execution_interrupted",
                  "data": {"prompt_id": "e1f3cbf9-4b83-47cf-95c3-9f9a76ab5508",
@@ -1301,6 +2065,7 @@ class TaskManager:
                           "executed": ["4", "7", "6", "5"]}
                  }
                 TaskManager.put_error_msg(_T("Execute Node Cancelled!"))
+                ResultCache.abort(tm.find_task(data.get("prompt_id")))
                 # tm.mark_finished(with_noexe=False)
             elif mtype == "execution_cached":
                 # {"type": "execution_cached", "data": {"nodes": ["12", "7", "10"], "prompt_id": "ddd"}}
@@ -1308,6 +2073,15 @@ class TaskManager:
                 ...  # pass
             else:
                 logger.error(message)
+            return mtype
+        if server:
+            listen_addr = f"ws://{server.get_ip()}:{server.get_port()}/ws?clientId={SessionId['SessionId']}"
+            ws = WebSocketApp(listen_addr, on_message=on_message)
+            server.ws = ws
+            ws.run_forever()
+            logger.debug("%s: %s", _T("Poll Result Thread Exit"), server.get_url())
+            ServerPool.mark_down(server, "websocket closed")
+            return
         listen_addr = f"ws://{get_ip()}:{get_port()}/ws?clientId={SessionId['SessionId']}"
         ws = WebSocketApp(listen_addr, on_message=on_message)
         TaskManager.ws = ws
@@ -1330,23 +2104,6 @@ class TaskManager:
         if TaskManager.server.is_launched():
             Timer.put((TaskManager.restart_server, True))
 
-    @staticmethod
-    def handle_binary_message(data):
-        # 解析二进制数据的前4个字节获取事件类型
-        event_type = struct.unpack(">I", data[:4])[0]
-        # 根据事件类型处理数据
-        if event_type != 1:
-            logger.debug("Unknown binary event type: %s", event_type)
-            return
-        # 处理图像类型
-        image_type = struct.unpack(">I", data[4:8])[0]
-        image_mime = "image/png" if image_type == 2 else "image/jpeg"
-        # 假设剩余的数据是图像数据，可以保存或进一步处理
-        image_data = data[8:]
-        return
-        with open(f"/Users/karrycharon/Desktop/000.{image_mime.split('/')[1]}", "wb") as f:
-            f.write(image_data)
-
 
 def removetemp():
     tempdir = Path(__file__).parent / "temp"
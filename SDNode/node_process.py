@@ -1,13 +1,19 @@
 import bpy
 import blf
 import gpu
+import os
+import time
 import struct
 import tempfile
+import threading
+from io import BytesIO
 from pathlib import Path
-from functools import lru_cache
+from threading import Lock
 from mathutils import Vector
-from .manager import TaskManager
-from ..utils import _T
+from .manager import TaskManager, MessagePipeline
+from ..utils import _T, logger, PixelTransfer
+from ..timer import Timer
+from ..preference import get_pref
 from ..Linker.linker import DrawRectangle, VecWorldToRegScale, UiScale
 
 FONT_ID = 0
@@ -18,41 +24,164 @@ FONT_ID = 0
 #         if sp.type == "NODE_EDITOR":
 #             return sp
 #     return None
-@lru_cache
-def load_texture(data: bytes) -> gpu.types.GPUTexture:
-    if not data:
-        return
-    # 解析二进制数据的前4个字节获取事件类型
-    event_type = struct.unpack(">I", data[:4])[0]
-    # 根据事件类型处理数据
-    if event_type != 1:
-        return
-    # 处理图像类型
-    image_type = struct.unpack(">I", data[4:8])[0]
-    image_mime = ".png" if image_type == 2 else ".jpeg"
-    img_path = Path(tempfile.gettempdir()).joinpath("rviewport").with_suffix(image_mime)
-    img_path.write_bytes(data[8:])
-    bl_img = bpy.data.images.load(img_path.as_posix())
-    gpu_img = gpu.texture.from_image(bl_img)
-    bpy.data.images.remove(bl_img)
-    img_path.unlink()
-    return gpu_img
-
-
-def display_texture(texture: bytes, loc, size):
+class LivePreview:
     """
-    显示图片纹理
+    采样过程中的实时预览
+        二进制消息线程: 解析帧头, 每个任务只保留最新一帧, 按 live_preview_fps 限频解码
+            限频期间到达的帧延后解码, 保证最后一帧能显示
+        主线程: 把解码结果写入复用的 bpy 图像, 绘制时直接取其 GPU 纹理
+    有 PIL 时在二进制线程解码为像素; 否则写入临时文件, 由主线程重载复用图像解码
     """
-    tex = load_texture(texture)
-    if not tex:
-        return
-    loc = loc.copy()
-    loc.y += 20
-    pos = VecWorldToRegScale(loc)
-    from gpu_extras.presets import draw_texture_2d
-    w = size
-    h = tex.height / tex.width * size
-    draw_texture_2d(tex, pos, w, h)
+    IMAGE_NAME = ".SDN_LivePreview"
+    TEMP = Path(tempfile.gettempdir()).joinpath("sdn_live_preview")
+    FRAMES = {}
+    lock = Lock()
+    # 二进制线程和延后解码的 threading.Timer 可能同时解码, 用独立的锁串行化
+    decode_lock = Lock()
+    last_decode = 0
+    trailing: threading.Timer = None
+    shown: dict = None
+    decoded = 0
+    dropped = 0
+
+    @staticmethod
+    def handle(data: bytes):
+        task = TaskManager.cur_task
+        if not task or len(data) < 8:
+            return
+        event_type, image_type = struct.unpack(">II", data[:8])
+        if event_type != 1:
+            return
+        fps = get_pref().live_preview_fps
+        if fps <= 0:
+            return
+        frame = {"task": task,
+                 "node": task.executing_node_id,
+                 "suffix": ".png" if image_type == 2 else ".jpeg",
+                 "data": data[8:]}
+        with LivePreview.lock:
+            old = LivePreview.FRAMES.get(task)
+            if old and old is not LivePreview.shown:
+                LivePreview.dropped += 1
+            for t in [t for t in LivePreview.FRAMES if t.is_finished]:
+                LivePreview.FRAMES.pop(t)
+            LivePreview.FRAMES[task] = frame
+        delay = LivePreview.last_decode + 1 / fps - time.perf_counter()
+        if delay > 0:
+            LivePreview.schedule(delay)
+            return
+        LivePreview.flush(frame)
+
+    @staticmethod
+    def schedule(delay: float):
+        with LivePreview.lock:
+            if LivePreview.trailing:
+                return
+            LivePreview.trailing = threading.Timer(delay, LivePreview.flush_latest)
+            LivePreview.trailing.daemon = True
+            LivePreview.trailing.start()
+
+    @staticmethod
+    def flush_latest():
+        with LivePreview.lock:
+            LivePreview.trailing = None
+            frame = LivePreview.FRAMES.get(TaskManager.cur_task)
+        if not frame:
+            return
+        try:
+            LivePreview.flush(frame)
+        except Exception as e:
+            logger.debug("Live preview: %s", e)
+
+    @staticmethod
+    def flush(frame: dict):
+        with LivePreview.decode_lock:
+            # 同一帧只解码一次
+            if "pixels" in frame or "path" in frame:
+                return
+            LivePreview.last_decode = time.perf_counter()
+            LivePreview.decode(frame)
+            LivePreview.decoded += 1
+        # 已排队时由 Timer 合并, Timer.clear 会同时清除排队标记
+        Timer.put(LivePreview.upload)
+
+    @staticmethod
+    def decode(frame: dict):
+        try:
+            from PIL import Image
+        except ImportError:
+            # 写完再替换, 主线程重载时不会读到半个文件
+            path = LivePreview.TEMP.with_suffix(frame["suffix"])
+            tmp = path.with_name(path.name + ".tmp")
+            try:
+                tmp.write_bytes(frame["data"])
+                os.replace(tmp, path)
+                frame["path"] = path.as_posix()
+            except OSError as e:
+                logger.debug("Live preview: %s", e)
+            return
+        import numpy as np
+        img = Image.open(BytesIO(frame["data"])).convert("RGBA")
+        frame["size"] = img.size
+        frame["pixels"] = (np.asarray(img, dtype=np.float32)[::-1] / 255).ravel()
+
+    @staticmethod
+    @Timer.coalesce()
+    def upload():
+        task = TaskManager.cur_task
+        with LivePreview.lock:
+            frame = LivePreview.FRAMES.get(task)
+        if not frame or frame is LivePreview.shown:
+            return
+        img = bpy.data.images.get(LivePreview.IMAGE_NAME)
+        if "pixels" in frame:
+            w, h = frame["size"]
+            if img and img.source != "GENERATED":
+                bpy.data.images.remove(img)
+                img = None
+            if not img:
+                img = bpy.data.images.new(LivePreview.IMAGE_NAME, w, h, alpha=True)
+            elif tuple(img.size) != (w, h):
+                img.scale(w, h)
+            PixelTransfer.write(img, frame["pixels"])
+            img.update()
+        elif "path" in frame:
+            if img and (img.source != "FILE" or img.filepath != frame["path"]):
+                bpy.data.images.remove(img)
+                img = None
+            try:
+                if not img:
+                    img = bpy.data.images.load(frame["path"])
+                    img.name = LivePreview.IMAGE_NAME
+                else:
+                    img.reload()
+            except RuntimeError as e:
+                logger.debug("Live preview: %s", e)
+                return
+        else:
+            return
+        LivePreview.shown = frame
+        MessagePipeline.request_redraw()
+
+    @staticmethod
+    def draw(task, loc, size):
+        frame = LivePreview.shown
+        if not frame or frame["task"] is not task or frame["node"] != task.executing_node_id:
+            return
+        img = bpy.data.images.get(LivePreview.IMAGE_NAME)
+        if not img or not img.size[0]:
+            return
+        tex = gpu.texture.from_image(img)
+        loc = loc.copy()
+        loc.y += 20
+        pos = VecWorldToRegScale(loc)
+        from gpu_extras.presets import draw_texture_2d
+        w = size
+        h = img.size[1] / img.size[0] * size
+        draw_texture_2d(tex, pos, w, h)
+
+
+MessagePipeline.BINARY_HANDLERS.append(LivePreview.handle)
 
 
 def display_text(text, pos, size=50, color=(0, 0.7, 0.0, 1.0)):
@@ -100,7 +229,7 @@ def draw():
     loc = n.location.copy()
     loc.y += 10
     pos = VecWorldToRegScale(loc)
-    display_texture(task.binary_message, loc, calc_size(view2d, n.width))
+    LivePreview.draw(task, loc, calc_size(view2d, n.width))
     display_text(head, pos, size, (0, 1, 0.0, 1.0))
     if not task.process:
         return
@@ -4,16 +4,20 @@ import os
 import json
 import math
 import re
+import pickle
 from hashlib import md5
 from math import ceil
 from typing import Set, Any
 from pathlib import Path
 from random import random as rand
 from functools import lru_cache
+from bisect import bisect_left
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 from mathutils import Vector, Matrix
 from bpy.types import Context, Event
 from .utils import SELECTED_COLLECTIONS, get_default_tree
-from ..utils import logger, Icon, _T, read_json
+from ..utils import logger, Icon, _T, read_json, FSWatcher
 from ..datas import ENUM_ITEMS_CACHE, IMG_SUFFIX
 from ..timer import Timer
 from ..translations import ctxt, get_reg_name, get_ori_name
@@ -146,38 +150,181 @@ def calc_hash_type(stype):
     return hash_type
 
 
+class PreviewIndex:
+    """
+    模型目录的预览图索引, 每个目录只扫描一次
+        mtimes: {相对目录: st_mtime_ns} 扫描时目录本身及所有子目录的 mtime
+        images: {相对路径(normcase): 相对路径} 目录下(含子目录)所有预览图, 用于精确查找
+        stems: [(stem(normcase), 相对路径)] 顶层预览图按 stem 排序, 用于模糊查找
+    扫描/校验在后台线程进行, 完成前查找使用已有索引(或没有结果), 完成后清空查找结果和枚举缓存
+    目录由 FSWatcher 递归监听, 变化后重建; 索引保存到 PATH, 下次启动时所有子目录 mtime 未变则直接复用
+    """
+    PATH = Path(__file__).parent / "preview_index.json"
+    INDEX: dict[str, dict] = {}
+    FOUND: dict[tuple[str, str], str] = {}  # (目录, item) -> 预览图路径, 空字符串表示没有
+    CHECKED: set[str] = set()
+    lock = Lock()
+    loaded = False
+    # 索引更新时递增, 防止查找期间目录变化后写回过期结果
+    generation = 0
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PreviewIndex")
+
+    @staticmethod
+    def load():
+        PreviewIndex.loaded = True
+        if not PreviewIndex.PATH.exists():
+            return
+        try:
+            data = json.loads(PreviewIndex.PATH.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning("%s: %s", _T("Preview Index Load Failed"), e)
+            return
+        for d, entry in data.items():
+            # 旧格式只有顶层 mtime, 需要重新扫描
+            if "mtimes" in entry:
+                PreviewIndex.INDEX[d] = PreviewIndex.make_entry(entry["mtimes"], entry["images"])
+
+    @staticmethod
+    def save():
+        data = {d: {"mtimes": e["mtimes"], "images": list(e["images"].values())} for d, e in PreviewIndex.INDEX.items()}
+        try:
+            PreviewIndex.PATH.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        except Exception as e:
+            logger.warning("%s: %s", _T("Preview Index Save Failed"), e)
+
+    @staticmethod
+    def make_entry(mtimes: dict[str, int], images: list[str]) -> dict:
+        stems = sorted((os.path.normcase(Path(i).stem), i) for i in images if "/" not in i)
+        return {"mtimes": mtimes,
+                "images": {os.path.normcase(i): i for i in images},
+                "stems": stems}
+
+    @staticmethod
+    def scan(d: str) -> dict:
+        images = []
+        mtimes = {}
+        for root, _, files in os.walk(d):
+            rel = Path(root).relative_to(d).as_posix()
+            try:
+                mtimes[rel] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            for file in files:
+                if Path(file).suffix.lower() not in IMG_SUFFIX:
+                    continue
+                images.append(file if rel == "." else f"{rel}/{file}")
+        return PreviewIndex.make_entry(mtimes, images)
+
+    @staticmethod
+    def is_fresh(d: str, entry: dict) -> bool:
+        # 新增/删除/重命名文件或子目录都会改变所在目录的 mtime
+        for rel, mtime in entry["mtimes"].items():
+            try:
+                if os.stat(os.path.join(d, rel)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def get(d: str) -> dict:
+        with PreviewIndex.lock:
+            if not PreviewIndex.loaded:
+                PreviewIndex.load()
+            entry = PreviewIndex.INDEX.get(d)
+            if d in PreviewIndex.CHECKED:
+                return entry
+            PreviewIndex.CHECKED.add(d)
+        # 每次会话只在后台校验一次, 之后由 FSWatcher 负责更新
+        PreviewIndex.executor.submit(PreviewIndex.refresh, d, True)
+        return entry
+
+    @staticmethod
+    def refresh(d: str, watch=False):
+        """
+        后台线程: 索引过期时重新扫描
+        """
+        try:
+            if not os.path.isdir(d):
+                return
+            if watch:
+                FSWatcher.register(d, PreviewIndex.on_change, recursive=True)
+            with PreviewIndex.lock:
+                entry = PreviewIndex.INDEX.get(d)
+            if entry and PreviewIndex.is_fresh(d, entry):
+                return
+            entry = PreviewIndex.scan(d)
+            with PreviewIndex.lock:
+                PreviewIndex.INDEX[d] = entry
+                PreviewIndex.save()
+                for key in [k for k in PreviewIndex.FOUND if d in k[0]]:
+                    PreviewIndex.FOUND.pop(key)
+                PreviewIndex.generation += 1
+            Timer.put(ENUM_ITEMS_CACHE.clear, Timer.BACKGROUND)
+        except Exception as e:
+            logger.warning("%s: %s", _T("Preview Index Scan Failed"), e)
+
+    @staticmethod
+    def on_change(path: Path):
+        FSWatcher.consume_change(path)
+        PreviewIndex.executor.submit(PreviewIndex.refresh, str(path))
+
+    @staticmethod
+    def find(dirs: list[str], item: str) -> str:
+        """
+        先在所有目录中精确查找, 都没有时再模糊查找
+        """
+        key = (tuple(dirs), item)
+        with PreviewIndex.lock:
+            if key in PreviewIndex.FOUND:
+                return PreviewIndex.FOUND[key]
+            generation = PreviewIndex.generation
+        entries = [(d, e) for d in dirs if (e := PreviewIndex.get(d))]
+        found = ""
+        for finder in (PreviewIndex.find_exact, PreviewIndex.find_fuzzy):
+            for d, entry in entries:
+                if found := finder(entry, item):
+                    found = Path(d, found).as_posix()
+                    break
+            if found:
+                break
+        with PreviewIndex.lock:
+            if generation == PreviewIndex.generation:
+                PreviewIndex.FOUND[key] = found
+        return found
+
+    @staticmethod
+    def find_exact(entry: dict, item: str) -> str:
+        # item文件名 替换/追加 jpg/png后缀
+        images = entry["images"]
+        for suffix in IMG_SUFFIX:
+            for name in (Path(item).with_suffix(suffix).as_posix(), item + suffix):
+                if found := images.get(os.path.normcase(name)):
+                    return found
+        return ""
+
+    @staticmethod
+    def find_fuzzy(entry: dict, item: str) -> str:
+        # 顶层目录中 stem 以 item 前缀开头的图片, 最后退回子串匹配
+        prefix = os.path.normcase(Path(item).stem)
+        stems = entry["stems"]
+        i = bisect_left(stems, (prefix, ""))
+        if i < len(stems) and stems[i][0].startswith(prefix):
+            return stems[i][1]
+        for stem, found in stems:
+            if prefix in stem:
+                return found
+        return ""
+
+
 class PropGen:
     @staticmethod
     def _find_icon_local(nname, inp_name, item):
         prev_path_list = get_icon_path(nname).get(inp_name)
         if not prev_path_list:
             return 0
-
-        file_list = []
-        for prev_path in prev_path_list:
-            pp = Path(prev_path)
-            if not pp.exists():
-                continue
-            # 直接搜索 prev_path_list + item文件名 + jpg/png后缀
-            for suffix in IMG_SUFFIX:
-                ipath = pp.joinpath(item)
-                pimg = ipath.with_suffix(suffix)
-                pimg = pimg if pimg.exists() else Path(ipath.as_posix() + suffix)
-                if not pimg.exists():
-                    continue
-                return Icon.reg_icon(pimg.absolute())
-            for file in pp.iterdir():
-                file_list.append(file)
-        item_prefix = Path(item).stem
-        # file_list = [file for prev_path in prev_path_list for file in Path(prev_path).iterdir()]
-        for file in file_list:
-            if (item not in file.stem) and (item_prefix not in file.stem):
-                continue
-            if file.suffix.lower() not in IMG_SUFFIX:
-                continue
-            # logger.info(f"🌟 Found Icon -> {file.name}")
-            return Icon.reg_icon(file.absolute())
-        # logger.info(f"🌚 No Icon <- {file.name}")
+        if found := PreviewIndex.find([os.path.normpath(p) for p in prev_path_list], item):
+            return Icon.reg_icon(Path(found).absolute())
         return Icon["NONE"]
 
     @staticmethod
@@ -216,7 +363,8 @@ class PropGen:
                 if nname not in ENUM_ITEMS_CACHE:
                     ENUM_ITEMS_CACHE[nname] = {}
                 if inp_name in ENUM_ITEMS_CACHE[nname]:
-                    return ENUM_ITEMS_CACHE[nname][inp_name]
+                    Icon.touch(items := ENUM_ITEMS_CACHE[nname][inp_name])
+                    return items
                 items = []
                 # 专门用于 老版本的 翻译
                 spec_trans = {"输入": "Input",
@@ -532,6 +680,8 @@ class NodeBase(bpy.types.Node):
     sdn_level: bpy.props.IntProperty(default=0)
     sdn_dirty: bpy.props.BoolProperty(default=False)
     sdn_hide: bpy.props.BoolProperty(default=False)
+    sdn_no_cache: bpy.props.BoolProperty(default=False, name="No Result Cache",
+                                         description="Always execute on the server when this node is in the tree")
     sdn_socket_visible_in: bpy.props.CollectionProperty(type=SDNConfig)
     sdn_socket_visible_out: bpy.props.CollectionProperty(type=SDNConfig)
     id: bpy.props.StringProperty(default="-1")
@@ -626,6 +776,9 @@ class NodeBase(bpy.types.Node):
 
     def set_dirty(self, value=True):
         self.sdn_dirty = value
+        if value:
+            from .tree import TreeTracker
+            TreeTracker.mark_dirty_node(self)
 
     def is_group(self) -> bool:
         return False
@@ -636,8 +789,13 @@ class NodeBase(bpy.types.Node):
         return tree
 
     def get_blueprints(self):
+        # 蓝图按节点类缓存, 重绘/序列化时只需一次属性查找
+        cls = self.__class__
+        if bp := cls.__dict__.get("_blueprint"):
+            return bp
         from .blueprints import get_blueprints
-        return get_blueprints(self.class_type)
+        bp = cls._blueprint = get_blueprints(self.class_type)
+        return bp
 
     def get_ctxt(self) -> str:
         from ..translations.translation import get_ctxt
@@ -732,11 +890,9 @@ class NodeBase(bpy.types.Node):
 
     def unique_id(self):
         pool = self.pool_get()
-        for i in range(3, 99999):
-            i = str(i)
-            if i not in pool:
-                pool.add(i)
-                return i
+        i = pool.next_free()
+        pool.add(i)
+        return i
 
     def free(self):
         self.pool_get().discard(self.id)
@@ -786,6 +942,7 @@ class NodeBase(bpy.types.Node):
         row = layout.row(align=True)
         row.label(text=self.name, icon="NODE")
         row.prop(self, "sdn_hide", text="", icon="HIDE_ON" if self.sdn_hide else "HIDE_OFF")
+        row.prop(self, "sdn_no_cache", text="", icon="CANCEL" if self.sdn_no_cache else "FILE_CACHE")
         self._draw_(context, layout, ext=True)
 
     def draw_label(self):
@@ -934,9 +1091,9 @@ class NodeBase(bpy.types.Node):
         bp = self.get_blueprints()
         return bp.load(self, data, with_id)
 
-    def dump(self, selected_only=False):
+    def dump(self, selected_only=False, all_links=None):
         bp = self.get_blueprints()
-        return bp.dump(self, selected_only)
+        return bp.dump(self, selected_only, all_links=all_links)
 
     def post_fn(self, task, result):
         bp = self.get_blueprints()
@@ -944,7 +1101,7 @@ class NodeBase(bpy.types.Node):
 
     def pre_fn(self):
         bp = self.get_blueprints()
-        bp.pre_fn(self)
+        return bp.pre_fn(self)
 
     def make_serialize(self, parent: NodeBase = None) -> dict:
         bp = self.get_blueprints()
@@ -1154,6 +1311,8 @@ class Ops_Add_SaveImage(bpy.types.Operator):
         inp = node.inputs[0]
         if not inp.is_linked:
             return {"FINISHED"}
+        from .tree import LazyNodeReg
+        LazyNodeReg.ensure("存储")
         save_image_node = tree.nodes.new("存储")
         save_image_node.location = node.location
         save_image_node.location.y += 200
@@ -1161,6 +1320,20 @@ class Ops_Add_SaveImage(bpy.types.Operator):
         return {"FINISHED"}
 
 
+class Ops_Add_Node(bpy.types.Operator):
+    bl_idname = "sdn.add_node"
+    bl_label = "Add Node"
+    bl_description = "Register the node type if needed and add it"
+    bl_translation_context = ctxt
+    node_type: bpy.props.StringProperty()
+
+    def invoke(self, context, event):
+        from .tree import LazyNodeReg
+        LazyNodeReg.ensure(self.node_type)
+        bpy.ops.node.add_node("INVOKE_DEFAULT", type=self.node_type, use_transform=True)
+        return {"FINISHED"}
+
+
 class Ops_Active_Tex(bpy.types.Operator):
     bl_idname = "sdn.act_tex"
     bl_label = "选择纹理"
@@ -1546,8 +1719,80 @@ class AdvTextEdit(bpy.types.Operator):
             self.dump_list(node, stat)
 
 
+class ParseCache:
+    """
+    object_info 解析结果的磁盘缓存, 以节点描述的内容哈希为键
+        digests: {节点名: 原始描述哈希}
+        object_info: 预处理后的节点描述(pre_filter/输出规范化之后)
+        socket_type/socket_hash_map/sockets: socket 解析结果
+    bpy 类无法序列化, 命中时只跳过解析, 类仍需重新生成
+    """
+    VERSION = 1
+    PATH = Path(__file__).parent / "object_info_cache.pkl"
+    DIGESTS: dict[str, str] = {}  # 当前已注册节点的描述哈希
+
+    @staticmethod
+    def calc_digest(desc: dict) -> str:
+        return md5(json.dumps(desc, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def calc_digests(object_info: dict) -> dict[str, str]:
+        return {name: ParseCache.calc_digest(desc) for name, desc in object_info.items()}
+
+    @staticmethod
+    def load(digests: dict[str, str]) -> dict:
+        if not ParseCache.PATH.exists():
+            return {}
+        try:
+            data = pickle.loads(ParseCache.PATH.read_bytes())
+        except Exception as e:
+            logger.warning("%s: %s", _T("Parse Cache Load Failed"), e)
+            return {}
+        if data.get("version") != ParseCache.VERSION or data.get("digests") != digests:
+            return {}
+        return data
+
+    @staticmethod
+    def save(data: dict):
+        data["version"] = ParseCache.VERSION
+        try:
+            ParseCache.PATH.write_bytes(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning("%s: %s", _T("Parse Cache Save Failed"), e)
+
+    @staticmethod
+    def update(digests: dict[str, str], object_info: dict, removed=()):
+        """
+        局部更新缓存(仅变化节点重新解析后调用)
+        """
+        try:
+            data = pickle.loads(ParseCache.PATH.read_bytes())
+        except Exception:
+            return
+        for name in removed:
+            for k in ("digests", "object_info", "socket_type"):
+                data[k].pop(name, None)
+        data["digests"].update(digests)
+        data["object_info"].update(object_info)
+        data["socket_type"].update({name: NodeParser.SOCKET_TYPE.get(name, {}) for name in object_info})
+        data["socket_hash_map"] = dict(SOCKET_HASH_MAP)
+        data["sockets"] = set(data["sockets"]) | NodeParser.SOCKETS
+        ParseCache.save(data)
+
+    @staticmethod
+    def diff(digests: dict[str, str]) -> tuple[list[str], list[str]]:
+        """
+        与已注册节点比较, 返回 (新增或变化的节点, 移除的节点)
+        """
+        old = ParseCache.DIGESTS
+        changed = [name for name, digest in digests.items() if old.get(name) != digest]
+        removed = [name for name in old if name not in digests]
+        return changed, removed
+
+
 class NodeParser:
     CACHED_OBJECT_INFO = {}
+    SOCKETS = set()  # 已解析的 socket 类型
     SOCKET_TYPE = {}  # NodeType: {PropName: SocketType}
     OBJECT_INFO_REQ = None
     DIFF_PATH = Path(__file__).parent / "diff_object_info.json"
@@ -1634,24 +1879,41 @@ class NodeParser:
             self.diff_object_info.pop(name, None)
         return self.diff_object_info
 
-    def parse(self, diff=False):
+    def parse(self, diff=False, object_info: dict = None):
+        """
+        object_info: 指定节点描述(不从服务端获取), 用于只解析变化的节点
+        """
         if diff:
-            self.object_info = self.find_diff()
+            self.object_info = self.find_diff() if object_info is None else object_info
         else:
             logger.warning("Parsing Node Start")
-            self.object_info = self.fetch_object()
+            self.object_info = self.fetch_object() if object_info is None else object_info
             self.SOCKET_TYPE.clear()
             self.load_internal()
         # self.CACHED_OBJECT_INFO.update(deepcopy(self.ori_object_info))
+        digests = ParseCache.calc_digests(self.object_info)
+        cache = {} if diff else ParseCache.load(digests)
+        if cache:
+            logger.info(_T("Parse Cache Hit: %s nodes"), len(digests))
+            self.object_info = cache["object_info"]
+            self.SOCKET_TYPE.update(cache["socket_type"])
+            SOCKET_HASH_MAP.update(cache["socket_hash_map"])
+            sockets = cache["sockets"]
         try:
-            socket_clss = self._parse_sockets_clss()
+            if not cache:
+                sockets = self._get_socket_desc()
+            socket_clss = self._parse_sockets_clss(sockets)
         except Exception as e:
             import traceback
             traceback.print_exc()
             logger.error("socket模板解析失败, 请联系开发者")
             raise Exception("socket模板解析失败") from e
         try:
-            node_clss = self._parse_node_clss()
+            nodes_desc = self.object_info if cache else self._get_n_desc()
+            if not cache:
+                # 生成节点类时会修改描述, 需要在此之前序列化
+                snapshot = pickle.dumps(nodes_desc, protocol=pickle.HIGHEST_PROTOCOL)
+            node_clss = self._parse_node_clss(nodes_desc)
         except Exception as e:
             logger.error("节点模板解析失败, 可能由不标准的第三方节点导致, 请联系开发者")
             raise Exception("节点模板解析失败") from e
@@ -1660,8 +1922,19 @@ class NodeParser:
         except Exception as e:
             logger.error("节点树解析失败, 可能由不标准的第三方节点导致, 请联系开发者")
             raise Exception("节点树解析失败") from e
-        if not diff:
-            logger.warning("Parsing Node Finished!")
+        self.SOCKETS.update(sockets)
+        if diff:
+            ParseCache.DIGESTS.update(digests)
+            ParseCache.update(digests, pickle.loads(snapshot))
+            return nodetree_desc, node_clss, socket_clss
+        ParseCache.DIGESTS = digests
+        if not cache:
+            ParseCache.save({"digests": digests,
+                             "object_info": pickle.loads(snapshot),
+                             "socket_type": dict(self.SOCKET_TYPE),
+                             "socket_hash_map": dict(SOCKET_HASH_MAP),
+                             "sockets": sockets})
+        logger.warning("Parsing Node Finished!")
         return nodetree_desc, node_clss, socket_clss
 
     def _get_n_desc(self):
@@ -1776,9 +2049,10 @@ class NodeParser:
                 self.object_info.pop(name)
         return _desc
 
-    def _parse_sockets_clss(self):
+    def _parse_sockets_clss(self, sockets=None):
         socket_clss = []
-        sockets = self._get_socket_desc()
+        if sockets is None:
+            sockets = self._get_socket_desc()
         for stype in sockets:
             if stype in {"ENUM", }:
                 continue
@@ -1821,8 +2095,9 @@ class NodeParser:
             socket_clss.append(InterfaceDesc)
         return socket_clss
 
-    def _parse_node_clss(self):
-        nodes_desc = self._get_n_desc()
+    def _parse_node_clss(self, nodes_desc=None):
+        if nodes_desc is None:
+            nodes_desc = self._get_n_desc()
         node_clss = []
         for nname, ndesc in nodes_desc.items():
             opt_types: dict = ndesc["input"].get("optional", {})
@@ -1943,7 +2218,7 @@ class Images(bpy.types.PropertyGroup):
     image: bpy.props.PointerProperty(type=bpy.types.Image)
 
 
-clss = [SDNConfig, MLTText, MLTRec, MLTWords_UL_UIList, MLTText_UL_UIList, Ops_Switch_Socket_Disp, Ops_Switch_Socket_Widget, Ops_Add_SaveImage, Set_Render_Res, GetSelCol, AdvTextEdit, Ops_Active_Tex, Ops_Link_Mask, Images]
+clss = [SDNConfig, MLTText, MLTRec, MLTWords_UL_UIList, MLTText_UL_UIList, Ops_Switch_Socket_Disp, Ops_Switch_Socket_Widget, Ops_Add_SaveImage, Ops_Add_Node, Set_Render_Res, GetSelCol, AdvTextEdit, Ops_Active_Tex, Ops_Link_Mask, Images]
 
 reg, unreg = bpy.utils.register_classes_factory(clss)
 
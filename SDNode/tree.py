@@ -13,15 +13,15 @@ from string import ascii_letters, digits
 from bpy.app.translations import pgettext
 from threading import Thread
 from functools import partial
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from bpy.types import NodeTree
 from nodeitems_utils import NodeCategory, NodeItem, unregister_node_categories, _node_categories
-from .nodes import nodes_reg, nodes_unreg, NodeParser, NodeBase, clear_nodes_data_cache
+from .nodes import nodes_reg, nodes_unreg, NodeParser, ParseCache, NodeBase, clear_nodes_data_cache
 from ..utils import logger, Icon, rgb2hex, hex2rgb, _T, FSWatcher
 from ..datas import EnumCache
 from ..timer import Timer
 from ..translations import ctxt, get_ori_name
-from .utils import THelper
+from .utils import THelper, LinkIndex
 from contextlib import contextmanager
 
 TREE_NAME = "CFNODES_SYS"
@@ -32,12 +32,213 @@ class InvalidNodeType(Exception):
     ...
 
 
+class TreeTracker:
+    """
+    记录发生变化的节点树, update_tick 只处理有变化的树
+        TOPOLOGY: 节点/连接增删(需重新计算id和执行顺序)
+        PROPS: 属性变化(只需同步 PrimitiveNode 和 dirty 节点)
+    msgbus 通知不携带实例信息, 因此属性变化时标记所有树
+    """
+    TOPOLOGY: set[int] = set()
+    PROPS: set[int] = set()
+    PROPS_ALL = False
+    DIRTY_NODES: dict[int, set[str]] = {}
+    PRIMITIVES: dict[int, list[str]] = {}
+    GENERATIONS: dict[int, int] = {}
+    GROUP_GENERATION = 0
+    GROUPED: set[int] = set()
+    owner = object()
+
+    @staticmethod
+    def mark_topology(tree: NodeTree):
+        key = tree.session_uid
+        TreeTracker.TOPOLOGY.add(key)
+        TreeTracker.GENERATIONS[key] = TreeTracker.GENERATIONS.get(key, 0) + 1
+        # 组节点/组输入输出的序列化依赖内外两层树的连接, 这些树变化时还需使所有相关树失效
+        grouped = any(n.bl_idname in {"SDNGroup", "NodeGroupInput", "NodeGroupOutput"} for n in tree.nodes)
+        if grouped or key in TreeTracker.GROUPED:
+            TreeTracker.GROUP_GENERATION += 1
+        if grouped:
+            TreeTracker.GROUPED.add(key)
+        else:
+            TreeTracker.GROUPED.discard(key)
+
+    @staticmethod
+    def generation(key: int, grouped=False) -> tuple[int, int]:
+        """
+        树的拓扑版本号, 组内节点(grouped)或含组节点的树额外依赖 GROUP_GENERATION
+        """
+        group_gen = TreeTracker.GROUP_GENERATION if grouped or key in TreeTracker.GROUPED else 0
+        return TreeTracker.GENERATIONS.get(key, 0), group_gen
+
+    @staticmethod
+    def mark_props(tree: NodeTree):
+        TreeTracker.PROPS.add(tree.session_uid)
+
+    @staticmethod
+    def mark_dirty_node(node: bpy.types.Node):
+        key = node.id_data.session_uid
+        TreeTracker.DIRTY_NODES.setdefault(key, set()).add(node.name)
+        TreeTracker.PROPS.add(key)
+
+    @staticmethod
+    def mark_all_props():
+        TreeTracker.PROPS_ALL = True
+
+    @staticmethod
+    @bpy.app.handlers.persistent
+    def mark_all(*_):
+        """
+        撤销/重做/加载文件后无法得知具体变化, 标记所有树
+        """
+        TreeTracker.DIRTY_NODES.clear()
+        TreeTracker.PRIMITIVES.clear()
+        CFNodeTree.ORDER_CACHE.clear()
+        from .blueprints import SerializeCache
+        SerializeCache.clear()
+        for tree in bpy.data.node_groups:
+            if tree.bl_idname != TREE_TYPE:
+                continue
+            TreeTracker.mark_topology(tree)
+
+    @staticmethod
+    def pop(tree: NodeTree) -> tuple[bool, bool]:
+        key = tree.session_uid
+        topology = key in TreeTracker.TOPOLOGY
+        props = key in TreeTracker.PROPS or TreeTracker.PROPS_ALL
+        TreeTracker.TOPOLOGY.discard(key)
+        TreeTracker.PROPS.discard(key)
+        return topology, props
+
+    @staticmethod
+    def pop_dirty_nodes(tree: NodeTree) -> set[str]:
+        return TreeTracker.DIRTY_NODES.pop(tree.session_uid, set())
+
+    @staticmethod
+    def reg():
+        bpy.msgbus.clear_by_owner(TreeTracker.owner)
+        bpy.msgbus.subscribe_rna(
+            key=bpy.types.Node,
+            owner=TreeTracker.owner,
+            args=(),
+            notify=TreeTracker.mark_all_props,
+            options={"PERSISTENT"}
+        )
+        for handler in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+            if TreeTracker.mark_all not in handler:
+                handler.append(TreeTracker.mark_all)
+        TreeTracker.mark_all()
+
+    @staticmethod
+    def unreg():
+        bpy.msgbus.clear_by_owner(TreeTracker.owner)
+        for handler in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+            if TreeTracker.mark_all in handler:
+                handler.remove(TreeTracker.mark_all)
+
+
+class LazyNodeReg:
+    """
+    节点类按需注册: 解析后的节点类先保存在 PENDING, 在以下时机才注册
+        1. 从添加菜单/搜索添加节点
+        2. load_json_ex 加载工作流
+        3. 打开的 .blend 中存在该类型的节点
+    保存时在树上记录使用的节点类型(TYPES_KEY), 加载文件时据此注册
+    """
+    PENDING: dict[str, type] = {}
+    TYPES_KEY = "SDN_NODE_TYPES"
+    reg_count = 0
+    reg_time = 0.0
+
+    @staticmethod
+    def add(node_clss: list[type]):
+        for c in node_clss:
+            LazyNodeReg.PENDING[c.__name__] = c
+
+    @staticmethod
+    def is_pending(name: str) -> bool:
+        return name in LazyNodeReg.PENDING
+
+    @staticmethod
+    def ensure(*names: str) -> int:
+        """
+        注册指定类型(未解析或已注册的类型忽略), 返回新注册的数量
+        """
+        names = [n for n in names if n in LazyNodeReg.PENDING]
+        if not names:
+            return 0
+        t1 = time.time()
+        count = 0
+        for name in names:
+            c = LazyNodeReg.PENDING.pop(name)
+            try:
+                bpy.utils.register_class(c)
+            except Exception as e:
+                logger.error(f"Failed to register {c} -> {e}")
+                continue
+            clss.append(c)
+            count += 1
+        cost = time.time() - t1
+        LazyNodeReg.reg_count += count
+        LazyNodeReg.reg_time += cost
+        logger.info("%s: %s (%.3fs) -> %s/%s, %.2fs", _T("Lazy Register Node"), count, cost,
+                    LazyNodeReg.reg_count, LazyNodeReg.reg_count + len(LazyNodeReg.PENDING), LazyNodeReg.reg_time)
+        return count
+
+    @staticmethod
+    def ensure_all():
+        LazyNodeReg.ensure(*list(LazyNodeReg.PENDING))
+
+    @staticmethod
+    def ensure_tree(tree: NodeTree):
+        if not LazyNodeReg.PENDING:
+            return
+        missing = {n.bl_idname for n in tree.nodes if not n.is_registered_node_type()}
+        if not missing:
+            return
+        names = missing & LazyNodeReg.PENDING.keys()
+        if LazyNodeReg.TYPES_KEY in tree:
+            names.update(tree[LazyNodeReg.TYPES_KEY].split("\n"))
+        elif missing - names:
+            # 未定义节点无法得知原类型且树上没有记录时只能全部注册
+            LazyNodeReg.ensure_all()
+            return
+        LazyNodeReg.ensure(*names)
+
+    @staticmethod
+    @bpy.app.handlers.persistent
+    def ensure_all_trees(*_):
+        for tree in bpy.data.node_groups:
+            if tree.bl_idname != TREE_TYPE:
+                continue
+            LazyNodeReg.ensure_tree(tree)
+
+    @staticmethod
+    @bpy.app.handlers.persistent
+    def record_all(*_):
+        for tree in bpy.data.node_groups:
+            if tree.bl_idname != TREE_TYPE:
+                continue
+            types = sorted({n.bl_idname for n in tree.nodes if n.is_registered_node_type()})
+            tree[LazyNodeReg.TYPES_KEY] = "\n".join(types)
+
+    @staticmethod
+    def clear():
+        LazyNodeReg.PENDING.clear()
+        LazyNodeReg.reg_count = 0
+        LazyNodeReg.reg_time = 0.0
+
+
 class CFNodeItem(NodeItem):
     translation_context = ctxt
 
     def draw(self, layout, context):
         col = layout.column()
         col.enabled = self.new_btn_enable(layout, context)
+        if LazyNodeReg.is_pending(self.nodetype):
+            props = col.operator("sdn.add_node", text=pgettext(self.label), text_ctxt=ctxt)
+            props.node_type = self.nodetype
+            return
         props = col.operator("node.add_node", text=pgettext(self.label), text_ctxt=ctxt)
         props.type = self.nodetype
         props.use_transform = True
@@ -105,50 +306,104 @@ class CFNodeTree(NodeTree):
     root: bpy.props.BoolProperty(default=True)
     freeze: bpy.props.BoolProperty(default=False, description="冻结更新")
     __metadata__ = {}
+    # session_uid -> (topology_hash, [node.name...]) 执行顺序缓存
+    ORDER_CACHE: dict[int, tuple[int, list[str]]] = {}
 
     class Pool:
+        """
+        节点id池
+            内存中按树(session_uid)维护索引, add/discard/contains/next_free 均为O(1)
+            仅在文件保存时写回 tree["ID_POOL"], 首次访问时从 tree["ID_POOL"] 读取
+        """
+        INDEX: dict[int, CFNodeTree.Pool.Index] = {}
+        MIN_ID = 3
+
+        class Index:
+            def __init__(self, ids: set) -> None:
+                self.ids = ids
+                self.hint = CFNodeTree.Pool.MIN_ID
+                self.dirty = False
+
         def __init__(self, tree: CFNodeTree) -> None:
             self.tree = tree
+            self.index = self._get_index()
 
         def add(self, id):
-            pool = self._get_id_pool()
-            pool.add(id)
-            self._set_id_pool(pool)
+            self.index.ids.add(id)
+            self.index.dirty = True
 
         def discard(self, id):
-            pool = self._get_id_pool()
-            pool.discard(id)
-            self._set_id_pool(pool)
+            self.index.ids.discard(id)
+            self.index.dirty = True
+            if isinstance(id, str) and id.isdigit():
+                self.index.hint = max(min(self.index.hint, int(id)), self.MIN_ID)
 
         def update(self, ids):
-            pool = self._get_id_pool()
-            pool.update(ids)
-            self._set_id_pool(pool)
+            self.index.ids.update(ids)
+            self.index.dirty = True
 
         def clear(self):
-            self._set_id_pool(set())
+            self.index.ids.clear()
+            self.index.hint = self.MIN_ID
+            self.index.dirty = True
+
+        def next_free(self) -> str:
+            """
+            最小的未使用id(>=3), hint 记录上次分配位置, 均摊O(1)
+            """
+            ids = self.index.ids
+            i = self.index.hint
+            while str(i) in ids:
+                i += 1
+            self.index.hint = i
+            return str(i)
+
+        def flush(self):
+            if not self.index.dirty:
+                return
+            self.tree["ID_POOL"] = pickle.dumps(set(self.index.ids))
+            self.index.dirty = False
 
         def __contains__(self, id):
-            return id in self._get_id_pool()
+            return id in self.index.ids
 
         def __or__(self, __value: Any) -> set:
-            return self._get_id_pool() | __value
+            return self.index.ids | __value
 
         def __iter__(self) -> typing.Iterator[Any]:
-            return iter(self._get_id_pool())
+            return iter(self.index.ids)
 
-        def __repr__(self) -> str:
-            return repr(self._get_id_pool())
+        def __len__(self) -> int:
+            return len(self.index.ids)
 
-        def _get_id_pool(self) -> set:
-            if "ID_POOL" not in self.tree:
-                self.tree["ID_POOL"] = pickle.dumps(set())
-            return pickle.loads(self.tree["ID_POOL"])
+        def __repr__(self) -> str:
+            return repr(self.index.ids)
+
+        def _get_index(self) -> CFNodeTree.Pool.Index:
+            key = self.tree.session_uid
+            if index := self.INDEX.get(key):
+                return index
+            ids = set()
+            if "ID_POOL" in self.tree:
+                try:
+                    ids = pickle.loads(self.tree["ID_POOL"])
+                except Exception as e:
+                    logger.warning("ID POOL load failed: %s", e)
+            index = self.INDEX[key] = self.Index(ids)
+            return index
+
+        @staticmethod
+        @bpy.app.handlers.persistent
+        def flush_all(_):
+            for tree in bpy.data.node_groups:
+                if tree.bl_idname != TREE_TYPE:
+                    continue
+                tree.get_id_pool().flush()
 
-        def _set_id_pool(self, value):
-            if not isinstance(value, set):
-                raise TypeError("ID POOL must be set")
-            self.tree["ID_POOL"] = pickle.dumps(value)
+        @staticmethod
+        @bpy.app.handlers.persistent
+        def drop_all(_):
+            CFNodeTree.Pool.INDEX.clear()
 
     def get_id_pool(self) -> Pool:
         return self.Pool(self)
@@ -204,8 +459,8 @@ class CFNodeTree(NodeTree):
             ...
 
     def update(self):
-        return
-        logger.error(f"{self.name} Update {time.time_ns()}")
+        # 节点/连接增删时由blender调用
+        TreeTracker.mark_topology(self)
 
     @contextmanager
     def with_freeze(self):
@@ -230,13 +485,18 @@ class CFNodeTree(NodeTree):
         """
         get prompts
         """
+        from .blueprints import SerializeCache
         self.validation()
         self.serialize_pre()
         prompt = {}
+        hits, misses = SerializeCache.stats()
         for node in self.get_nodes():
             if node.class_type in {"Reroute", "PrimitiveNode", "Note"}:
                 continue
             prompt.update(node.make_serialize(parent=parent))
+        if parent is None:
+            h, m = SerializeCache.stats()
+            logger.debug("Serialize Cache: hit %s / miss %s", h - hits, m - misses)
         return prompt
 
     def validation(self, nodes=None):
@@ -286,11 +546,14 @@ class CFNodeTree(NodeTree):
         # extra 需要导出 groupNodes
         groupNodes = {}
         extra = {"groupNodes": groupNodes}
+        # update 可能移除无效连接, 需在构建索引前完成
+        for node in dump_nodes:
+            node.update()
+        link_index = LinkIndex(self)
         for node in dump_nodes:
             p = node.parent
             node.parent = None
-            node.update()
-            info = node.dump(selected_only=selected_only)
+            info = node.dump(selected_only=selected_only, all_links=link_index)
             node.parent = p
             nodes_info.append(info)
             if node.is_group():
@@ -387,31 +650,30 @@ class CFNodeTree(NodeTree):
 
         # pack link info into a non-verbose format
         links = []
-        for i, link in enumerate(self.links):
+        for i, link in enumerate(link_index):
             from_node = link.from_node
             from_socket = link.from_socket
             to_node = link.to_node
             to_socket = link.to_socket
-            if not from_socket.node.is_registered_node_type():
-                logger.error(_T("Invalid Node Type: {}").format(from_socket.node.name))
-                raise InvalidNodeType(_T("Invalid Node Type: {}").format(from_socket.node.name))
-            if not to_socket.node.is_registered_node_type():
-                logger.error(_T("Invalid Node Type: {}").format(to_socket.node.name))
-                raise InvalidNodeType(_T("Invalid Node Type: {}").format(to_socket.node.name))
+            if (from_id := link_index.node_id(from_node)) is None:
+                logger.error(_T("Invalid Node Type: {}").format(from_node.name))
+                raise InvalidNodeType(_T("Invalid Node Type: {}").format(from_node.name))
+            if (to_id := link_index.node_id(to_node)) is None:
+                logger.error(_T("Invalid Node Type: {}").format(to_node.name))
+                raise InvalidNodeType(_T("Invalid Node Type: {}").format(to_node.name))
+            if selected_only and not (to_node.select and from_node.select):
+                continue
             link_info = [
                 i,
-                int(from_socket.node.id),
-                from_socket.slot_index,
-                int(to_socket.node.id),
-                to_socket.slot_index,
+                from_id,
+                link_index.slot(from_socket),
+                to_id,
+                link_index.slot(to_socket),
                 to_socket.bl_idname
             ]
             if to_node.class_type == "Reroute":
                 link_info[-1] = "*"
-            if not selected_only:
-                links.append(link_info)
-            elif to_node.select and link.from_node.select:
-                links.append(link_info)
+            links.append(link_info)
         if not dump_frames:
             dump_frames = [f for f in self.nodes if f.bl_idname == "NodeFrame"]
         groups = []
@@ -430,7 +692,7 @@ class CFNodeTree(NodeTree):
 
         data = {
             "last_node_id": max([*[int(node.id) for node in self.get_nodes()], 0]),
-            "last_link_id": len(self.links),
+            "last_link_id": len(link_index),
             "nodes": nodes_info,
             "links": links,
             "groups": groups,
@@ -465,6 +727,15 @@ class CFNodeTree(NodeTree):
 
     @load_json_wrapper
     def load_json_ex(self, data, is_group=False):
+        # 各阶段耗时: 节点组 -> 节点 -> 配置 -> 连接 -> 框
+        phases = {}
+        t1 = time.perf_counter()
+
+        def mark(phase):
+            nonlocal t1
+            t2 = time.perf_counter()
+            phases[phase] = phases.get(phase, 0) + t2 - t1
+            t1 = t2
         for node in self.get_nodes(False):
             node.select = False
         load_nodes = []
@@ -472,6 +743,10 @@ class CFNodeTree(NodeTree):
         id_node_map = {}
         pool = self.get_id_pool()
         groupNodes = data.get("extra", {}).get("groupNodes", {})
+        types = [n.get("type", "") for n in data.get("nodes", [])]
+        for group in groupNodes.values():
+            types.extend(n.get("type", "") for n in group.get("nodes", []))
+        LazyNodeReg.ensure(*set(types))
         # 先加载groupNodes
         for gname, group in groupNodes.items():
             if old_gp := bpy.data.node_groups.get(gname):
@@ -481,10 +756,12 @@ class CFNodeTree(NodeTree):
             gtree.root = False
             for link in group.get("links", []):
                 link[:5] = link[5], *link[0:4]
-            gtree.load_json(group)
+            # 同步加载: 外部组节点设置 node_tree 时即可生成接口
+            gtree.load_json_ex(group)
             gtree.nodes.new("NodeGroupInput").location = (-250, 0)
             gtree.nodes.new("NodeGroupOutput").location = (250, 0)
             gtree.__metadata__ = group
+        mark("groups")
 
         for node_info in data.get("nodes", []):
             t = node_info["type"]
@@ -519,6 +796,7 @@ class CFNodeTree(NodeTree):
                 else:
                     pool.add(old_id)
                     node.id = old_id
+        mark("nodes")
 
         for nid, cfg in data.get("config", {}).items():
             node = id_node_map[nid]
@@ -527,9 +805,14 @@ class CFNodeTree(NodeTree):
             for oindex, out in cfg.get("output", {}).items():
                 oname = node.outputs[int(oindex)].name
                 node.set_sock_visible(oname, in_out="OUTPUT", value=out.get("visible", True))
+        mark("config")
 
         self.update_editor()
         nlinks = self.dolink(data.get("links", []), id_map, id_node_map)
+        if nlinks:
+            # 组接口仍未生成的连接在下一次主线程回调中重试
+            Timer.put((self.dolink, nlinks, id_map, id_node_map))
+        mark("links")
 
         for group in data.get("groups", []):
             label = group.get("title")
@@ -551,17 +834,37 @@ class CFNodeTree(NodeTree):
             node.width = bounding[2]
             node.height = bounding[3]
             node.update()
-
-        def f(links, id_map, id_node_map):
-            # hack: wait for nodegroup sockets update
-            time.sleep(0.1)
-            Timer.put((self.dolink, links, id_map, id_node_map))
-        Thread(target=f, args=(nlinks, id_map, id_node_map)).start()
-
+        mark("frames")
+        logger.info("%s %s: %s, %s", _T("Load"), self.name, len(load_nodes),
+                    ", ".join(f"{k} {v:.3f}s" for k, v in phases.items()))
         return load_nodes
 
     def dolink(self, links, id_map, id_node_map):
+        """
+        返回因组节点接口未生成而无法连接的 links
+        """
         not_found_links = []
+        # (node, is_output) -> {slot_index: socket}
+        slot_maps = {}
+
+        def find_socket(node: NodeBase, slot, is_output):
+            sockets = node.outputs if is_output else node.inputs
+            if node.class_type == "Reroute":
+                return sockets[0] if sockets else None
+            key = (node.as_pointer(), is_output)
+            if key not in slot_maps:
+                slot_map = slot_maps[key] = {}
+                for sock in sockets:
+                    slot_map.setdefault(sock.slot_index, sock)
+            return slot_maps[key].get(slot)
+
+        def ensure_group_sockets(node: NodeBase, is_output):
+            if not node.is_group():
+                return True
+            if len(node.outputs if is_output else node.inputs) == 0:
+                node.update()
+                slot_maps.pop((node.as_pointer(), is_output), None)
+            return len(node.outputs if is_output else node.inputs) != 0
         for link in links:
             # logger.debug(link)
             if str(link[1]) not in id_map:
@@ -575,30 +878,14 @@ class CFNodeTree(NodeTree):
             if not from_node or not to_node:
                 logger.warning("Not Found Link: %s", link)
                 continue
-            if from_node.is_group() and len(from_node.outputs) == 0:
+            if not ensure_group_sockets(from_node, True):
                 not_found_links.append(link)
                 continue
-            if to_node.is_group() and len(to_node.inputs) == 0:
+            if not ensure_group_sockets(to_node, False):
                 not_found_links.append(link)
                 continue
-            from_slot = link[2]
-            to_slot = link[4]
-            find_out = None
-            for out in from_node.outputs:
-                if from_node.class_type == "Reroute":
-                    find_out = out
-                    break
-                if out.slot_index == from_slot:
-                    find_out = out
-                    break
-            find_in = None
-            for inp in to_node.inputs:
-                if to_node.class_type == "Reroute":
-                    find_in = inp
-                    break
-                if inp.slot_index == to_slot:
-                    find_in = inp
-                    break
+            find_out = find_socket(from_node, link[2], True)
+            find_in = find_socket(to_node, link[4], False)
             if find_in and find_out:
                 self.links.new(find_out, find_in)
             else:
@@ -611,12 +898,7 @@ class CFNodeTree(NodeTree):
         return [n for n in self.nodes if n.is_registered_node_type()]
 
     def clear_nodes(self):
-        def remove_nodes():
-            time.sleep(0.1)
-            self.nodes.clear()
-        t = Thread(target=remove_nodes)
-        t.start()
-        t.join()
+        self.nodes.clear()
 
     def safe_remove_nodes(self, nodes):
         def remove_nodes(tree: bpy.types.NodeTree, nodes):
@@ -632,14 +914,11 @@ class CFNodeTree(NodeTree):
         force unique id
         """
         nodes = self.get_nodes()
+        seen = set()
         for n in nodes:
-            if n.id == "-1":
+            if n.id == "-1" or n.id in seen:
                 n.apply_unique_id()
-            for nn in nodes:
-                if nn == n:
-                    continue
-                if nn.id == n.id:
-                    n.apply_unique_id()
+            seen.add(n.id)
         # 保证id从0开始
         # ids = sorted([int(n.id) for n in nodes])
         # min_id = min(ids)
@@ -651,19 +930,35 @@ class CFNodeTree(NodeTree):
         #     n.id = str(int(n.id) - min_id)
         #     pool.add(n.id)
 
-    def update_tick(self):
+    def update_tick(self, force=False):
         """
-        force update
+        update changed parts only (recorded by TreeTracker), force: full update
         """
-        self.id_clear_update()
-        self.compute_execution_order()
-        self.calc_unique_id()
-        for node in self.nodes:
-            if not node.is_registered_node_type():
-                continue
-            self.primitive_node_update(node)
-            self.dirty_nodes_update(node)
-            self.group_nodes_update(node)
+        topology, props = TreeTracker.pop(self)
+        if not (force or topology or props):
+            return
+        if topology:
+            # 追加/链接进来的树可能包含尚未注册的节点类型
+            LazyNodeReg.ensure_tree(self)
+        dirty = TreeTracker.pop_dirty_nodes(self)
+        key = self.session_uid
+        if force or topology or key not in TreeTracker.PRIMITIVES:
+            self.id_clear_update()
+            self.compute_execution_order()
+            self.calc_unique_id()
+            nodes = [n for n in self.nodes if n.is_registered_node_type()]
+            TreeTracker.PRIMITIVES[key] = [n.name for n in nodes if n.bl_idname == "PrimitiveNode"]
+            for node in nodes:
+                self.primitive_node_update(node)
+                self.dirty_nodes_update(node)
+                self.group_nodes_update(node)
+            return
+        for name in TreeTracker.PRIMITIVES[key]:
+            if (node := self.nodes.get(name)) and node.is_registered_node_type():
+                self.primitive_node_update(node)
+        for name in dirty:
+            if (node := self.nodes.get(name)) and node.is_registered_node_type():
+                self.dirty_nodes_update(node)
 
     def id_clear_update(self):
         ids = set()
@@ -706,20 +1001,36 @@ class CFNodeTree(NodeTree):
             return
         # node.update()
 
+    def topology_hash(self, nodes: list[NodeBase] = None) -> int:
+        if nodes is None:
+            nodes = self.get_nodes()
+        node_key = tuple((n.name, n.id) for n in nodes)
+        link_key = tuple((l.from_node.name, l.from_socket.identifier, l.to_node.name, l.to_socket.identifier) for l in self.links)
+        return hash((node_key, link_key))
+
     def compute_execution_order(self) -> list[NodeBase]:
         """
         Reference from ComfyUI
+        结果按拓扑hash缓存, 拓扑未变化时直接复用(sdn_level/sdn_order 已写入节点)
         """
+        nodes = self.get_nodes()
+        thash = self.topology_hash(nodes)
+        cached = CFNodeTree.ORDER_CACHE.get(self.session_uid)
+        if cached and cached[0] == thash:
+            ordered = [self.nodes.get(name) for name in cached[1]]
+            if all(ordered):
+                return ordered
         helper = THelper()
-        all_links = self.links.values()
         L = []
-        S = []  # 起始节点
+        S = deque()  # 起始节点
         M = OrderedDict()
-        visited_links = {}   # to avoid repeating links
+        visited_links = set()   # to avoid repeating links
         remaining_links = {}
+        # 预先计算每个节点的输出连接: (link_id, to_node)
+        adjacency: dict[str, list[tuple[int, NodeBase]]] = {}
 
         # 搜索无inp的节点(起始点)
-        for node in self.get_nodes():
+        for node in nodes:
             M[node.id] = node  # add to pending nodes
             # num = sum([bool(inp.links) for inp in node.inputs])  # num of input connections
             num = 0
@@ -736,41 +1047,29 @@ class CFNodeTree(NodeTree):
             else:
                 node.sdn_level = 0
                 remaining_links[node.id] = num
-        while S:
-            node = S.pop(0)  # get an starting node
-            L.append(node)  # add to ordered list
-            M.pop(node.id, None)  # remove from the pending nodes
+            out_links = adjacency[node.id] = []
             for output in node.outputs:
                 for olink in output.links:
-                    # link_id = output.links[j] # 全局 links 是一个列表,这里的 link_id 用来取link
-                    from_node = helper.find_from_node(olink)
                     to_node = helper.find_to_node(olink)
-                    if not from_node or from_node.bl_idname == "NodeGroupInput":
-                        from_node = None
-                    if not to_node or to_node.bl_idname == "NodeGroupOutput":
-                        to_node = None
-                    # _LINK_DEF = {
-                    #     "id": 1,
-                    #     "origin_id": 4,
-                    #     "origin_slot": 0,
-                    #     "target_id": 3,
-                    #     "target_slot": 0,
-                    #     "type": "MODEL",
-                    # }
-                    if to_node is None:
+                    if to_node is None or to_node.bl_idname == "NodeGroupOutput":
                         continue
                     if not to_node.is_registered_node_type():
                         continue
-                    if not to_node.sdn_level or to_node.sdn_level <= node.sdn_level:
-                        to_node.sdn_level = node.sdn_level + 1
-                    # already visited link (ignore it)
-                    link_id = all_links.index(olink)
-                    if link_id in visited_links:
-                        continue
-                    visited_links[link_id] = True  # mark as visited
-                    remaining_links[to_node.id] -= 1  # reduce the number of links remaining
-                    if remaining_links[to_node.id] == 0:
-                        S.append(to_node)
+                    out_links.append((olink.as_pointer(), to_node))
+        while S:
+            node = S.popleft()  # get an starting node
+            L.append(node)  # add to ordered list
+            M.pop(node.id, None)  # remove from the pending nodes
+            for link_id, to_node in adjacency.get(node.id, ()):
+                if not to_node.sdn_level or to_node.sdn_level <= node.sdn_level:
+                    to_node.sdn_level = node.sdn_level + 1
+                # already visited link (ignore it)
+                if link_id in visited_links:
+                    continue
+                visited_links.add(link_id)  # mark as visited
+                remaining_links[to_node.id] -= 1  # reduce the number of links remaining
+                if remaining_links[to_node.id] == 0:
+                    S.append(to_node)
         # the remaining ones (loops)
         for i in M:
             L.append(M[i])
@@ -791,6 +1090,7 @@ class CFNodeTree(NodeTree):
         # L.sort(key=lambda x: x.sdn_order)
         for i, n in enumerate(L):
             n.sdn_order = i
+        CFNodeTree.ORDER_CACHE[self.session_uid] = (thash, [n.name for n in L])
         return L
 
     def get_node_by_id(self, id):
@@ -1092,6 +1392,7 @@ def update_tree_handler():
             if group.bl_idname != TREE_TYPE:
                 continue
             group.update_tick()
+        TreeTracker.PROPS_ALL = False
     except ReferenceError:
         ...
     except Exception as e:
@@ -1140,26 +1441,71 @@ def set_draw_intern(reg):
         NODE_MT_Utils.remove(draw_intern)
 
 
-def rtnode_reg_diff():
+def rtnode_reg_diff(object_info: dict = None, removed=()):
+    """
+    只重新注册变化的节点
+        object_info: 变化的节点描述, 为空时读取 diff_object_info.json
+        removed: 需要注销的节点
+    """
     t1 = time.time()
-    _, node_clss, _ = NodeParser().parse(diff=True)
-    if not node_clss:
+    _, node_clss, socket_clss = NodeParser().parse(diff=True, object_info=object_info)
+    if not node_clss and not removed:
         return
     logger.info(f"{_T('Changed Node')}: {[c.bl_label for c in node_clss]}")
     clear_nodes_data_cache()
     clss_map = {}
     for c in clss:
-        clss_map[c.bl_label] = c
-    for c in node_clss:
-        old_c = clss_map.pop(c.bl_label, None)
+        clss_map[c.__name__] = c
+    for c in socket_clss:
+        if c.__name__ in clss_map:
+            continue
+        bpy.utils.register_class(c)
+        clss.append(c)
+    for name in removed:
+        LazyNodeReg.PENDING.pop(name, None)
+        old_c = clss_map.pop(name, None)
         if old_c:
             bpy.utils.unregister_class(old_c)
             clss.remove(old_c)
+        ParseCache.DIGESTS.pop(name, None)
+    if removed:
+        ParseCache.update({}, {}, removed)
+    for c in node_clss:
+        # 尚未注册的节点只替换待注册的类
+        if LazyNodeReg.is_pending(c.bl_label) or c.bl_label not in clss_map:
+            LazyNodeReg.add([c])
+            continue
+        old_c = clss_map.pop(c.bl_label)
+        bpy.utils.unregister_class(old_c)
+        clss.remove(old_c)
         bpy.utils.register_class(c)
         clss.append(c)
     logger.info(_T("RegNodeDiff Time:") + f" {time.time()-t1:.2f}s")
 
 
+def rtnode_refresh():
+    """
+    服务端重启后刷新节点, 已注册过节点时只注册 object_info 中变化的部分
+    """
+    if not clss or not ParseCache.DIGESTS:
+        rtnode_unreg()
+        rtnode_reg()
+        return
+    parser = NodeParser()
+    parser.object_info = parser.fetch_object()
+    parser.load_internal()
+    changed, removed = ParseCache.diff(ParseCache.calc_digests(parser.object_info))
+    logger.info(_T("Node Refresh: %s changed, %s removed"), len(changed), len(removed))
+    if not changed and not removed:
+        return
+    added = [name for name in changed if name not in ParseCache.DIGESTS]
+    rtnode_reg_diff({name: parser.object_info[name] for name in changed}, removed)
+    if added or removed:
+        # 节点增删时重建添加菜单
+        node_cat = load_node(nodetree_desc=parser._get_nt_desc())
+        reg_nodetree(TREE_NAME, node_cat)
+
+
 def rtnode_reg():
     nodes_reg()
     reg_class_internal()
@@ -1171,33 +1517,56 @@ def rtnode_reg():
         t2 = time.time()
         logger.info(_T("ParseNode Time:") + f" {t2-t1:.2f}s")
         node_cat = load_node(nodetree_desc=nt_desc)
-        clss.extend(node_clss)
+        LazyNodeReg.add(node_clss)
         clss.extend(socket_clss)
     except Exception:
         node_cat = []
     reg()
+    LazyNodeReg.ensure_all_trees()
     reg_nodetree(TREE_NAME, node_cat)  # register_node_categories(TREE_NAME, node_cat)
     set_draw_intern(reg=True)
+    if LazyNodeReg.ensure_all_trees not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.insert(0, LazyNodeReg.ensure_all_trees)
+    if LazyNodeReg.record_all not in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.append(LazyNodeReg.record_all)
     if CFNodeTree.reinit not in bpy.app.handlers.load_post:
         bpy.app.handlers.load_post.append(CFNodeTree.reinit)
+    if CFNodeTree.Pool.flush_all not in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.append(CFNodeTree.Pool.flush_all)
+    if CFNodeTree.Pool.drop_all not in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.append(CFNodeTree.Pool.drop_all)
+    TreeTracker.reg()
     if not bpy.app.timers.is_registered(update_tree_handler):
         bpy.app.timers.register(update_tree_handler, persistent=True)
 
 
 def rtnode_unreg():
     # bpy.app.timers.unregister(update_tree_handler)
+    if LazyNodeReg.ensure_all_trees in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(LazyNodeReg.ensure_all_trees)
+    if LazyNodeReg.record_all in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(LazyNodeReg.record_all)
     if CFNodeTree.reinit in bpy.app.handlers.load_post:
         bpy.app.handlers.load_post.remove(CFNodeTree.reinit)
+    if CFNodeTree.Pool.flush_all in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(CFNodeTree.Pool.flush_all)
+    if CFNodeTree.Pool.drop_all in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(CFNodeTree.Pool.drop_all)
     set_draw_intern(reg=False)
+    TreeTracker.unreg()
     if TREE_NAME in _node_categories:
         try:
             # TODO: 可能会报错, 但未做后续处理, 可能会有其他后果
             unregister_node_categories(TREE_NAME)
         except RuntimeError:
             ...
+    t1 = time.time()
+    count = len(clss)
     unreg()
     nodes_unreg()
     clss.clear()
+    logger.info("%s: %s, %.2fs", _T("Unregister Classes"), count, time.time() - t1)
+    LazyNodeReg.clear()
 
 
 def cb(path):
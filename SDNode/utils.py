@@ -307,6 +307,43 @@ class THelper:
         return link if find_link else node
 
 
+class LinkIndex:
+    """
+    一次导出内共享的 link 索引, 替代 tree.links[:].index(link) 的 O(n) 查找
+    link/socket/node 以 as_pointer() 为键, 每个 tree 每次导出只构建一次
+    """
+
+    def __init__(self, tree: bpy.types.NodeTree):
+        self.links: list[bpy.types.NodeLink] = tree.links[:]
+        self.link_map = {link.as_pointer(): i for i, link in enumerate(self.links)}
+        self.slot_map: dict[int, int] = {}
+        self.id_map: dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.links)
+
+    def __iter__(self):
+        return iter(self.links)
+
+    def index(self, link: bpy.types.NodeLink) -> int:
+        return self.link_map[link.as_pointer()]
+
+    def slot(self, sock: bpy.types.NodeSocket) -> int:
+        key = sock.as_pointer()
+        if (slot := self.slot_map.get(key)) is None:
+            slot = self.slot_map[key] = sock.slot_index
+        return slot
+
+    def node_id(self, node: bpy.types.Node) -> int:
+        """
+        未注册的节点返回 None
+        """
+        key = node.as_pointer()
+        if key not in self.id_map:
+            self.id_map[key] = int(node.id) if node.is_registered_node_type() else None
+        return self.id_map[key]
+
+
 def get_default_tree(context=None) -> bpy.types.NodeTree:
     if context is None:
         context = bpy.context
@@ -4,6 +4,8 @@ import json
 import tempfile
 import time
 from typing import Any
+from threading import Thread, Lock, Semaphore
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 from bpy.types import Context, Event
 from mathutils import Vector
@@ -14,7 +16,7 @@ from .utils import _T, logger, FSWatcher, read_json
 from .timer import Timer, Worker, WorkerFunc
 from .SDNode import TaskManager
 from .SDNode.history import History
-from .SDNode.tree import InvalidNodeType, CFNodeTree, TREE_TYPE, rtnode_reg, rtnode_unreg
+from .SDNode.tree import InvalidNodeType, CFNodeTree, TREE_TYPE, LazyNodeReg, rtnode_reg, rtnode_unreg
 from .SDNode.utils import get_default_tree
 from .datas import IMG_SUFFIX
 from .preference import get_pref
@@ -56,6 +58,129 @@ class LoopExec(WorkerFunc):
             bpy.ops.sdn.ops(action="Submit")
 
 
+class FramePipeline:
+    """
+    多帧/批量提交流水线
+        1. 主线程逐项准备(设置帧/渲染/序列化), 已准备但未提交的最多 AHEAD 项
+        2. 上传线程池并发上传(每线程复用连接), 按顺序在上传完成后提交 prompt
+           上传前先为每项选定服务端, 提交时直接使用该服务端(失败转移到其他服务端时才补传)
+        3. 结束时输出各阶段吞吐: 渲染 fps, 上传 MB/s, prompt/s
+        4. TaskManager.interrupt/clear_all 后停止准备和提交剩余项
+        5. 多个流水线(多帧/批量)依次运行, 各自的 prompt 不会交错提交
+    prepare(item) 在主线程执行, 返回需要上传的 [(node, path)]
+    """
+    AHEAD = 4
+    UPLOAD_WORKERS = 4
+    RUN_LOCK = Lock()
+
+    def __init__(self, tree: CFNodeTree, items: list, prepare, get_task, finish=None):
+        self.tree = tree
+        self.items = list(items)
+        self.prepare = prepare
+        self.get_task = get_task
+        self.finish = finish
+        self.slots = Semaphore(FramePipeline.AHEAD)
+        self.lock = Lock()
+        self.ready = {}
+        self.next_push = 0
+        self.generation = TaskManager.cancel_generation
+        self.stats = {"render": 0.0, "bytes": 0, "upload_start": 0.0, "upload_end": 0.0, "pushed": 0}
+
+    def start(self):
+        Thread(target=self.run, daemon=True).start()
+
+    def is_cancelled(self) -> bool:
+        return self.generation != TaskManager.cancel_generation
+
+    def run(self):
+        with FramePipeline.RUN_LOCK:
+            self.run_ex()
+
+    def run_ex(self):
+        t0 = time.perf_counter()
+        pool = ThreadPoolExecutor(FramePipeline.UPLOAD_WORKERS, thread_name_prefix="SDNFrameUpload")
+        futures = []
+        for i, item in enumerate(self.items):
+            self.slots.acquire()
+            if self.is_cancelled() or not TaskManager.is_launched():
+                break
+            try:
+                task, uploads = Timer.submit(self.prepare_task, item).wait(Timer.START_TIMEOUT)
+            except Exception as e:
+                logger.error("%s: %s", _T("Frame Pipeline"), e)
+                break
+            futures.append(pool.submit(self.upload, i, task, uploads))
+        wait(futures)
+        pool.shutdown()
+        if self.is_cancelled():
+            logger.info("%s: %s", _T("Frame Pipeline"), _T("Cancelled"))
+        if self.finish:
+            Timer.put(self.finish)
+        self.log_stats(time.perf_counter() - t0)
+
+    def prepare_task(self, item):
+        t0 = time.perf_counter()
+        uploads = [(node.id, path) for node, path in self.prepare(item)]
+        task = self.get_task(self.tree)
+        with self.lock:
+            self.stats["render"] += time.perf_counter() - t0
+        return task, uploads
+
+    def upload(self, index, task, uploads):
+        from .SDNode.blueprints import upload_image
+        from .SDNode.manager import ServerPool
+        with self.lock:
+            if not self.stats["upload_start"]:
+                self.stats["upload_start"] = time.perf_counter()
+        server = ServerPool.pick()
+        prompt = task["prompt"]
+        for node_id, path in uploads:
+            if self.is_cancelled():
+                break
+            upload_image(path, server_url=server.get_url())
+            if node_id in prompt:
+                # 已上传到选定的服务端, 提交时只在转移到其他服务端后补传
+                cfg, _, post_fn = prompt[node_id]
+                prompt[node_id] = (cfg, partial(FramePipeline.ensure_uploaded, path, server), post_fn)
+            try:
+                size = Path(path).stat().st_size
+            except OSError:
+                size = 0
+            with self.lock:
+                self.stats["bytes"] += size
+        with self.lock:
+            self.stats["upload_end"] = time.perf_counter()
+            self.ready[index] = (task, server)
+            while self.next_push in self.ready:
+                Timer.put((self.push, *self.ready.pop(self.next_push)))
+                self.next_push += 1
+                self.stats["pushed"] += 1
+                self.slots.release()
+
+    def push(self, task, server):
+        if self.is_cancelled():
+            return
+        TaskManager.push_task(task, tree=self.tree, server=server)
+
+    @staticmethod
+    def ensure_uploaded(path, server):
+        from .SDNode.blueprints import upload_image
+        task = TaskManager.submitting_task
+        if task and task.server is not server:
+            return Timer.background().submit(upload_image, path, task)
+
+    def log_stats(self, elapsed):
+        count = self.stats["pushed"]
+        render = self.stats["render"]
+        upload = self.stats["upload_end"] - self.stats["upload_start"]
+        logger.info("%s: %d/%d, render %.2f fps, upload %.2f MB/s, prompt %.2f/s, %.2fs",
+                    _T("Frame Pipeline"), count, len(self.items),
+                    count / render if render else 0,
+                    self.stats["bytes"] / 1024 / 1024 / upload if upload > 0 else 0,
+                    count / elapsed if elapsed else 0,
+                    elapsed)
+
+
 class Ops(bpy.types.Operator):
     bl_idname = "sdn.ops"
     bl_description = "SD Node"
@@ -197,7 +322,8 @@ class Ops(bpy.types.Operator):
         def get_task(tree: CFNodeTree):
             prompt = tree.serialize()
             workflow = tree.save_json()
-            return {"prompt": prompt, "workflow": workflow, "api": "prompt"}
+            no_cache = any(getattr(n, "sdn_no_cache", False) for n in tree.get_nodes())
+            return {"prompt": prompt, "workflow": workflow, "api": "prompt", "no_cache": no_cache}
         if bpy.context.scene.sdn.advanced_exe and not Ops.is_advanced_enable:
             Ops.is_advanced_enable = True
             if bpy.context.scene.sdn.loop_exec:
@@ -343,12 +469,25 @@ class Ops(bpy.types.Operator):
             if bpy.context.scene.sdn.frame_mode == "MultiFrame":
                 sf = bpy.context.scene.frame_start
                 ef = bpy.context.scene.frame_end
-                for cf in range(sf, ef + 1):
-                    @Timer.wait_run
-                    def pre(cf):
-                        bpy.context.scene.frame_set(cf)
-                    pre = partial(pre, cf)
-                    TaskManager.push_task(get_task(tree), pre, tree=tree)
+                render_nodes = [n for n in find_nodes_by_idname(tree, "输入图像") if n.get_blueprints().is_render(n)]
+                old_images = {n: n.image for n in render_nodes}
+
+                def prepare(cf):
+                    bpy.context.scene.frame_set(cf)
+                    uploads = []
+                    for n in render_nodes:
+                        p = Path(old_images[n] or Path(tempfile.gettempdir()).joinpath("render.png"))
+                        path = p.with_name(f"{p.stem}_{cf:04d}{p.suffix or '.png'}").as_posix()
+                        uploads.append((n, n.get_blueprints().render(n, path)))
+                    return uploads
+
+                def finish():
+                    for n, image in old_images.items():
+                        try:
+                            n.image = image
+                        except ReferenceError:
+                            ...
+                FramePipeline(tree, range(sf, ef + 1), prepare, get_task, finish).start()
             elif bpy.context.scene.sdn.frame_mode == "Batch":
                 batch_dir = bpy.context.scene.sdn.batch_dir
                 select_node = tree.nodes.active
@@ -360,15 +499,19 @@ class Ops(bpy.types.Operator):
                     self.report({"ERROR"}, "Batch Directory Not Set!")
                     return {"FINISHED"}
                 old_mode, old_image = select_node.mode, select_node.image
-                select_node.mode = "输入"
-                for file in Path(batch_dir).iterdir():
-                    if file.is_dir():
-                        continue
-                    if file.suffix not in IMG_SUFFIX:
-                        continue
+                files = [f for f in Path(batch_dir).iterdir() if not f.is_dir() and f.suffix in IMG_SUFFIX]
+
+                def prepare(file: Path):
+                    select_node.mode = "输入"
                     select_node.image = file.as_posix()
-                    TaskManager.push_task(get_task(tree), tree=tree)
-                select_node.mode, select_node.image = old_mode, old_image
+                    return [(select_node, file.as_posix())]
+
+                def finish():
+                    try:
+                        select_node.mode, select_node.image = old_mode, old_image
+                    except ReferenceError:
+                        ...
+                FramePipeline(tree, files, prepare, get_task, finish).start()
             else:
                 TaskManager.push_task(get_task(tree), tree=tree)
         return {"FINISHED"}
@@ -593,6 +736,7 @@ class Load_History(bpy.types.Operator):
     bl_label = "Load History"
     bl_description = "Load History Workflow"
     name: bpy.props.StringProperty()
+    entry_id: bpy.props.IntProperty(default=-1)
 
     @classmethod
     def poll(cls, context: Context):
@@ -603,7 +747,7 @@ class Load_History(bpy.types.Operator):
         if not tree:
             self.report({"ERROR"}, _T("No Node Tree Found!"))
             return {"FINISHED"}
-        data = History.get_history_by_name(self.name)
+        data = History.get_history_by_id(self.entry_id)
         if not data:
             self.report({"ERROR"}, _T("History Not Found: ") + self.name)
             return {"FINISHED"}
@@ -773,6 +917,7 @@ class NodeSearch(bpy.types.Operator):
         if not get_default_tree():
             self.report({'ERROR'}, _T("No NodeTree Found"))
             return {"FINISHED"}
+        LazyNodeReg.ensure(self.item)
         try:
             bpy.ops.node.add_node(use_transform=True, settings=[], type=self.item)
         except BaseException:
@@ -480,10 +480,27 @@ class AddonPreference(bpy.types.AddonPreferences):
     ip: bpy.props.StringProperty(default="127.0.0.1", name="IP", description="Service IP Address",
                                  update=ip_check)
     port: bpy.props.IntProperty(default=8189, min=1000, max=65535, name="Port", description="Service Port")
+    server_pool: bpy.props.StringProperty(default="", name="Server Pool",
+                                          description="Extra ComfyUI servers used to execute tasks, comma separated ip:port")
 
     pref_dirs: bpy.props.CollectionProperty(type=PresetsDirDesc, name="Custom Presets", description="Custom Presets")
     pref_dirs_init: bpy.props.BoolProperty(default=True, name="Init Custom Preset Path", description="Create presets/groups dir if not exists")
 
+    max_inflight_prompts: bpy.props.IntProperty(default=1, min=1, max=32, name="Max In-Flight Prompts",
+                                                description="Number of prompts submitted to ComfyUI queue at the same time")
+    stream_prompt_json: bpy.props.BoolProperty(default=False, name="Stream Prompt JSON",
+                                               description="Encode prompt JSON fragment by fragment and send it with chunked transfer")
+    icon_thumb_size: bpy.props.IntProperty(default=256, min=32, max=2048, name="Icon Thumbnail Size",
+                                           description="Max side of cached icon previews, larger images are downsampled before upload")
+    icon_cache_size: bpy.props.IntProperty(default=256, min=16, max=8192, name="Icon Cache Size (MB)",
+                                           description="Memory budget of icon previews, least recently used previews are evicted")
+    live_preview_fps: bpy.props.IntProperty(default=10, min=0, max=60, name="Live Preview FPS",
+                                            description="Max frame rate of sampling previews shown on the executing node, 0 to disable")
+    history_limit: bpy.props.IntProperty(default=500, min=1, max=100000, name="History Limit",
+                                         description="Number of submitted workflows kept in history, identical workflows are stored once")
+    result_cache_size: bpy.props.IntProperty(default=0, min=0, max=65536, name="Result Cache Size (MB)",
+                                             description="Disk budget of outputs reused for identical prompts, 0 to disable. Files replaced on the server under the same name are not detected")
+
     rt_track_freq: bpy.props.FloatProperty(default=0.5, min=0.01, name="Viewport Track Frequency")
     view_context: bpy.props.BoolProperty(default=True, name="Use View Context", description="If enalbed use scene settings, otherwise use the current 3D view for rt rendering.")
 
@@ -549,6 +566,7 @@ class AddonPreference(bpy.types.AddonPreferences):
         row = layout.row(align=True)
         row.prop(self, "ip")
         row.prop(self, "port")
+        layout.prop(self, "server_pool", text_ctxt=ctxt)
         row = layout.row(align=True, heading="Preview Image Size")
         row.prop(self, "preview_image_size_type", text="", text_ctxt=ctxt)
         col = row.column()
@@ -567,6 +585,17 @@ class AddonPreference(bpy.types.AddonPreferences):
         row.label(text="Drag Link Result Count", text_ctxt=ctxt)
         row.prop(self, "drag_link_result_count_col", text="", text_ctxt=ctxt)
         row.prop(self, "drag_link_result_count_row", text="", text_ctxt=ctxt)
+        row = layout.row(align=True)
+        row.prop(self, "max_inflight_prompts", text_ctxt=ctxt)
+        row.prop(self, "stream_prompt_json", toggle=True, text_ctxt=ctxt)
+        row = layout.row(align=True)
+        row.prop(self, "icon_thumb_size", text_ctxt=ctxt)
+        row.prop(self, "icon_cache_size", text_ctxt=ctxt)
+        row.prop(self, "live_preview_fps", text_ctxt=ctxt)
+        row = layout.row(align=True)
+        row.prop(self, "history_limit", text_ctxt=ctxt)
+        row = layout.row(align=True)
+        row.prop(self, "result_cache_size", text_ctxt=ctxt)
         if self.server_type == "Local":
             row = layout.row(align=True)
             row.prop(self, "auto_launch", toggle=True, text_ctxt=ctxt)
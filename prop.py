@@ -71,6 +71,7 @@ class Prop(bpy.types.PropertyGroup):
     def presets_items(self, context):
         pd = FSWatcher.to_path(self.presets_dir)
         if Prop.cache["presets"].get(pd) and not FSWatcher.consume_change(pd):
+            Icon.touch(Prop.cache["presets"][pd])
             return Prop.cache["presets"][pd]
         items = []
         if not pd.exists():
@@ -105,6 +106,7 @@ class Prop(bpy.types.PropertyGroup):
     def groups_items(self, context):
         gd = FSWatcher.to_path(self.groups_dir)
         if Prop.cache["groups"].get(gd) and not FSWatcher.consume_change(gd):
+            Icon.touch(Prop.cache["groups"][gd])
             return Prop.cache["groups"][gd]
         items = []
         if not gd.exists():
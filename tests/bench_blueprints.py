@@ -0,0 +1,93 @@
+"""
+蓝图查找性能对比: 改动前(每次扫描子类) / lru_cache + 函数内 import / 现在的 REGISTRY + 按节点类缓存
+需要 bpy: blender -b --factory-startup --python tests/bench_blueprints.py
+节点使用轻量替身类, 只调用 get_blueprints 和一个空方法
+"""
+import sys
+import timeit
+from functools import lru_cache
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sdn_loader  # noqa: E402
+
+blueprints = sdn_loader.load("SDNode.blueprints")
+if blueprints:
+    from sdn_loader import PKG
+    nodes = sdn_loader.load("SDNode.nodes")
+
+NODES = 500
+# 节点类中没有专用蓝图的比例(使用默认蓝图)
+PLAIN_CLASSES = 30
+REPEAT = 20
+
+
+def legacy_scan(comfyClass):
+    """
+    改动前的 get_blueprints(未加缓存)
+    """
+    for cls in blueprints.BluePrintBase.__subclasses__():
+        if cls.comfyClass != comfyClass:
+            continue
+        return cls()
+    return blueprints.BluePrintBase()
+
+
+legacy_cached = lru_cache(maxsize=1024)(legacy_scan)
+
+
+class ScanNode:
+    class_type = ""
+
+    def get_blueprints(self):
+        return legacy_scan(self.class_type)
+
+
+class CachedNode(ScanNode):
+    def get_blueprints(self):
+        # 与改动前 NodeBase.get_blueprints 相同, 每次执行函数内 import
+        get_blueprints = __import__(f"{PKG}.SDNode.blueprints", fromlist=["get_blueprints"]).get_blueprints
+        return get_blueprints(self.class_type)
+
+
+class RegistryNode(ScanNode):
+    ...
+
+
+def make_nodes(base) -> list:
+    names = list(blueprints.BluePrintBase.REGISTRY) + [f"BenchPlain{i}" for i in range(PLAIN_CLASSES)]
+    classes = []
+    for name in names:
+        attrs = {"class_type": name}
+        if base is RegistryNode:
+            attrs["get_blueprints"] = nodes.NodeBase.get_blueprints
+        classes.append(type(f"{base.__name__}_{len(classes)}", (base,), attrs))
+    return [classes[i % len(classes)]() for i in range(NODES)]
+
+
+def run_pass(node_list):
+    for node in node_list:
+        node.get_blueprints().free(node)
+
+
+def main():
+    print(f"{len(blueprints.BluePrintBase.REGISTRY)} blueprints, {NODES} nodes, best of {REPEAT}")
+    old_get = blueprints.get_blueprints
+    try:
+        for label, base, get in (("subclass scan", ScanNode, old_get),
+                                 ("lru_cache + import", CachedNode, legacy_cached),
+                                 ("registry + class cache", RegistryNode, old_get)):
+            blueprints.get_blueprints = get
+            node_list = make_nodes(base)
+            run_pass(node_list)
+            t = min(timeit.repeat(lambda: run_pass(node_list), number=1, repeat=REPEAT))
+            print(f"{label:<24} {t * 1e6:>8.0f} us / pass")
+    finally:
+        blueprints.get_blueprints = old_get
+
+
+if __name__ == "__main__":
+    if blueprints is None:
+        print("bench_blueprints needs bpy, run inside Blender")
+    else:
+        main()
@@ -0,0 +1,192 @@
+"""
+执行顺序计算性能对比: 改动前(all_links.index 查找 + list.pop(0)) / 现在的邻接表实现 / 拓扑未变化时的缓存
+需要 bpy: blender -b --factory-startup --python tests/bench_execution_order.py
+节点/连接使用轻量替身, 两种实现的执行顺序和 sdn_level 必须一致
+"""
+import random
+import sys
+import timeit
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sdn_loader  # noqa: E402
+
+tree_module = sdn_loader.load("SDNode.tree")
+if tree_module:
+    from sdn_loader import PKG
+    THelper = sys.modules[f"{PKG}.SDNode.utils"].THelper
+
+# (节点数, 每个节点的输入数)
+SIZES = ((200, 2), (1000, 2), (3000, 2))
+REPEAT = 3
+
+
+class FakeSocket:
+    def __init__(self, node: "FakeNode", identifier):
+        self.node = node
+        self.identifier = identifier
+        self.links: list[FakeLink] = []
+
+    @property
+    def is_linked(self):
+        return bool(self.links)
+
+
+class FakeLink:
+    def __init__(self, from_socket: FakeSocket, to_socket: FakeSocket):
+        self.from_socket = from_socket
+        self.to_socket = to_socket
+        self.from_node = from_socket.node
+        self.to_node = to_socket.node
+        from_socket.links.append(self)
+        to_socket.links.append(self)
+
+    def as_pointer(self):
+        return id(self)
+
+
+class FakeLinks(list):
+    def values(self):
+        return self[:]
+
+
+class FakeNodes(list):
+    def get(self, name):
+        return self.tree.node_map.get(name)
+
+
+class FakeNode:
+    def __init__(self, tree: "FakeTree", nid, inputs):
+        self.id = str(nid)
+        self.name = f"Node.{nid:05d}"
+        self.bl_idname = "BenchNode"
+        self.sdn_level = 0
+        self.sdn_order = 0
+        self.inputs = [FakeSocket(self, f"in{i}") for i in range(inputs)]
+        self.outputs = [FakeSocket(self, "out")]
+        tree.nodes.append(self)
+        tree.node_map[self.name] = self
+
+    def is_registered_node_type(self):
+        return True
+
+
+class FakeTree:
+    def __init__(self, uid):
+        self.session_uid = uid
+        self.nodes = FakeNodes()
+        self.nodes.tree = self
+        self.node_map = {}
+        self.links = FakeLinks()
+
+    def get_nodes(self):
+        return self.nodes[:]
+
+    def link(self, from_socket, to_socket):
+        self.links.append(FakeLink(from_socket, to_socket))
+
+
+def build_tree(count, inputs, uid) -> FakeTree:
+    """
+    随机 DAG: 每个节点的输入连接到编号更小的随机节点, 节点顺序打乱
+    """
+    rnd = random.Random(count)
+    tree = FakeTree(uid)
+    nodes = [FakeNode(tree, i, inputs if i else 0) for i in range(count)]
+    for i, node in enumerate(nodes[1:], 1):
+        for inp in node.inputs:
+            tree.link(nodes[rnd.randrange(i)].outputs[0], inp)
+    rnd.shuffle(tree.nodes)
+    return tree
+
+
+def legacy_order(self: FakeTree) -> list:
+    """
+    改动前的 CFNodeTree.compute_execution_order
+    """
+    helper = THelper()
+    all_links = self.links.values()
+    L = []
+    S = []
+    M = OrderedDict()
+    visited_links = {}
+    remaining_links = {}
+    for node in self.get_nodes():
+        M[node.id] = node
+        num = 0
+        for inp in node.inputs:
+            if not inp.links:
+                continue
+            fnode = inp.links[0].from_node
+            if fnode.bl_idname == "NodeGroupInput":
+                continue
+            num += 1
+        if num == 0:
+            node.sdn_level = 1
+            S.append(node)
+        else:
+            node.sdn_level = 0
+            remaining_links[node.id] = num
+    while S:
+        node = S.pop(0)
+        L.append(node)
+        M.pop(node.id, None)
+        for output in node.outputs:
+            for olink in output.links:
+                from_node = helper.find_from_node(olink)
+                to_node = helper.find_to_node(olink)
+                if not from_node or from_node.bl_idname == "NodeGroupInput":
+                    from_node = None
+                if not to_node or to_node.bl_idname == "NodeGroupOutput":
+                    to_node = None
+                if to_node is None:
+                    continue
+                if not to_node.is_registered_node_type():
+                    continue
+                if not to_node.sdn_level or to_node.sdn_level <= node.sdn_level:
+                    to_node.sdn_level = node.sdn_level + 1
+                link_id = all_links.index(olink)
+                if link_id in visited_links:
+                    continue
+                visited_links[link_id] = True
+                remaining_links[to_node.id] -= 1
+                if remaining_links[to_node.id] == 0:
+                    S.append(to_node)
+    for i in M:
+        L.append(M[i])
+    for i, n in enumerate(L):
+        n.sdn_order = i
+    return L
+
+
+def snapshot(order: list) -> list:
+    return [(n.name, n.sdn_level, n.sdn_order) for n in order]
+
+
+def main():
+    CFNodeTree = tree_module.CFNodeTree
+    FakeTree.topology_hash = CFNodeTree.topology_hash
+    FakeTree.compute_execution_order = CFNodeTree.compute_execution_order
+
+    def cold(tree):
+        CFNodeTree.ORDER_CACHE.pop(tree.session_uid, None)
+        return tree.compute_execution_order()
+
+    print(f"{'nodes':>6} {'links':>6} {'legacy':>10} {'current':>10} {'cached':>10}")
+    for uid, (count, inputs) in enumerate(SIZES):
+        tree = build_tree(count, inputs, uid)
+        old = snapshot(legacy_order(tree))
+        new = snapshot(cold(tree))
+        assert old == new, "execution order mismatch"
+        t_old = min(timeit.repeat(lambda: legacy_order(tree), number=1, repeat=REPEAT))
+        t_new = min(timeit.repeat(lambda: cold(tree), number=1, repeat=REPEAT))
+        t_hit = min(timeit.repeat(tree.compute_execution_order, number=1, repeat=REPEAT))
+        print(f"{count:>6} {len(tree.links):>6} {t_old:>9.4f}s {t_new:>9.4f}s {t_hit:>9.4f}s")
+
+
+if __name__ == "__main__":
+    if tree_module is None:
+        print("bench_execution_order needs bpy, run inside Blender")
+    else:
+        main()
@@ -0,0 +1,90 @@
+"""
+节点id池性能对比: 改动前每次操作 pickle 读写 tree["ID_POOL"] / 现在的内存索引
+需要 bpy: blender -b --factory-startup --python tests/bench_id_pool.py
+使用普通的 ShaderNodeTree 承载 ID_POOL 属性, 不需要注册插件
+"""
+import pickle
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sdn_loader  # noqa: E402
+
+tree_module = sdn_loader.load("SDNode.tree")
+
+# 旧实现每次分配都要多次反序列化整个集合, 数量再大耗时会急剧增长
+COUNTS = (100, 200, 400)
+REPEAT = 3
+
+
+class LegacyPool:
+    """
+    改动前的 CFNodeTree.Pool
+    """
+
+    def __init__(self, tree) -> None:
+        self.tree = tree
+
+    def add(self, id):
+        pool = self._get_id_pool()
+        pool.add(id)
+        self.tree["ID_POOL"] = pickle.dumps(pool)
+
+    def __contains__(self, id):
+        return id in self._get_id_pool()
+
+    def _get_id_pool(self) -> set:
+        if "ID_POOL" not in self.tree:
+            self.tree["ID_POOL"] = pickle.dumps(set())
+        return pickle.loads(self.tree["ID_POOL"])
+
+
+def legacy_alloc(tree, count):
+    pool = LegacyPool(tree)
+    for _ in range(count):
+        for i in range(3, 99999):
+            i = str(i)
+            if i not in pool:
+                pool.add(i)
+                break
+
+
+def index_alloc(tree, count):
+    Pool = tree_module.CFNodeTree.Pool
+    Pool.INDEX.pop(tree.session_uid, None)
+    for _ in range(count):
+        # 与 NodeBase.unique_id 相同: 每次创建 Pool 视图
+        pool = Pool(tree)
+        pool.add(pool.next_free())
+    Pool(tree).flush()
+
+
+def run(fn, tree, count) -> float:
+    def f():
+        if "ID_POOL" in tree:
+            del tree["ID_POOL"]
+        fn(tree, count)
+    return min(timeit.repeat(f, number=1, repeat=REPEAT))
+
+
+def main():
+    import bpy
+    tree = bpy.data.node_groups.new("SDN_BENCH_ID_POOL", "ShaderNodeTree")
+    try:
+        print(f"{'ids':>6} {'pickle':>10} {'index':>10}")
+        for count in COUNTS:
+            old = run(legacy_alloc, tree, count)
+            new = run(index_alloc, tree, count)
+            print(f"{count:>6} {old:>9.4f}s {new:>9.4f}s")
+        # 两种实现写回的id集合一致
+        assert pickle.loads(tree["ID_POOL"]) == {str(i) for i in range(3, 3 + COUNTS[-1])}
+    finally:
+        bpy.data.node_groups.remove(tree)
+
+
+if __name__ == "__main__":
+    if tree_module is None:
+        print("bench_id_pool needs bpy, run inside Blender")
+    else:
+        main()
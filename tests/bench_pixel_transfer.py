@@ -0,0 +1,100 @@
+"""
+图标像素搬运性能对比: 改动前(每次新建 numpy 缓冲区, 预乘结果写回整张图像) / PixelTransfer 复用缓冲区
+需要 bpy: blender -b --factory-startup --python tests/bench_pixel_transfer.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sdn_loader  # noqa: E402
+
+utils = sdn_loader.load("utils")
+
+SIZES = (512, 1024, 2048)
+REPEAT = 3
+
+
+def legacy_apply_alpha(img):
+    """
+    改动前的 Icon.apply_alpha
+    """
+    import numpy as np
+    pixels = np.zeros(img.size[0] * img.size[1] * 4, dtype=np.float32)
+    img.pixels.foreach_get(pixels)
+    sized_pixels = pixels.reshape(-1, 4)
+    sized_pixels[:, :3] *= sized_pixels[:, 3].reshape(-1, 1)
+    img.pixels.foreach_set(pixels)
+
+
+def legacy_thumbnail(img):
+    """
+    改动前 reg_icon_hq 的流程: 预乘写回图像后再读取一次并下采样
+    """
+    import numpy as np
+    legacy_apply_alpha(img)
+    w, h = img.size[0], img.size[1]
+    pixels = np.empty(w * h * 4, dtype=np.float32)
+    img.pixels.foreach_get(pixels)
+    size, _ = utils.Icon.get_cache_limit()
+    f = min(-(-max(w, h) // size), w, h)
+    if f <= 1:
+        return w, h, pixels
+    tw, th = w // f, h // f
+    blocks = pixels.reshape(h, w, 4)[:th * f, :tw * f].reshape(th, f, tw, f, 4)
+    return tw, th, blocks.mean(axis=(1, 3), dtype=np.float32).ravel()
+
+
+def current_thumbnail(img):
+    return utils.Icon.make_thumbnail(img, premultiply=True)
+
+
+def best_ms(fn, img, source) -> float:
+    """
+    每次运行前恢复原始像素(不计时), 返回最快一次的毫秒数
+    """
+    best = float("inf")
+    for _ in range(REPEAT):
+        img.pixels.foreach_set(source)
+        t0 = time.perf_counter()
+        fn(img)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    import bpy
+    import bpy.utils.previews
+    import numpy as np
+    PixelTransfer = utils.PixelTransfer
+    previews = bpy.utils.previews.new()
+    rnd = np.random.default_rng(0)
+    print(f"{'size':>6} {'alpha legacy':>13} {'alpha now':>10} {'thumb legacy':>13} {'thumb now':>10}")
+    try:
+        for size in SIZES:
+            img = bpy.data.images.new(f"SDN_BENCH_{size}", size, size, alpha=True, float_buffer=True)
+            img.file_format = "PNG"
+            source = rnd.random(size * size * 4, dtype=np.float32)
+            a_old = best_ms(legacy_apply_alpha, img, source)
+            a_new = best_ms(utils.Icon.apply_alpha, img, source)
+            t_old = best_ms(legacy_thumbnail, img, source)
+            t_new = best_ms(current_thumbnail, img, source)
+            # 两种流程得到相同的缩略图, 并能上传到预览
+            img.pixels.foreach_set(source)
+            w, h, expected = legacy_thumbnail(img)
+            expected = expected.copy()
+            img.pixels.foreach_set(source)
+            tw, th, pixels = current_thumbnail(img)
+            assert (w, h) == (tw, th) and np.allclose(expected, pixels), "thumbnail mismatch"
+            PixelTransfer.write_preview(previews.new(img.name), tw, th, pixels)
+            print(f"{size:>6} {a_old:>11.1f}ms {a_new:>8.1f}ms {t_old:>11.1f}ms {t_new:>8.1f}ms")
+            bpy.data.images.remove(img)
+    finally:
+        bpy.utils.previews.remove(previews)
+
+
+if __name__ == "__main__":
+    if utils is None:
+        print("bench_pixel_transfer needs bpy, run inside Blender")
+    else:
+        main()
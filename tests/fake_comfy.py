@@ -0,0 +1,117 @@
+"""
+无需GPU的 ComfyUI 假服务端, 用于测试多服务端调度
+    GET  /queue          返回 queue_running / queue_pending (条目格式与ComfyUI相同: [number, prompt_id, ...])
+    POST /prompt         记录 prompt 并放入 queue_pending, 返回 prompt_id
+    POST /upload/image   记录上传的文件名, 返回 {"name", "subfolder", "type"}
+
+单独运行: python tests/fake_comfy.py --port 8189 --pending 2
+"""
+import json
+import re
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+
+class FakeComfy:
+    def __init__(self, port=0, pending=0) -> None:
+        self.lock = Lock()
+        self.running = []
+        self.pending = []
+        self.prompts = []
+        self.uploads = []
+        self.number = 0
+        self.set_load(pending)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self.make_handler())
+        self.thread: Thread = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def addr(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    def set_load(self, pending: int, running: int = 0):
+        """
+        设置队列深度(模拟其他客户端提交的任务)
+        """
+        with self.lock:
+            self.pending = [self.new_item(str(uuid.uuid4())) for _ in range(pending)]
+            self.running = [self.new_item(str(uuid.uuid4())) for _ in range(running)]
+
+    def new_item(self, prompt_id, prompt=None):
+        self.number += 1
+        return [self.number, prompt_id, prompt or {}, {}, []]
+
+    def start(self) -> "FakeComfy":
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        关闭监听端口, 之后的请求会得到 URLError(连接被拒绝)
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                ...
+
+            def reply(self, data: dict, code=200):
+                body = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/queue":
+                    return self.reply({"error": "not found"}, 404)
+                with fake.lock:
+                    self.reply({"queue_running": fake.running, "queue_pending": fake.pending})
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                body = self.read_body()
+                if path == "/prompt":
+                    content = json.loads(body or b"{}")
+                    prompt_id = content.get("prompt_id") or str(uuid.uuid4())
+                    with fake.lock:
+                        fake.prompts.append(content)
+                        item = fake.new_item(prompt_id, content.get("prompt"))
+                        fake.pending.append(item)
+                    return self.reply({"prompt_id": prompt_id, "number": item[0], "node_errors": {}})
+                if path == "/upload/image":
+                    names = re.findall(rb'name="image"; filename="([^"]*)"', body)
+                    name = names[0].decode() if names else "image.png"
+                    with fake.lock:
+                        fake.uploads.append(name)
+                    return self.reply({"name": name, "subfolder": "SDN", "type": "input"})
+                self.reply({"error": "not found"}, 404)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8189)
+    parser.add_argument("--pending", type=int, default=0)
+    args = parser.parse_args()
+    server = FakeComfy(args.port, args.pending)
+    print(f"Fake ComfyUI: http://{server.addr}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
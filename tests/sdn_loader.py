@@ -0,0 +1,66 @@
+"""
+在 Blender 中按需加载插件子模块, 不执行插件的 __init__(注册)
+    blender -b --factory-startup --python tests/<test>.py
+load_stubbed 可在没有 bpy 时用替身模块加载, 供普通 python/pytest 测试使用
+"""
+import importlib
+import sys
+import types
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG = "sdn_test_pkg"
+BLENDER_MODULES = ("bpy", "bpy.app", "bpy.app.translations", "bpy.types", "bpy.props", "bpy.utils", "bpy.utils.previews", "aud")
+# load_stubbed 时 get_pref() 返回的首选项
+PREF = types.SimpleNamespace()
+
+
+def has_bpy() -> bool:
+    try:
+        import bpy
+    except ImportError:
+        return False
+    return not isinstance(bpy, mock.Mock)
+
+
+def load(name: str):
+    """
+    name: 插件内的模块名, 如 SDNode.manager
+    没有 bpy 时返回 None
+    """
+    if not has_bpy():
+        return None
+    return _load(name)
+
+
+def load_stubbed(name: str, stubs=(), **pref):
+    """
+    没有 bpy 时用 MagicMock 替代 Blender 模块和翻译/首选项后加载, 有 bpy 时等同于 load
+    只适用于逻辑不依赖 Blender 的模块(如 ServerPool 调度)
+        stubs: 同样替换为 MagicMock 的插件内模块, 如 SDNode.tree
+        pref: get_pref() 返回对象的属性
+    """
+    PREF.__dict__.update(pref)
+    if has_bpy():
+        return _load(name)
+    for mod_name in BLENDER_MODULES:
+        sys.modules.setdefault(mod_name, mock.MagicMock(name=mod_name))
+    for mod_name in ("translations", *stubs):
+        sys.modules.setdefault(f"{PKG}.{mod_name}", mock.MagicMock(name=mod_name))
+    preference = types.ModuleType(f"{PKG}.preference")
+    preference.get_pref = lambda: PREF
+    sys.modules.setdefault(preference.__name__, preference)
+    return _load(name)
+
+
+def _load(name: str):
+    import tomllib
+    for mod_name, path in ((PKG, ROOT), (f"{PKG}.SDNode", ROOT / "SDNode")):
+        if mod_name not in sys.modules:
+            module = types.ModuleType(mod_name)
+            module.__path__ = [str(path)]
+            sys.modules[mod_name] = module
+    manifest = tomllib.loads((ROOT / "blender_manifest.toml").read_text(encoding="utf-8"))
+    sys.modules[PKG].bl_info = {"name": manifest["name"], "version": tuple(map(int, manifest["version"].split(".")))}
+    return importlib.import_module(f"{PKG}.{name}")
@@ -0,0 +1,294 @@
+"""
+工作流导出回归测试: 旧的 tree.links[:] + list.index 路径 与 LinkIndex 路径导出的 JSON 必须一致
+需要 bpy: blender -b --factory-startup --python tests/test_link_index.py
+节点/连接使用轻量替身, 不依赖 ComfyUI 的 object_info
+"""
+import json
+import sys
+import unittest
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sdn_loader  # noqa: E402
+
+blueprints = sdn_loader.load("SDNode.blueprints")
+if blueprints:
+    from sdn_loader import PKG
+    tree_module = sdn_loader.load("SDNode.tree")
+    LinkIndex = sys.modules[f"{PKG}.SDNode.utils"].LinkIndex
+    SOCK_TAG = sys.modules[f"{PKG}.SDNode.nodegroup"].SOCK_TAG
+
+
+class FakeSocket:
+    def __init__(self, node: "FakeNode", name, bl_idname, slot_index, props=None):
+        self.node = node
+        self.name = name
+        self.bl_idname = bl_idname
+        self.slot_index = slot_index
+        self.links: list[FakeLink] = []
+        # 组接口上的自定义属性(SOCK_TAG 等)
+        self.props = props or {}
+
+    @property
+    def is_linked(self):
+        return bool(self.links)
+
+    def __contains__(self, key):
+        return key in self.props
+
+    def __getitem__(self, key):
+        return self.props[key]
+
+    def as_pointer(self):
+        return id(self)
+
+
+class FakeSockets(list):
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return next(sock for sock in self if sock.name == key)
+        return super().__getitem__(key)
+
+
+class FakeLink:
+    def __init__(self, from_socket: FakeSocket, to_socket: FakeSocket):
+        self.from_socket = from_socket
+        self.to_socket = to_socket
+        self.from_node = from_socket.node
+        self.to_node = to_socket.node
+        from_socket.links.append(self)
+        to_socket.links.append(self)
+
+    def as_pointer(self):
+        return id(self)
+
+
+class FakeTree:
+    def __init__(self, name="NodeTree"):
+        self.name = name
+        self.nodes: list[FakeNode] = []
+        self.links: list[FakeLink] = []
+
+    def link(self, from_socket, to_socket):
+        self.links.append(FakeLink(from_socket, to_socket))
+
+    def get_nodes(self):
+        return [n for n in self.nodes if n.bl_idname not in {"NodeFrame", "NodeGroupInput", "NodeGroupOutput"}]
+
+    def compute_execution_order(self):
+        return self.nodes[:]
+
+    def validation(self, nodes=None):
+        ...
+
+    def calc_unique_id(self):
+        ...
+
+
+class FakeNode:
+    # 为 True 时按改动前的方式导出: 每个节点各自复制 tree.links 并用 list.index 查找
+    legacy = False
+
+    def __init__(self, tree: FakeTree, nid, class_type, inputs=(), outputs=(), select=True, bl_idname=""):
+        self.tree = tree
+        self.id = str(nid)
+        self.class_type = class_type
+        self.bl_idname = bl_idname or class_type
+        self.name = f"{class_type}.{nid:03d}"
+        self.select = select
+        self.parent = None
+        self.location = SimpleNamespace(x=nid * 120.6, y=-nid * 40.2)
+        self.width = 200
+        self.height = 100
+        self.sdn_order = nid
+        self.sdn_hide = False
+        self.use_custom_color = False
+        self.inp_types = {}
+        self.widgets = []
+        self.inputs = FakeSockets(FakeSocket(self, *sock, i) for i, sock in enumerate(inputs))
+        self.outputs = FakeSockets(FakeSocket(self, *sock, i) for i, sock in enumerate(outputs))
+        tree.nodes.append(self)
+
+    def as_pointer(self):
+        return id(self)
+
+    def get_tree(self):
+        return self.tree
+
+    def get_from_link(self, inp):
+        return inp.links[0] if inp.links else None
+
+    def get_output(self, name):
+        return self.outputs[name]
+
+    def get_meta(self, name):
+        return None
+
+    def get_widgets(self, exclude_converted=False):
+        return []
+
+    def is_base_type(self, name):
+        return False
+
+    def query_stat(self, name):
+        return False
+
+    def is_registered_node_type(self):
+        return True
+
+    def is_group(self):
+        return False
+
+    def update(self):
+        ...
+
+    def dump(self, selected_only=False, all_links=None):
+        if FakeNode.legacy:
+            all_links = self.get_tree().links[:]
+        bp = blueprints.get_blueprints(self.class_type)
+        return bp.dump(self, selected_only, all_links=all_links)
+
+
+class FakeGroup(FakeNode):
+    def __init__(self, tree, nid, node_tree: FakeTree, inputs=(), outputs=(), select=True):
+        super().__init__(tree, nid, "SDNGroup", select=select)
+        self.node_tree = node_tree
+        self.inputs = FakeSockets(FakeSocket(self, name, idname, i, {SOCK_TAG: sid})
+                                  for i, (name, idname, sid) in enumerate(inputs))
+        self.outputs = FakeSockets(FakeSocket(self, name, idname, i, {SOCK_TAG: sid})
+                                   for i, (name, idname, sid) in enumerate(outputs))
+
+    def get_in_out_node(self):
+        nodes = {n.bl_idname: n for n in self.node_tree.nodes}
+        return nodes["NodeGroupInput"], nodes["NodeGroupOutput"]
+
+
+@contextmanager
+def legacy_dump():
+    FakeNode.legacy = True
+    try:
+        yield
+    finally:
+        FakeNode.legacy = False
+
+
+def legacy_pack_links(tree: FakeTree, selected_only=False):
+    """
+    改动前 save_json_ex 的 links 打包逻辑
+    """
+    links = []
+    for i, link in enumerate(tree.links):
+        from_socket = link.from_socket
+        to_node = link.to_node
+        to_socket = link.to_socket
+        link_info = [
+            i,
+            int(from_socket.node.id),
+            from_socket.slot_index,
+            int(to_socket.node.id),
+            to_socket.slot_index,
+            to_socket.bl_idname
+        ]
+        if to_node.class_type == "Reroute":
+            link_info[-1] = "*"
+        if not selected_only:
+            links.append(link_info)
+        elif to_node.select and link.from_node.select:
+            links.append(link_info)
+    return links
+
+
+def build_tree():
+    """
+    Loader -> Reroute -> Sampler -> Save / Preview(未选中)
+    Loader -> Group(Sampler) -> Save
+    """
+    tree = FakeTree()
+    loader = FakeNode(tree, 1, "TestLoader", outputs=[("MODEL", "MODEL"), ("LATENT", "LATENT")])
+    reroute = FakeNode(tree, 2, "Reroute", inputs=[("Input", "*")], outputs=[("Output", "*")])
+    sampler = FakeNode(tree, 3, "TestSampler", inputs=[("model", "MODEL"), ("latent", "LATENT")],
+                       outputs=[("LATENT", "LATENT")])
+    save = FakeNode(tree, 4, "TestSave", inputs=[("latent", "LATENT")])
+    preview = FakeNode(tree, 5, "TestSave", inputs=[("latent", "LATENT")], select=False)
+    tree.link(loader.outputs[0], reroute.inputs[0])
+    tree.link(reroute.outputs[0], sampler.inputs[0])
+    tree.link(loader.outputs[1], sampler.inputs[1])
+    tree.link(sampler.outputs[0], save.inputs[0])
+    tree.link(sampler.outputs[0], preview.inputs[0])
+
+    inner = FakeTree("SubGraph")
+    ginp = FakeNode(inner, 1, "GroupInput", outputs=[("latent_in", "LATENT")], bl_idname="NodeGroupInput")
+    isampler = FakeNode(inner, 2, "TestSampler", inputs=[("latent", "LATENT")], outputs=[("LATENT", "LATENT")])
+    gout = FakeNode(inner, 3, "GroupOutput", inputs=[("latent_out", "LATENT")], bl_idname="NodeGroupOutput")
+    inner.link(ginp.outputs[0], isampler.inputs[0])
+    inner.link(isampler.outputs[0], gout.inputs[0])
+
+    group = FakeGroup(tree, 6, inner, inputs=[("latent", "LATENT", "latent_in")],
+                      outputs=[("LATENT", "LATENT", "latent_out")])
+    save2 = FakeNode(tree, 7, "TestSave", inputs=[("latent", "LATENT")], select=False)
+    tree.link(loader.outputs[1], group.inputs[0])
+    tree.link(group.outputs[0], save2.inputs[0])
+    return tree, group
+
+
+def dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, sort_keys=False)
+
+
+@unittest.skipIf(blueprints is None, "export needs bpy, run inside Blender")
+class LinkIndexExportTest(unittest.TestCase):
+    def setUp(self):
+        self.tree, self.group = build_tree()
+        self.nodes = [n for n in self.tree.get_nodes() if n is not self.group]
+
+    def test_index_matches_list(self):
+        index = LinkIndex(self.tree)
+        self.assertEqual(len(index), len(self.tree.links))
+        for i, link in enumerate(self.tree.links):
+            self.assertEqual(index.index(link), self.tree.links[:].index(link))
+            self.assertEqual(index.slot(link.to_socket), link.to_socket.slot_index)
+            self.assertEqual(index.node_id(link.from_node), int(link.from_node.id))
+
+    def check_nodes(self, nodes, selected_only):
+        with legacy_dump():
+            old = [n.dump(selected_only=selected_only) for n in nodes]
+        index = LinkIndex(self.tree)
+        new = [n.dump(selected_only=selected_only, all_links=index) for n in nodes]
+        self.assertEqual(dumps(old), dumps(new))
+
+    def test_node_dump(self):
+        self.check_nodes(self.nodes, selected_only=False)
+
+    def test_node_dump_selected_only(self):
+        self.check_nodes(self.nodes, selected_only=True)
+
+    def test_group_dump(self):
+        self.check_nodes([self.group], selected_only=False)
+
+    def test_group_dump_selected_only(self):
+        self.check_nodes([self.group], selected_only=True)
+
+    def check_tree(self, selected_only):
+        nodes = sorted(self.nodes, key=lambda x: x.id)
+        with legacy_dump():
+            old = {
+                "last_link_id": len(self.tree.links),
+                "nodes": [n.dump(selected_only=selected_only) for n in nodes],
+                "links": legacy_pack_links(self.tree, selected_only),
+            }
+        data = tree_module.CFNodeTree.save_json_ex(self.tree, self.nodes[:], selected_only=selected_only)
+        new = {k: data[k] for k in old}
+        self.assertEqual(dumps(old), dumps(new))
+
+    def test_save_json(self):
+        self.check_tree(selected_only=False)
+
+    def test_save_json_selected_only(self):
+        self.check_tree(selected_only=True)
+
+
+if __name__ == "__main__":
+    # blender --python 时 argv 包含 blender 自身参数
+    unittest.main(argv=[sys.argv[0]], exit=False)
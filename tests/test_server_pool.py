@@ -0,0 +1,149 @@
+"""
+多服务端调度测试(使用 fake_comfy 假服务端, 无需GPU)
+    python -m pytest tests / python -m unittest tests.test_server_pool
+    ServerPoolTest 没有 bpy 时用 sdn_loader.load_stubbed 替代 Blender 模块和首选项
+    也可在 Blender 中运行: blender -b --factory-startup --python tests/test_server_pool.py
+"""
+import json
+import sys
+import unittest
+from pathlib import Path
+from urllib import request
+from urllib.error import URLError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fake_comfy import FakeComfy  # noqa: E402
+import sdn_loader  # noqa: E402
+
+manager = sdn_loader.load_stubbed("SDNode.manager", stubs=("SDNode.tree", "SDNode.nodes"),
+                                  max_inflight_prompts=1, server_pool="")
+
+
+def post_json(url, data: dict) -> dict:
+    req = request.Request(url, data=json.dumps(data).encode(), headers={"Content-Type": "application/json"})
+    return json.loads(request.urlopen(req, timeout=5).read().decode())
+
+
+class FakeComfyTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeComfy(pending=2).start()
+        self.url = f"http://{self.fake.addr}"
+
+    def tearDown(self):
+        self.fake.stop()
+
+    def test_queue_depth(self):
+        res = json.loads(request.urlopen(f"{self.url}/queue", timeout=5).read().decode())
+        self.assertEqual(len(res["queue_pending"]), 2)
+        self.assertEqual(res["queue_running"], [])
+
+    def test_prompt_enters_queue(self):
+        res = post_json(f"{self.url}/prompt", {"prompt_id": "p1", "prompt": {"1": {}}})
+        self.assertEqual(res["prompt_id"], "p1")
+        queue = json.loads(request.urlopen(f"{self.url}/queue", timeout=5).read().decode())
+        self.assertIn("p1", [item[1] for item in queue["queue_pending"]])
+
+    def test_upload_image(self):
+        body = (b'--b\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\n'
+                b'Content-Type: image/png\r\n\r\nPNG\r\n--b--\r\n')
+        req = request.Request(f"{self.url}/upload/image", data=body,
+                              headers={"Content-Type": "multipart/form-data; boundary=b"})
+        res = json.loads(request.urlopen(req, timeout=5).read().decode())
+        self.assertEqual(res, {"name": "a.png", "subfolder": "SDN", "type": "input"})
+        self.assertEqual(self.fake.uploads, ["a.png"])
+
+    def test_stopped_server_refuses(self):
+        self.fake.stop()
+        with self.assertRaises(URLError):
+            request.urlopen(f"{self.url}/queue", timeout=2)
+
+
+class ServerPoolTest(unittest.TestCase):
+    def setUp(self):
+        TaskManager, PoolServer = manager.TaskManager, manager.PoolServer
+        # 主服务端 2 个排队, 附加服务端分别 4 个 / 0 个
+        self.fakes = [FakeComfy(pending=n).start() for n in (2, 4, 0)]
+        self.old_server = TaskManager.server
+        self.old_servers = manager.ServerPool.servers[:]
+        TaskManager.server = PoolServer(self.fakes[0].addr)
+        TaskManager.server.run()
+        manager.ServerPool.servers = [PoolServer(f.addr) for f in self.fakes[1:]]
+        for server in manager.ServerPool.servers:
+            server.run()
+
+    def tearDown(self):
+        TaskManager = manager.TaskManager
+        TaskManager.server = self.old_server
+        manager.ServerPool.servers = self.old_servers
+        TaskManager.inflight.clear()
+        while not TaskManager.task_queue.empty():
+            TaskManager.task_queue.get_nowait()
+        for fake in self.fakes:
+            try:
+                fake.stop()
+            except OSError:
+                ...
+
+    def test_pick_least_loaded(self):
+        servers = manager.ServerPool.servers
+        self.assertIs(manager.ServerPool.pick(), servers[1])
+        self.fakes[2].set_load(6)
+        self.assertIs(manager.ServerPool.pick(), manager.TaskManager.server)
+
+    def test_pick_counts_unqueued_inflight(self):
+        # 已分配但尚未进入服务端队列的任务也计入负载
+        server = manager.ServerPool.servers[1]
+        for i in range(3):
+            task = manager.Task()
+            task.server = server
+            manager.TaskManager.inflight[task.prompt_id] = task
+        self.assertEqual(manager.ServerPool.query_load(server), 3)
+        self.assertIs(manager.ServerPool.pick(), manager.TaskManager.server)
+
+    def test_pick_skips_down_server(self):
+        down = manager.ServerPool.servers[1]
+        self.fakes[2].stop()
+        self.assertIs(manager.ServerPool.pick(), manager.TaskManager.server)
+        self.assertFalse(down.is_launched())
+        self.assertNotIn(down, manager.ServerPool.get_servers())
+
+    def test_failover_requeues_task(self):
+        TaskManager = manager.TaskManager
+        down = manager.ServerPool.servers[1]
+        self.fakes[2].stop()
+        task = manager.Task()
+        task.server = down
+        old_id = task.prompt_id
+        TaskManager.inflight[old_id] = task
+        self.assertTrue(TaskManager.failover(task, URLError("connection refused")))
+        self.assertIs(TaskManager.task_queue.get_nowait(), task)
+        self.assertNotIn(old_id, TaskManager.inflight)
+        self.assertNotEqual(task.prompt_id, old_id)
+        self.assertIsNone(task.server)
+        self.assertFalse(down.is_launched())
+
+    def test_primary_fails_over(self):
+        TaskManager = manager.TaskManager
+        primary = TaskManager.server
+        self.fakes[0].stop()
+        task = manager.Task()
+        task.server = primary
+        TaskManager.inflight[task.prompt_id] = task
+        self.assertTrue(TaskManager.failover(task, URLError("connection refused")))
+        self.assertIs(TaskManager.task_queue.get_nowait(), task)
+        # 主服务端不关闭, 只在该任务重新分配时跳过
+        self.assertTrue(primary.is_launched())
+        self.assertEqual(task.failed_servers, [primary])
+        self.assertIs(manager.ServerPool.pick(exclude=task.failed_servers), manager.ServerPool.servers[1])
+
+    def test_no_failover_without_other_server(self):
+        for server in manager.ServerPool.servers:
+            server.close()
+        task = manager.Task()
+        task.server = manager.TaskManager.server
+        self.assertFalse(manager.TaskManager.failover(task, URLError("connection refused")))
+
+
+if __name__ == "__main__":
+    # blender --python 时 argv 包含 blender 自身参数
+    unittest.main(argv=[sys.argv[0]], exit=False)
@@ -1,21 +1,161 @@
 import bpy
+import time
 import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, Event, current_thread, main_thread
 from queue import Queue
 from typing import Any
 from .kclogger import logger
 
 
+class TimerQueue:
+    """
+    主线程任务队列: 按优先级分道, 已排队的可合并回调不会重复入队
+    """
+
+    def __init__(self, lanes=3) -> None:
+        self.lanes = tuple(deque() for _ in range(lanes))
+        self.queued = set()
+        self.lock = Lock()
+        self.interval = Timer.INTERVAL
+
+    def put(self, delegate: Any, priority: int, coalesce=False):
+        with self.lock:
+            if coalesce:
+                if delegate in self.queued:
+                    return
+                self.queued.add(delegate)
+            self.lanes[priority].append((delegate, coalesce))
+
+    def get(self):
+        with self.lock:
+            for lane in self.lanes:
+                if not lane:
+                    continue
+                delegate, coalesce = lane.popleft()
+                if coalesce:
+                    self.queued.discard(delegate)
+                return delegate
+        return None
+
+    def empty(self) -> bool:
+        return not any(self.lanes)
+
+    def depth(self) -> list[int]:
+        return [len(lane) for lane in self.lanes]
+
+    def clear(self):
+        with self.lock:
+            dropped = [delegate for lane in self.lanes for delegate, _ in lane]
+            for lane in self.lanes:
+                lane.clear()
+            self.queued.clear()
+        # 丢弃的 Timer.submit 任务取消其 Future, 避免等待方永久阻塞
+        for delegate in dropped:
+            if isinstance(future := getattr(delegate, "future", None), MainThreadFuture):
+                future.cancel()
+
+
+class MainThreadFuture(Future):
+    """
+    Timer.submit 返回的 Future
+        started: 主线程开始执行时置位, 未开始前可 cancel
+        then: 主线程部分完成后在后台线程继续执行(如上传), 返回新的 Future
+        wait: 等待开始最多 start_timeout 秒, 超时则取消并抛出 TimeoutError; 开始后等待完成
+        cancel: 被取消(如 Timer.clear 丢弃)时同时唤醒 wait
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.started = Event()
+
+    def cancel(self) -> bool:
+        if not super().cancel():
+            return False
+        self.started.set()
+        return True
+
+    def then(self, fn, executor: ThreadPoolExecutor = None) -> Future:
+        future = Future()
+        # 等待方可通过 source 对主线程部分使用开始超时
+        future.source = self
+
+        def run(res):
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(res))
+            except BaseException as e:
+                future.set_exception(e)
+
+        def done(f: Future):
+            if f.cancelled():
+                future.cancel()
+            elif (e := f.exception()) is not None:
+                future.set_exception(e)
+            else:
+                (executor or Timer.background()).submit(run, f.result())
+        self.add_done_callback(done)
+        return future
+
+    def wait(self, start_timeout: float = None, timeout: float = None):
+        if not self.started.wait(start_timeout) and self.cancel():
+            raise TimeoutError(f"Main thread busy, job not started in {start_timeout}s")
+        return self.result(timeout)
+
+
 class Timer:
-    TimerQueue = Queue()
-    TimerQueue2 = Queue()
+    # 优先级: 界面重绘 > 结果加载 > 后台任务
+    UI = 0
+    RESULT = 1
+    BACKGROUND = 2
+    # 每次 tick 的执行预算, 超出后剩余任务留到下一 tick, 避免一次性执行大量回调卡住界面
+    BUDGET = 0.008
+    INTERVAL = 1 / 60
+    # 空闲时逐步退避的最大间隔
+    MAX_INTERVAL = 0.1
+    # wait_run 等待主线程开始执行的超时时间, 开始执行后不限时(渲染可能很久)
+    START_TIMEOUT = 60
+    COALESCE: dict[Any, int] = {}
+    EXECUTOR: ThreadPoolExecutor = None
+    STATS: dict[str, list] = {}
+    TimerQueue: TimerQueue = None
+    TimerQueue2: TimerQueue = None
+
+    @staticmethod
+    def coalesce(priority=UI):
+        """
+        装饰器: 标记可合并的回调, 队列中已有同一回调时不再重复入队
+        """
+        def wrap(func):
+            Timer.COALESCE[func] = priority
+            return func
+        return wrap
+
+    @staticmethod
+    def get_priority(delegate: Any, priority: int = None):
+        if priority is not None:
+            return priority
+        try:
+            return Timer.COALESCE.get(delegate, Timer.RESULT)
+        except TypeError:
+            return Timer.RESULT
+
+    @staticmethod
+    def is_coalesce(delegate: Any):
+        try:
+            return delegate in Timer.COALESCE
+        except TypeError:
+            return False
 
     @staticmethod
-    def put(delegate: Any):
-        Timer.TimerQueue.put(delegate)
+    def put(delegate: Any, priority: int = None):
+        Timer.TimerQueue.put(delegate, Timer.get_priority(delegate, priority), Timer.is_coalesce(delegate))
 
     @staticmethod
-    def put2(delegate: Any):
-        Timer.TimerQueue2.put(delegate)
+    def put2(delegate: Any, priority: int = None):
+        Timer.TimerQueue2.put(delegate, Timer.get_priority(delegate, priority), Timer.is_coalesce(delegate))
 
     @staticmethod
     def executor(t):
@@ -33,9 +173,22 @@ class Timer:
         return Timer.run_ex(Timer.TimerQueue2)
 
     @staticmethod
-    def run_ex(queue: Queue):
-        while not queue.empty():
-            t = queue.get()
+    def record(t, cost):
+        func = t[0] if type(t) in {list, tuple} else t
+        name = getattr(func, "__qualname__", None) or repr(func)
+        stat = Timer.STATS.setdefault(name, [0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += cost
+        stat[2] = max(stat[2], cost)
+        if cost > Timer.BUDGET:
+            logger.debug("Timer slow callback %s: %.1fms", name, cost * 1000)
+
+    @staticmethod
+    def run_ex(queue: TimerQueue):
+        start = time.perf_counter()
+        ran = 0
+        while (t := queue.get()) is not None:
+            t0 = time.perf_counter()
             # Timer.executor(t)
             try:
                 Timer.executor(t)
@@ -44,32 +197,67 @@ class Timer:
                 logger.error("%s: %s", type(e).__name__, e)
             except KeyboardInterrupt:
                 ...
-        return 0.016666666666666666
+            now = time.perf_counter()
+            Timer.record(t, now - t0)
+            ran += 1
+            if now - start >= Timer.BUDGET:
+                break
+        if not queue.empty():
+            # 预算用完仍有积压, 尽快进入下一 tick
+            queue.interval = Timer.INTERVAL
+            return 0
+        if ran:
+            queue.interval = Timer.INTERVAL
+        else:
+            queue.interval = min(queue.interval * 1.5, Timer.MAX_INTERVAL)
+        return queue.interval
+
+    @staticmethod
+    def stats() -> dict:
+        return {
+            "depth": Timer.TimerQueue.depth(),
+            "depth2": Timer.TimerQueue2.depth(),
+            "interval": Timer.TimerQueue.interval,
+            "callbacks": {name: {"count": count, "avg_ms": total / count * 1000, "max_ms": peak * 1000}
+                          for name, (count, total, peak) in list(Timer.STATS.items())},
+        }
 
     @staticmethod
     def clear():
-        while not Timer.TimerQueue.empty():
-            Timer.TimerQueue.get()
-        while not Timer.TimerQueue2.empty():
-            Timer.TimerQueue2.get()
+        Timer.TimerQueue.clear()
+        Timer.TimerQueue2.clear()
 
     @staticmethod
-    def wait_run(func):
-        def wrap(*args, **kwargs):
-            q = Queue()
+    def background() -> ThreadPoolExecutor:
+        if not Timer.EXECUTOR:
+            Timer.EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="SDNTimerBG")
+        return Timer.EXECUTOR
 
-            def wrap_job(q):
-                try:
-                    res = func(*args, **kwargs)
-                    q.put(res)
-                except Exception as e:
-                    q.put(e)
+    @staticmethod
+    def submit(func, *args, priority: int = None, **kwargs) -> MainThreadFuture:
+        """
+        在主线程执行 func, 立即返回 MainThreadFuture
+        """
+        future = MainThreadFuture()
+
+        def job():
+            if not future.set_running_or_notify_cancel():
+                return
+            future.started.set()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        job.future = future
+        Timer.put(job, priority)
+        return future
 
-            Timer.put((wrap_job, q))
-            res = q.get()
-            if isinstance(res, Exception):
-                raise res
-            return res
+    @staticmethod
+    def wait_run(func):
+        def wrap(*args, **kwargs):
+            if current_thread() is main_thread():
+                return func(*args, **kwargs)
+            return Timer.submit(func, *args, **kwargs).wait(Timer.START_TIMEOUT)
 
         return wrap
 
@@ -88,6 +276,10 @@ class Timer:
             ...
 
 
+Timer.TimerQueue = TimerQueue()
+Timer.TimerQueue2 = TimerQueue()
+
+
 class WorkerFunc:
     args = {}
 
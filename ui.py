@@ -202,6 +202,7 @@ def draw_header_button(self, context):
 
 class HistoryItem(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty(default="")
+    entry_id: bpy.props.IntProperty(default=-1)
 
 
 class HISTORY_UL_UIList(bpy.types.UIList):
@@ -212,7 +213,9 @@ class HISTORY_UL_UIList(bpy.types.UIList):
                   data, item, icon, active_data, active_property, index=0, flt_flag=0):
         row = layout.row(align=True)
         row.label(text="  " + item.name)
-        row.operator(Load_History.bl_idname, text="", icon="TIME").name = item.name
+        op = row.operator(Load_History.bl_idname, text="", icon="TIME")
+        op.name = item.name
+        op.entry_id = item.entry_id
 
 
 class PanelViewport(bpy.types.Panel):
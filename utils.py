@@ -1,9 +1,10 @@
+import os
 import struct
-import queue
 import platform
 import time
 from pathlib import Path
-from threading import Thread
+from threading import Thread, Lock, Condition
+from collections import OrderedDict
 from functools import lru_cache
 from urllib.parse import urlparse
 from .kclogger import logger
@@ -67,6 +68,7 @@ def _T2(word):
     return REPLACE_DICT.get(locale, {}).get(word, word)
 
 
+@Timer.coalesce()
 def update_screen():
     try:
         import bpy
@@ -76,6 +78,7 @@ def update_screen():
         ...
 
 
+@Timer.coalesce()
 def update_node_editor():
     try:
         import bpy
@@ -151,6 +154,62 @@ class MetaIn(type):
         return cls.__contains__(cls, name)
 
 
+class PixelTransfer:
+    """
+    在 bpy.types.Image / numpy / ImagePreview 之间搬运像素
+    统一走 foreach_get/foreach_set 并复用预分配的 float32 缓冲区, 不经过 python list
+    返回的缓冲区会被下次读取覆盖, 调用方需立即使用或自行 copy
+    """
+    BUFFER = None
+
+    @staticmethod
+    def buffer(size):
+        import numpy as np
+        buf = PixelTransfer.BUFFER
+        if buf is None or buf.size < size:
+            buf = PixelTransfer.BUFFER = np.empty(size, dtype=np.float32)
+        return buf[:size]
+
+    @staticmethod
+    def read(img):
+        buf = PixelTransfer.buffer(img.size[0] * img.size[1] * img.channels)
+        if buf.size:
+            img.pixels.foreach_get(buf)
+        return buf
+
+    @staticmethod
+    def write(img, pixels):
+        img.pixels.foreach_set(pixels)
+
+    @staticmethod
+    def write_preview(p, w, h, pixels):
+        p.image_size = (w, h)
+        p.image_pixels_float.foreach_set(pixels)
+
+    @staticmethod
+    def to_rgba(pixels, channels):
+        if channels == 4:
+            return pixels
+        import numpy as np
+        src = pixels.reshape(-1, channels)
+        rgba = np.ones((src.shape[0], 4), dtype=np.float32)
+        rgba[:, :3] = src[:, :3] if channels >= 3 else src[:, :1]
+        if channels == 2:
+            rgba[:, 3] = src[:, 1]
+        return rgba.ravel()
+
+    @staticmethod
+    def need_premultiply(img) -> bool:
+        return img.file_format == "PNG" and img.channels >= 4
+
+    @staticmethod
+    def premultiply(pixels):
+        # 预乘alpha 到rgb (原地)
+        sized_pixels = pixels.reshape(-1, 4)
+        sized_pixels[:, :3] *= sized_pixels[:, 3:]
+        return pixels
+
+
 class Icon(metaclass=MetaIn):
     PREV_DICT = PrevMgr.new()
     NONE_IMAGE = ""
@@ -159,6 +218,14 @@ class Icon(metaclass=MetaIn):
     PATH2BPY = {}
     ENABLE_HQ_PREVIEW = False
     INSTANCE = None
+    # 预览 LRU: name -> 占用字节, 超出预算时从最旧的开始淘汰
+    LRU = OrderedDict()
+    OWNED_IMAGES = set()
+    # icon_id -> name, 枚举项只保存 icon_id, 用于刷新 LRU 和定位被淘汰的图标
+    ID2NAME = {}
+    EVICTED_IDS = set()
+    STATS = {"hit": 0, "miss": 0, "evict": 0, "bytes": 0}
+    FILE_PREV_BYTES = 256 * 256 * 4  # PREV_DICT.load 由blender 生成缩略图, 按 256x256 RGBA8 估算
 
     def __init__(self) -> None:
         if Icon.NONE_IMAGE and Icon.NONE_IMAGE not in Icon:
@@ -179,15 +246,11 @@ class Icon(metaclass=MetaIn):
 
     @staticmethod
     def apply_alpha(img):
-        if img.file_format != "PNG" or img.channels < 4:
+        if not PixelTransfer.need_premultiply(img):
             return
-        # 预乘alpha 到rgb
-        import numpy as np
-        pixels = np.zeros(img.size[0] * img.size[1] * 4, dtype=np.float32)
-        img.pixels.foreach_get(pixels)
-        sized_pixels = pixels.reshape(-1, 4)
-        sized_pixels[:, :3] *= sized_pixels[:, 3].reshape(-1, 1)
-        img.pixels.foreach_set(pixels)
+        pixels = PixelTransfer.read(img)
+        PixelTransfer.premultiply(pixels)
+        PixelTransfer.write(img, pixels)
 
     @staticmethod
     def clear():
@@ -195,8 +258,131 @@ class Icon(metaclass=MetaIn):
         Icon.IMG_STATUS.clear()
         Icon.PIX_STATUS.clear()
         Icon.PATH2BPY.clear()
+        Icon.LRU.clear()
+        Icon.OWNED_IMAGES.clear()
+        Icon.ID2NAME.clear()
+        Icon.STATS["bytes"] = 0
         Icon.reg_icon(Icon.NONE_IMAGE)
 
+    @staticmethod
+    def get_cache_limit():
+        """
+        返回 (缩略图最大边长, 字节预算)
+        """
+        try:
+            from .preference import get_pref
+            pref = get_pref()
+            return pref.icon_thumb_size, pref.icon_cache_size * 1024 * 1024
+        except Exception:
+            return 256, 256 * 1024 * 1024
+
+    @staticmethod
+    def make_thumbnail(img, premultiply=False):
+        """
+        读取图像像素并按整数倍盒式下采样到 icon_thumb_size 以内, 返回 (w, h, pixels)
+        """
+        import numpy as np
+        w, h = img.size[0], img.size[1]
+        if w * h == 0:
+            return w, h, PixelTransfer.buffer(0)
+        pixels = PixelTransfer.to_rgba(PixelTransfer.read(img), img.channels)
+        if premultiply:
+            PixelTransfer.premultiply(pixels)
+        size, _ = Icon.get_cache_limit()
+        f = min(-(-max(w, h) // size), w, h)
+        if f <= 1:
+            return w, h, pixels
+        tw, th = w // f, h // f
+        blocks = pixels.reshape(h, w, 4)[:th * f, :tw * f].reshape(th, f, tw, f, 4)
+        return tw, th, blocks.mean(axis=(1, 3), dtype=np.float32).ravel()
+
+    @staticmethod
+    def upload_thumbnail(p, img, name, premultiply=False):
+        w, h, pixels = Icon.make_thumbnail(img, premultiply)
+        p.icon_size = (32, 32)
+        PixelTransfer.write_preview(p, w, h, pixels)
+        Icon.track(name, pixels.nbytes)
+
+    @staticmethod
+    def track(name, nbytes):
+        Icon.STATS["bytes"] += nbytes - Icon.LRU.pop(name, 0)
+        Icon.LRU[name] = nbytes
+        Icon.evict()
+
+    @staticmethod
+    def evict():
+        _, budget = Icon.get_cache_limit()
+        none = FSWatcher.to_str(Icon.NONE_IMAGE)
+        while Icon.STATS["bytes"] > budget and len(Icon.LRU) > 1:
+            name, nbytes = Icon.LRU.popitem(last=False)
+            if name == none:
+                Icon.LRU[name] = nbytes
+                continue
+            Icon.STATS["bytes"] -= nbytes
+            Icon.STATS["evict"] += 1
+            Icon.IMG_STATUS.pop(name, None)
+            Icon.PIX_STATUS.pop(name, None)
+            if name in Icon.PREV_DICT:
+                # 需要走 __delitem__ 才会释放 blender 侧的预览
+                del Icon.PREV_DICT[name]
+            evicted_ids = [i for i, n in Icon.ID2NAME.items() if n == name]
+            for icon_id in evicted_ids:
+                Icon.ID2NAME.pop(icon_id)
+            if evicted_ids:
+                Icon.EVICTED_IDS.update(evicted_ids)
+                Timer.put(Icon.drop_stale_enums)
+            img = Icon.PATH2BPY.pop(name, None)
+            if img and name in Icon.OWNED_IMAGES:
+                Timer.put((Icon.remove_image, img), Timer.BACKGROUND)
+            Icon.OWNED_IMAGES.discard(name)
+            logger.debug("Icon evicted %s (%.1f KB), %s", name, nbytes / 1024, Icon.cache_stats())
+
+    @staticmethod
+    def touch(items):
+        """
+        枚举项命中缓存时刷新其图标在 LRU 中的位置, 显示中的图标最后被淘汰
+        """
+        lru = Icon.LRU
+        for item in items:
+            if len(item) > 3 and (name := Icon.ID2NAME.get(item[3])) in lru:
+                lru.move_to_end(name)
+
+    @staticmethod
+    @Timer.coalesce()
+    def drop_stale_enums():
+        """
+        移除引用了已淘汰图标的枚举项缓存, 下次绘制时重新生成
+        """
+        from .datas import EnumCache
+        ids = Icon.EVICTED_IDS
+        Icon.EVICTED_IDS = set()
+
+        def walk(cache: dict):
+            for key, value in list(cache.items()):
+                if isinstance(value, dict):
+                    walk(value)
+                elif isinstance(value, list) and any(len(item) > 3 and item[3] in ids for item in value):
+                    cache.pop(key)
+        for cache in EnumCache.CACHE.values():
+            if isinstance(cache, dict):
+                walk(cache)
+        update_screen()
+
+    @staticmethod
+    def remove_image(img):
+        import bpy
+        try:
+            if img.users == 0:
+                bpy.data.images.remove(img)
+        except ReferenceError:
+            ...
+
+    @staticmethod
+    def cache_stats():
+        stats = dict(Icon.STATS)
+        stats["count"] = len(Icon.LRU)
+        return stats
+
     @staticmethod
     def set_hq_preview():
         from .preference import get_pref
@@ -223,10 +409,12 @@ class Icon(metaclass=MetaIn):
 
     @staticmethod
     def can_mark_pixel(prev, name) -> bool:
+        # 只比较图像身份与尺寸, 不访问像素
         name = FSWatcher.to_str(name)
-        if Icon.PIX_STATUS.get(name) == hash(prev.pixels):
+        key = (prev.as_pointer(), prev.size[0], prev.size[1])
+        if Icon.PIX_STATUS.get(name) == key:
             return False
-        Icon.PIX_STATUS[name] = hash(prev.pixels)
+        Icon.PIX_STATUS[name] = key
         return True
 
     @staticmethod
@@ -235,6 +423,7 @@ class Icon(metaclass=MetaIn):
         Icon.IMG_STATUS.pop(name)
         Icon.PIX_STATUS.pop(name)
         Icon.PREV_DICT.pop(name)
+        Icon.STATS["bytes"] -= Icon.LRU.pop(name, 0)
         return True
 
     @staticmethod
@@ -259,8 +448,9 @@ class Icon(metaclass=MetaIn):
         else:
             if path not in Icon:
                 Icon.PREV_DICT.load(path, path, 'IMAGE')
+                Icon.track(path, Icon.FILE_PREV_BYTES)
             if reload:
-                Timer.put(Icon.PREV_DICT[path].reload)
+                Timer.put(Icon.PREV_DICT[path].reload, Timer.BACKGROUND)
             return Icon[path]
 
     @staticmethod
@@ -272,9 +462,9 @@ class Icon(metaclass=MetaIn):
             return
         if p.exists() and p.suffix.lower() in IMG_SUFFIX:
             img = bpy.data.images.load(path)
-            Icon.apply_alpha(img)
-            Icon.reg_icon_by_pixel(img, path)
-            Timer.put((bpy.data.images.remove, img))  # 直接使用 bpy.data.images.remove 会导致卡死
+            # 临时图像无需回写预乘结果, 直接在缩略图缓冲区里预乘
+            Icon.reg_icon_by_pixel(img, path, PixelTransfer.need_premultiply(img))
+            Timer.put((bpy.data.images.remove, img), Timer.BACKGROUND)  # 直接使用 bpy.data.images.remove 会导致卡死
 
     @staticmethod
     def find_image(path):
@@ -308,25 +498,31 @@ class Icon(metaclass=MetaIn):
             img.filepath = path
             Icon.apply_alpha(img)
             Icon.update_path2bpy()
+            Icon.OWNED_IMAGES.add(path)
             # img.name = path
             return img
 
     @staticmethod
-    def reg_icon_by_pixel(prev, name):
+    def reg_icon_by_pixel(prev, name, premultiply=False):
         name = FSWatcher.to_str(name)
         if not Icon.can_mark_pixel(prev, name):
             return
         if name in Icon:
             return
         p = Icon.PREV_DICT.new(name)
-        p.icon_size = (32, 32)
-        p.image_size = (prev.size[0], prev.size[1])
-        p.image_pixels_float[:] = prev.pixels[:]
+        Icon.upload_thumbnail(p, prev, name, premultiply)
 
     @staticmethod
     def get_icon_id(name: Path):
-        p = Icon.PREV_DICT.get(FSWatcher.to_str(name), None)
-        if not p:
+        name = FSWatcher.to_str(name)
+        p = Icon.PREV_DICT.get(name, None)
+        if p:
+            Icon.STATS["hit"] += 1
+            if name in Icon.LRU:
+                Icon.LRU.move_to_end(name)
+            Icon.ID2NAME[p.icon_id] = name
+        else:
+            Icon.STATS["miss"] += 1
             p = Icon.PREV_DICT.get(FSWatcher.to_str(Icon.NONE_IMAGE), None)
         return p.icon_id if p else 0
 
@@ -340,9 +536,7 @@ class Icon(metaclass=MetaIn):
         if not p:
             # logger.error("No")
             return
-        p.icon_size = (32, 32)
-        p.image_size = (prev.size[0], prev.size[1])
-        p.image_pixels_float[:] = prev.pixels[:]
+        Icon.upload_thumbnail(p, prev, name)
 
     def __getitem__(self, name):
         return Icon.get_icon_id(name)
@@ -472,83 +666,407 @@ class PkgInstaller:
         return True
 
 
+class StatBackend:
+    """
+    轮询 stat 的后备实现, 所有平台可用
+    """
+    NAME = "stat"
+    INTERVAL = 0.5
+
+    def __init__(self, notify):
+        self.notify = notify
+        self.stat = {}
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    @staticmethod
+    def get_mtime(path: Path, recursive=False):
+        mtime = path.stat().st_mtime_ns
+        if not recursive or not path.is_dir():
+            return mtime
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                try:
+                    mtime = max(mtime, os.stat(os.path.join(root, name)).st_mtime_ns)
+                except OSError:
+                    ...
+        return mtime
+
+    def add(self, path: Path, recursive=False):
+        # 记录注册时的状态, 只报告之后的变化
+        try:
+            self.stat[path] = self.get_mtime(path, recursive)
+        except OSError:
+            ...
+
+    def remove(self, path: Path):
+        self.stat.pop(path, None)
+
+    def watch_count(self) -> int:
+        return len(self.stat)
+
+    def loop(self):
+        while FSWatcher._running:
+            # list() avoid changed while iterating
+            for path, changed in list(FSWatcher._watcher_path.items()):
+                if changed:
+                    continue
+                if not path.exists():
+                    continue
+                try:
+                    mtime = self.get_mtime(path, FSWatcher._watcher_recursive.get(path, False))
+                except OSError:
+                    continue
+                if self.stat.get(path, None) == mtime:
+                    continue
+                self.stat[path] = mtime
+                self.notify(path)
+            time.sleep(StatBackend.INTERVAL)
+
+    def close(self):
+        self.stat.clear()
+
+
+class InotifyBackend:
+    """
+    Linux inotify 实现(ctypes 调用 libc)
+        文件: 监听父目录并按文件名过滤, 兼容先写临时文件再 rename 的保存方式
+        目录: 监听目录本身, recursive 时监听所有子目录并跟踪新建的子目录
+        不存在的路径: 每秒重试一次, 出现时添加监听并报告变化
+    """
+    NAME = "inotify"
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+            IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+    EVENT = struct.Struct("iIII")
+    RETRY = 1
+
+    def __init__(self, notify):
+        import ctypes
+        import ctypes.util
+        self.notify = notify
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.lock = Lock()
+        self.wds: dict[int, Path] = {}
+        self.dirs: dict[Path, int] = {}
+        # 目录 -> {(注册路径, 文件名 or None)}
+        self.targets: dict[Path, set] = {}
+        self.missing: set[Path] = set()
+
+    @staticmethod
+    def available() -> bool:
+        if platform.system() != "Linux":
+            return False
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+            return hasattr(libc, "inotify_init1")
+        except OSError:
+            return False
+
+    def _watch_dir(self, d: Path, target) -> bool:
+        wd = self.dirs.get(d)
+        if wd is None:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(d), InotifyBackend.MASK)
+            if wd < 0:
+                return False
+            self.wds[wd] = d
+            self.dirs[d] = wd
+        self.targets.setdefault(d, set()).add(target)
+        return True
+
+    def _unwatch_dir(self, d: Path):
+        wd = self.dirs.pop(d, None)
+        self.targets.pop(d, None)
+        if wd is None:
+            return
+        self.wds.pop(wd, None)
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def _add(self, path: Path, recursive=False) -> bool:
+        if path.is_dir():
+            if not self._watch_dir(path, (path, None)):
+                return False
+            if recursive:
+                for root, dirs, _ in os.walk(path):
+                    for name in dirs:
+                        self._watch_dir(Path(root, name), (path, None))
+            return True
+        if path.parent.is_dir():
+            return self._watch_dir(path.parent, (path, path.name)) and path.exists()
+        return False
+
+    def add(self, path: Path, recursive=False):
+        with self.lock:
+            if not self._add(path, recursive):
+                self.missing.add(path)
+
+    def remove(self, path: Path):
+        with self.lock:
+            self.missing.discard(path)
+            for d, targets in list(self.targets.items()):
+                targets.difference_update({t for t in targets if t[0] == path})
+                if not targets:
+                    self._unwatch_dir(d)
+
+    def watch_count(self) -> int:
+        return len(self.dirs)
+
+    def _retry_missing(self):
+        with self.lock:
+            missing = list(self.missing)
+        for path in missing:
+            if not path.exists():
+                continue
+            with self.lock:
+                if path not in self.missing:
+                    continue
+                self.missing.discard(path)
+                self._add(path, FSWatcher._watcher_recursive.get(path, False))
+            self.notify(path)
+
+    def _dispatch(self, buf: bytes):
+        changed = set()
+        with self.lock:
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = InotifyBackend.EVENT.unpack_from(buf, offset)
+                name = os.fsdecode(buf[offset + 16: offset + 16 + length].split(b"\0", 1)[0])
+                offset += 16 + length
+                if mask & InotifyBackend.IN_Q_OVERFLOW:
+                    # 事件溢出, 所有目标都视为变化
+                    changed.update(t[0] for targets in self.targets.values() for t in targets)
+                    continue
+                d = self.wds.get(wd)
+                if d is None:
+                    continue
+                for path, fname in list(self.targets.get(d, ())):
+                    if fname is not None and fname != name:
+                        continue
+                    changed.add(path)
+                    if fname is not None:
+                        continue
+                    if mask & InotifyBackend.IN_ISDIR and mask & (InotifyBackend.IN_CREATE | InotifyBackend.IN_MOVED_TO):
+                        if FSWatcher._watcher_recursive.get(path, False):
+                            self._add_subtree(d.joinpath(name), path)
+                if mask & InotifyBackend.IN_IGNORED:
+                    # 目录被删除/移走, 根目录与文件目标转入 missing 等待重建
+                    self.wds.pop(wd, None)
+                    if self.dirs.get(d) == wd:
+                        self.dirs.pop(d, None)
+                        for path, fname in self.targets.pop(d, ()):
+                            if fname is not None or path == d:
+                                self.missing.add(path)
+        for path in changed:
+            self.notify(path)
+
+    def _add_subtree(self, d: Path, target: Path):
+        self._watch_dir(d, (target, None))
+        for root, dirs, _ in os.walk(d):
+            for name in dirs:
+                self._watch_dir(Path(root, name), (target, None))
+
+    def loop(self):
+        import select
+        while FSWatcher._running:
+            try:
+                readable, _, _ = select.select([self.fd], [], [], InotifyBackend.RETRY)
+                if readable:
+                    self._dispatch(os.read(self.fd, 64 * 1024))
+                self._retry_missing()
+            except BlockingIOError:
+                continue
+            except Exception as e:
+                logger.error("FSWatcher inotify error: %s", e)
+                time.sleep(InotifyBackend.RETRY)
+
+    def close(self):
+        with self.lock:
+            for d in list(self.dirs):
+                self._unwatch_dir(d)
+        os.close(self.fd)
+
+
 class FSWatcher:
     """
     监听文件/文件夹变化的工具类
-        register: 注册监听, 传入路径和回调函数(可空)
+        register: 注册监听, 传入路径和回调函数(可空), recursive 监听子目录, batch 时回调收到同一批次的路径列表
         unregister: 注销监听
-        run: 监听循环, 使用单例,只在第一次初始化时调用
+        run: 监听循环, 使用单例, 首次注册时启动
         stop: 停止监听, 释放资源
         consume_change: 消费变化, 当监听对象发生变化时记录为changed, 主动消费后置False, 用于自定义回调函数
+        stats: 监听数量/事件数/回调延迟等诊断信息
+    后端按 BACKENDS 顺序选择第一个可用的, 事件在 DEBOUNCE 内合并, 同一回调的变化按批次分发
+    回调通过 Timer.put 在主线程执行, 可直接访问 bpy; 耗时操作需在回调中自行转交后台线程
     """
+    BACKENDS = [InotifyBackend, StatBackend]
+    DEBOUNCE = 0.1
+    MAX_DELAY = 1.0
     _watcher_path: dict[Path, bool] = {}
-    _watcher_stat = {}
     _watcher_callback = {}
-    _watcher_queue = queue.Queue()
+    _watcher_recursive = {}
+    _watcher_batch = {}
+    _pending: dict[Path, list] = {}
+    _cond = Condition()
+    _backend = None
     _running = False
+    _stats = {"events": 0, "coalesced": 0, "dispatched": 0, "latency_sum": 0.0, "latency_max": 0.0}
 
     @staticmethod
     def init() -> None:
         FSWatcher._run()
 
     @staticmethod
-    def register(path, callback=None):
+    def register(path, callback=None, recursive=False, batch=False):
         path = FSWatcher.to_path(path)
         if path in FSWatcher._watcher_path:
             return
         FSWatcher._watcher_path[path] = False
         FSWatcher._watcher_callback[path] = callback
+        FSWatcher._watcher_recursive[path] = recursive
+        FSWatcher._watcher_batch[path] = batch
+        FSWatcher._run()
+        FSWatcher._backend.add(path, recursive)
 
     @staticmethod
     def unregister(path):
         path = FSWatcher.to_path(path)
         FSWatcher._watcher_path.pop(path)
         FSWatcher._watcher_callback.pop(path)
+        FSWatcher._watcher_recursive.pop(path, None)
+        FSWatcher._watcher_batch.pop(path, None)
+        with FSWatcher._cond:
+            FSWatcher._pending.pop(path, None)
+        if FSWatcher._backend:
+            FSWatcher._backend.remove(path)
+
+    @staticmethod
+    def _make_backend():
+        for backend in FSWatcher.BACKENDS:
+            try:
+                if backend.available():
+                    return backend(FSWatcher._notify)
+            except Exception as e:
+                logger.warning("FSWatcher backend %s unavailable: %s", backend.NAME, e)
+        return StatBackend(FSWatcher._notify)
 
     @staticmethod
     def _run():
         if FSWatcher._running:
             return
         FSWatcher._running = True
-        Thread(target=FSWatcher._loop, daemon=True).start()
+        FSWatcher._backend = FSWatcher._make_backend()
+        for path in list(FSWatcher._watcher_path):
+            FSWatcher._backend.add(path, FSWatcher._watcher_recursive.get(path, False))
+        logger.debug("FSWatcher backend: %s", FSWatcher._backend.NAME)
+        Thread(target=FSWatcher._backend.loop, daemon=True).start()
         Thread(target=FSWatcher._run_ex, daemon=True).start()
 
     @staticmethod
-    def _run_ex():
-        while FSWatcher._running:
-            try:
-                path = FSWatcher._watcher_queue.get(timeout=0.1)
-                if path not in FSWatcher._watcher_path:
+    def _notify(path):
+        """
+            后端线程调用: 标记为changed, 并在 DEBOUNCE 内合并同一路径的后续事件
+        """
+        now = time.time()
+        with FSWatcher._cond:
+            if path not in FSWatcher._watcher_path:
+                return
+            FSWatcher._stats["events"] += 1
+            if path in FSWatcher._pending:
+                FSWatcher._pending[path][1] = now
+                FSWatcher._stats["coalesced"] += 1
+                return
+            if FSWatcher._watcher_path[path]:
+                # 未消费的变化不重复触发
+                FSWatcher._stats["coalesced"] += 1
+                return
+            FSWatcher._watcher_path[path] = True
+            FSWatcher._pending[path] = [now, now]
+            FSWatcher._cond.notify()
+
+    @staticmethod
+    def _take_ready() -> list[Path]:
+        with FSWatcher._cond:
+            while FSWatcher._running and not FSWatcher._pending:
+                FSWatcher._cond.wait()
+            now = time.time()
+            ready = []
+            for path, (first, last) in list(FSWatcher._pending.items()):
+                if now - last < FSWatcher.DEBOUNCE and now - first < FSWatcher.MAX_DELAY:
                     continue
-                if callback := FSWatcher._watcher_callback[path]:
-                    callback(path)
-            except queue.Empty:
-                pass
+                FSWatcher._pending.pop(path)
+                latency = now - first
+                FSWatcher._stats["dispatched"] += 1
+                FSWatcher._stats["latency_sum"] += latency
+                FSWatcher._stats["latency_max"] = max(FSWatcher._stats["latency_max"], latency)
+                ready.append(path)
+            return ready
 
     @staticmethod
-    def _loop():
-        """
-            监听所有注册的路径, 有变化时记录为changed
-        """
+    def _run_ex():
         while FSWatcher._running:
-            # list() avoid changed while iterating
-            for path, changed in list(FSWatcher._watcher_path.items()):
-                if changed:
-                    continue
-                if not path.exists():
-                    continue
-                mtime = path.stat().st_mtime_ns
-                if FSWatcher._watcher_stat.get(path, None) == mtime:
-                    continue
-                FSWatcher._watcher_stat[path] = mtime
-                FSWatcher._watcher_path[path] = True
-                FSWatcher._watcher_queue.put(path)
-            time.sleep(0.5)
+            ready = FSWatcher._take_ready()
+            if not ready:
+                time.sleep(FSWatcher.DEBOUNCE / 2)
+                continue
+            batches: dict = {}
+            for path in ready:
+                if callback := FSWatcher._watcher_callback.get(path):
+                    batches.setdefault(callback, []).append(path)
+            for callback, paths in batches.items():
+                batch = FSWatcher._watcher_batch.get(paths[0], False)
+                Timer.put((FSWatcher._dispatch, callback, paths, batch))
+
+    @staticmethod
+    def _dispatch(callback, paths: list[Path], batch: bool):
+        try:
+            if batch:
+                callback(paths)
+                return
+            for path in paths:
+                callback(path)
+        except Exception as e:
+            logger.error("FSWatcher callback error: %s", e)
 
     @staticmethod
     def stop():
-        FSWatcher._watcher_queue.put(None)
         FSWatcher._running = False
+        with FSWatcher._cond:
+            FSWatcher._cond.notify_all()
+        if FSWatcher._backend:
+            FSWatcher._backend.close()
+            FSWatcher._backend = None
+
+    @staticmethod
+    def stats() -> dict:
+        with FSWatcher._cond:
+            stats = dict(FSWatcher._stats)
+        dispatched = stats.pop("dispatched")
+        latency_sum = stats.pop("latency_sum")
+        stats["backend"] = FSWatcher._backend.NAME if FSWatcher._backend else None
+        stats["watches"] = len(FSWatcher._watcher_path)
+        stats["os_watches"] = FSWatcher._backend.watch_count() if FSWatcher._backend else 0
+        stats["dispatched"] = dispatched
+        stats["latency_avg_ms"] = latency_sum / dispatched * 1000 if dispatched else 0
+        stats["latency_max_ms"] = stats.pop("latency_max") * 1000
+        return stats
 
     @staticmethod
     def consume_change(path) -> bool: